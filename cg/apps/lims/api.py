@@ -1,19 +1,22 @@
 # -*- coding: utf-8 -*-
 import datetime as dt
 import logging
+from collections import OrderedDict
+from typing import Callable, Iterable
+from xml.etree import ElementTree
 
+import requests
 from genologics.entities import Sample, Process
-from genologics.lims import Lims
+from genologics.lims import Lims, TIMEOUT
 from dateutil.parser import parse as parse_date
 
 from cg.exc import LimsDataError
+from .cache import LimsCache, SqliteLimsCache
+from .concurrency import RateLimit, fetch_all, map_concurrently, retry, unsent
 from .constants import PROP2UDF
+from .dates import DateHandler
 from .order import OrderHandler
 
-# fixes https://github.com/Clinical-Genomics/servers/issues/30
-import requests_cache
-requests_cache.install_cache(backend='memory')
-
 SEX_MAP = {'F': 'female', 'M': 'male', 'Unknown': 'unknown', 'unknown': 'unknown'}
 REV_SEX_MAP = {value: key for key, value in SEX_MAP.items()}
 AM_METHODS = {
@@ -30,11 +33,106 @@ AM_METHODS = {
 log = logging.getLogger(__name__)
 
 
-class LimsAPI(Lims, OrderHandler):
+class LimsAPI(Lims, OrderHandler, DateHandler):
+
+    # attempts and backoff in seconds of failed requests, and concurrent requests per call
+    attempts = 3
+    backoff = 0.5
+    workers = 8
+    # kept-alive connections to LIMS, and number and default age in seconds of cached responses
+    pool_size = 16
+    cache_size = 4096
+    cache_ttl = 300
+    # requests per second to LIMS over all threads, no limit if not set
+    rate_limit = None
+    limiter = RateLimit()
 
     def __init__(self, config):
         lconf = config['lims']
         super(LimsAPI, self).__init__(lconf['host'], lconf['username'], lconf['password'])
+        self.attempts = lconf.get('attempts', self.attempts)
+        self.backoff = lconf.get('backoff', self.backoff)
+        self.workers = lconf.get('workers', self.workers)
+        self.pool_size = lconf.get('pool_size', self.pool_size)
+        self.rate_limit = lconf.get('rate_limit', self.rate_limit)
+        self.limiter = RateLimit(self.rate_limit)
+        self.request_session = self._session()
+        self.responses = self._cache(lconf)
+
+    def _cache(self, lconf: dict) -> LimsCache:
+        """Cache of responses in memory, or in a SQLite file shared between runs if
+        `cache_path` is set. `cache_ttls` sets the seconds to keep each kind of entity."""
+        options = dict(size=lconf.get('cache_size', self.cache_size),
+                       ttl=lconf.get('cache_ttl', self.cache_ttl), ttls=lconf.get('cache_ttls'))
+        if lconf.get('cache_path'):
+            return SqliteLimsCache(lconf['cache_path'], **options)
+        return LimsCache(**options)
+
+    def _session(self) -> requests.Session:
+        """Session that keeps connections to LIMS alive, shared by the threads of the process."""
+        # pybiomart, through scout, installs a cache of every session of the process
+        session_class = next(klass for klass in requests.Session.__mro__
+                             if klass.__module__ == 'requests.sessions')
+        session = session_class()
+        session.auth = (self.username, self.password)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(self.pool_size, self.workers))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, uri, params=dict()):
+        """Fetch data, retrying failures that may go away."""
+        return retry(self._get, uri, params, attempts=self.attempts, backoff=self.backoff)
+
+    def _get(self, uri, params):
+        url = requests.Request('GET', uri, params=params).prepare().url
+        content = self.responses.get(url)
+        if content is None:
+            self.limiter.wait()
+            response = self.request_session.get(url, headers={'accept': 'application/xml'},
+                                                timeout=TIMEOUT)
+            self._validate(response)
+            content = response.content
+            self.responses.add(url, content)
+        return ElementTree.fromstring(content)
+
+    def post(self, uri, data, params=dict()):
+        """Post data, retrying failures where LIMS never got the data."""
+        return retry(self._send, 'POST', uri, data, params, attempts=self.attempts,
+                     backoff=self.backoff, retry_on=unsent)
+
+    def put(self, uri, data, params=dict()):
+        """Update data, forgetting the cached response."""
+        self.responses.discard(requests.Request('GET', uri, params=params).prepare().url)
+        return self._send('PUT', uri, data, params)
+
+    def _send(self, method, uri, data, params):
+        self.limiter.wait()
+        response = self.request_session.request(
+            method, uri, data=data, params=params,
+            headers={'content-type': 'application/xml', 'accept': 'application/xml'},
+            timeout=TIMEOUT,
+        )
+        self._validate(response, accept_status_codes=[200, 201, 202])
+        return ElementTree.fromstring(response.content)
+
+    def _validate(self, response, accept_status_codes=[200]):
+        """Raise an error for a failed response, with the response attached so that retries can
+        tell from the status code why it failed. genologics leaves it out for some errors."""
+        try:
+            self.validate_response(response, accept_status_codes=accept_status_codes)
+        except requests.exceptions.HTTPError as error:
+            if error.response is None:
+                raise requests.exceptions.HTTPError(*error.args, response=response) from error
+            raise
+
+    def map_samples(self, function: Callable, lims_ids: Iterable[str],
+                    max_workers: int = None) -> OrderedDict:
+        """Call a function with each sample id, at most `max_workers` at a time, and return the
+        results by sample id. The calls share the connections and the rate limit of the API."""
+        lims_ids = list(lims_ids)
+        results = map_concurrently(function, lims_ids, max_workers or self.workers)
+        return OrderedDict(zip(lims_ids, results))
 
     def sample(self, lims_id: str):
         """Fetch a sample from the LIMS database."""
@@ -158,6 +256,7 @@ class LimsAPI(Lims, OrderHandler):
         """Bypass to original method."""
         lims_samples = super(LimsAPI, self).get_samples(*args, **kwargs)
         if map_ids:
+            fetch_all(lims_samples, workers=self.workers)
             lims_map = {lims_sample.name: lims_sample.id for lims_sample in lims_samples}
             return lims_map
         else:
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Cache of the responses of LIMS to reads, bounded in size and age.
+
+Each LimsAPI keeps its own cache of response contents by URL, instead of a cache installed
+for every request of the process. How long a response is kept depends on the kind of entity:
+projects and containers rarely change, processes change while they run. When the cache is
+full the least recently used response is dropped.
+
+The responses can also be kept in a SQLite file, to share them between runs of the CLI.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlparse
+
+Entry = namedtuple('Entry', ['expires_at', 'content'])
+
+# seconds responses are kept by the kind of entity, the first segment after /api/v2/
+ENDPOINT_TTLS = {
+    'projects': 3600,
+    'containers': 3600,
+    'processes': 60,
+}
+
+
+def endpoint(url: str) -> str:
+    """The kind of entity of a LIMS URL, like 'samples' for .../api/v2/samples/ACC1A1."""
+    segments = urlparse(url).path.split('/')
+    return segments[3] if len(segments) > 3 else ''
+
+
+class LimsCache:
+    """Contents of LIMS responses by URL, in memory."""
+
+    def __init__(self, size: int = 4096, ttl: int = 300, ttls: dict = None):
+        self.size = size
+        self.ttl = ttl
+        self.ttls = dict(ENDPOINT_TTLS, **(ttls or {}))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def ttl_of(self, url: str) -> float:
+        """Seconds to keep the response of a URL."""
+        return self.ttls.get(endpoint(url), self.ttl)
+
+    def stats(self) -> dict:
+        """Hits, misses and number of cached responses."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            'entries': len(self),
+        }
+
+    def get(self, url: str) -> bytes:
+        """Fetch the content of a response that isn't too old, None otherwise."""
+        with self._lock:
+            entry = self._read(url)
+            if entry is not None and entry.expires_at <= time.time():
+                self._delete(url)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.content
+
+    def add(self, url: str, content: bytes):
+        """Cache the content of a response, dropping the least recently used ones when full."""
+        ttl = self.ttl_of(url)
+        if self.size <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._write(url, Entry(expires_at=time.time() + ttl, content=content))
+            self._evict()
+
+    def discard(self, url: str):
+        """Forget the response of a URL that was changed."""
+        with self._lock:
+            self._delete(url)
+
+    def _read(self, url: str) -> Entry:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def _write(self, url: str, entry: Entry):
+        self._entries.pop(url, None)
+        self._entries[url] = entry
+
+    def _delete(self, url: str):
+        self._entries.pop(url, None)
+
+    def _evict(self):
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+class SqliteLimsCache(LimsCache):
+    """Contents of LIMS responses by URL, in a SQLite file that several processes can share."""
+
+    def __init__(self, path: str, size: int = 4096, ttl: int = 300, ttls: dict = None):
+        super().__init__(size=size, ttl=ttl, ttls=ttls)
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                           check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS response (url TEXT PRIMARY KEY, '
+                                 'expires_at REAL, used_at REAL, content BLOB)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS response_used_at '
+                                 'ON response (used_at)')
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM response').fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM response')
+
+    def _read(self, url: str) -> Entry:
+        row = self._connection.execute('SELECT expires_at, content FROM response WHERE url = ?',
+                                       (url,)).fetchone()
+        if row is None:
+            return None
+        self._connection.execute('UPDATE response SET used_at = ? WHERE url = ?',
+                                 (time.time(), url))
+        return Entry(expires_at=row[0], content=row[1])
+
+    def _write(self, url: str, entry: Entry):
+        self._connection.execute('INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?)',
+                                 (url, entry.expires_at, time.time(), entry.content))
+
+    def _delete(self, url: str):
+        self._connection.execute('DELETE FROM response WHERE url = ?', (url,))
+
+    def _evict(self):
+        self._connection.execute('DELETE FROM response WHERE url IN (SELECT url FROM response '
+                                 'ORDER BY used_at DESC LIMIT -1 OFFSET ?)', (self.size,))
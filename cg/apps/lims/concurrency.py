@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Retries, concurrent requests and the rate of requests to LIMS.
+
+Reads are retried on any error that may go away, like a timeout or a gateway error. Writes
+are only retried when the request never reached LIMS, since a batch that was created can't be
+created again. Concurrent calls share one rate limit, so a fan-out can't flood LIMS.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+LOG = logging.getLogger(__name__)
+
+TRANSIENT_STATUS_CODES = (502, 503, 504)
+
+
+def status_code(error: Exception) -> int:
+    """The HTTP status code of a failed request, if there was a response."""
+    response = getattr(error, 'response', None)
+    return response.status_code if response is not None else None
+
+
+def unsent(error: Exception) -> bool:
+    """If a request failed before LIMS processed it."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return status_code(error) == 503
+
+
+def transient(error: Exception) -> bool:
+    """If a request failed in a way that may go away when repeated."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    return status_code(error) in TRANSIENT_STATUS_CODES
+
+
+def retry(function: Callable, *args, attempts: int = 3, backoff: float = 0.5,
+          retry_on: Callable[[Exception], bool] = transient, **kwargs):
+    """Call a function, repeating it with exponential backoff while it fails with errors
+    accepted by `retry_on`."""
+    for attempt in range(attempts):
+        try:
+            return function(*args, **kwargs)
+        except requests.exceptions.RequestException as error:
+            if attempt == attempts - 1 or not retry_on(error):
+                raise
+            delay = backoff * 2 ** attempt
+            LOG.warning("LIMS request failed, retrying in %.1f s: %s", delay, error)
+            time.sleep(delay)
+
+
+class RateLimit:
+    """Spaces the requests of all threads to at most `rate` per second, no limit if not set."""
+
+    def __init__(self, rate: float = None):
+        self.interval = 1 / rate if rate else 0
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next request may be sent."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_at)
+            self._next_at = send_at + self.interval
+        if send_at > now:
+            time.sleep(send_at - now)
+
+
+def map_concurrently(function: Callable, items: Iterable, workers: int) -> List:
+    """Call a function with each item, at most `workers` at a time, and return the results in
+    the order of the items. The first error is raised once all calls are done."""
+    items = list(items)
+    if workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(items))) as executor:
+            return list(executor.map(function, items))
+    return [function(item) for item in items]
+
+
+def fetch_all(entities: Iterable, workers: int) -> List:
+    """Load the data of LIMS entities with concurrent requests."""
+    entities = list(entities)
+    map_concurrently(lambda entity: entity.get(), entities, workers)
+    return entities
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Dates of samples in LIMS, harvested in bulk from the processes that set them.
+
+Looking up the date of a sample takes a search for its artifacts and reads of their processes,
+for every sample. Here the processes of a kind are listed once and their output artifacts are
+fetched in batches, to index the dates of all their samples at once. A sample that went through
+several processes of a kind gets the earliest date.
+"""
+import datetime as dt
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from dateutil.parser import parse as parse_date
+from genologics.entities import Artifact, Sample
+
+from .concurrency import fetch_all
+
+LOG = logging.getLogger(__name__)
+# artifacts or samples fetched per batch request
+ENTITY_BATCH_SIZE = 500
+
+DateSource = namedtuple('DateSource', ['process_types', 'output_type', 'date'])
+
+
+def udf_date(udf_key: str):
+    """Read the date of a process from a UDF."""
+    return lambda process: process.udf.get(udf_key)
+
+
+def run_date(process) -> dt.datetime:
+    """Read the date a process was run."""
+    return parse_date(process.date_run) if process.date_run else None
+
+
+DATE_SOURCES = {
+    'received': DateSource(['CG002 - Reception Control'], None,
+                           udf_date('date arrived at clinical genomics')),
+    'prepared': DateSource(['CG002 - Aggregate QC (Library Validation)'], None, run_date),
+    'sequenced': DateSource(['CG002 - Illumina Sequencing (Illumina SBS)',
+                             'CG002 - Illumina Sequencing (HiSeq X)'], None,
+                            udf_date('Finish Date')),
+    'delivered': DateSource(['Delivery v1'], 'Analyte', udf_date('Date delivered')),
+}
+
+
+def lims_timestamp(timestamp: dt.datetime) -> str:
+    """Format a point in time for the last-modified filter of LIMS, local time if naive."""
+    return timestamp.astimezone().isoformat(timespec='milliseconds')
+
+
+class DateHandler:
+
+    def harvest_dates(self, kind: str, last_modified: dt.datetime = None) -> Dict[str, dt.date]:
+        """Index the dates of a kind, 'received', 'prepared', 'sequenced' or 'delivered', by
+        sample id. Only processes modified since `last_modified` are read, if given."""
+        source = DATE_SOURCES[kind]
+        processes = self.get_processes(
+            type=source.process_types,
+            last_modified=lims_timestamp(last_modified) if last_modified else None,
+        )
+        fetch_all(processes, workers=self.workers)
+
+        artifact_dates = {}
+        for process in processes:
+            date = source.date(process)
+            if date is None:
+                continue
+            for _, output in process.input_output_maps:
+                if output is None:
+                    continue
+                if source.output_type and output.get('output-type') != source.output_type:
+                    continue
+                artifact_dates[output['limsid']] = date
+
+        artifacts = [Artifact(self, id=artifact_id) for artifact_id in artifact_dates]
+        self.get_batches(artifacts)
+        dates = {}
+        for artifact in artifacts:
+            date = artifact_dates[artifact.id]
+            for sample in artifact.samples:
+                if sample.id not in dates or date < dates[sample.id]:
+                    dates[sample.id] = date
+        LOG.info(f"{kind} dates of {len(dates)} samples from {len(processes)} processes")
+        return dates
+
+    def sample_pools(self, sample_ids: List[str]) -> Dict[str, tuple]:
+        """Map samples to the project and name of the pool they were ordered in."""
+        samples = [Sample(self, id=sample_id) for sample_id in sample_ids]
+        self.get_batches(samples)
+        projects = {sample.project.uri: sample.project for sample in samples if sample.project}
+        fetch_all(projects.values(), workers=self.workers)
+        return {sample.id: (sample.project.name, sample.udf.get('pool name'))
+                for sample in samples if sample.project and sample.udf.get('pool name')}
+
+    def get_batches(self, entities: List):
+        """Fetch artifacts, containers or samples with concurrent batch requests."""
+        batches = [entities[start:start + ENTITY_BATCH_SIZE]
+                   for start in range(0, len(entities), ENTITY_BATCH_SIZE)]
+        if self.workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(self.get_batch, batches))
+        else:
+            for batch in batches:
+                self.get_batch(batch)
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 import logging
 
@@ -9,6 +10,7 @@ from lxml.objectify import ObjectifiedElement
 from cg.exc import OrderError
 from .constants import PROP2UDF
 from . import batch
+from .concurrency import fetch_all
 
 LOG = logging.getLogger(__name__)
 CONTAINER_TYPE_MAP = {'Tube': 2, '96 well plate': 1}
@@ -27,22 +29,20 @@ class OrderHandler:
         """Save a batch of containers."""
         container_uri = f"{self.get_uri()}/containers/batch/create"
         results = self.save_xml(container_uri, container_details)
-        container_map = {}
-        for link in results.findall('link'):
-            lims_container = Container(self, uri=link.attrib['uri'])
-            container_map[lims_container.name] = lims_container
-        return container_map
+        lims_containers = [Container(self, uri=link.attrib['uri'])
+                           for link in results.findall('link')]
+        fetch_all(lims_containers, workers=self.workers)
+        return {lims_container.name: lims_container for lims_container in lims_containers}
 
     def save_samples(self, sample_details: ObjectifiedElement, map_samples=False):
         """Save a batch of samples."""
         sample_uri = f"{self.get_uri()}/samples/batch/create"
         results = self.save_xml(sample_uri, sample_details)
         if map_samples:
-            sample_map = {}
-            for link in results.findall('link'):
-                lims_sample = Sample(self, uri=link.attrib['uri'])
-                sample_map[lims_sample.name] = lims_sample
-            return sample_map
+            lims_samples = [Sample(self, uri=link.attrib['uri'])
+                            for link in results.findall('link')]
+            fetch_all(lims_samples, workers=self.workers)
+            return {lims_sample.name: lims_sample for lims_sample in lims_samples}
         return results
 
     def update_artifacts(self, artifact_details: ObjectifiedElement):
@@ -51,24 +51,36 @@ class OrderHandler:
         results = self.save_xml(artifact_uri, artifact_details)
         return results
 
-    def submit_project(self, project_name: str, samples: List[dict], researcher_id: str='3'):
-        """Parse Scout project."""
-        containers = self.prepare(samples)
-
+    def create_project(self, project_name, researcher_id: str = '3') -> Project:
+        """Create a new project, named by a string or by a function that returns the name."""
         lims_project = Project.create(
             self,
             researcher=Researcher(self, id=researcher_id),
-            name=project_name,
+            name=project_name() if callable(project_name) else project_name,
         )
         LOG.info("%s: created new LIMS project", lims_project.id)
+        return lims_project
 
-        containers_data = [batch.build_container(
-            name=container['name'],
-            con_type=Containertype(lims=self, id=container['type']),
-        ) for container in containers]
-        container_details = batch.build_container_batch(containers_data)
-        LOG.debug("%s: saving containers", lims_project.name)
-        container_map = self.save_containers(container_details)
+    def submit_project(self, project_name, samples: List[dict], researcher_id: str='3'):
+        """Parse Scout project.
+
+        The project is created while the containers are saved, and the name of the project can
+        be a function that is called when it is needed. The samples are saved in one batch, so
+        an order is never left half saved.
+        """
+        containers = self.prepare(samples)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending_project = executor.submit(self.create_project, project_name, researcher_id)
+
+            containers_data = [batch.build_container(
+                name=container['name'],
+                con_type=Containertype(lims=self, id=container['type']),
+            ) for container in containers]
+            container_details = batch.build_container_batch(containers_data)
+            LOG.debug("saving containers")
+            container_map = self.save_containers(container_details)
+            lims_project = pending_project.result()
 
         reagentlabel_samples = [sample
                                 for container in containers
@@ -79,30 +91,32 @@ class OrderHandler:
         for container in containers:
             for sample in container['samples']:
                 LOG.debug("%s: adding sample to container: %s", sample['name'], container['name'])
-                lims_container = container_map[container['name']]
-                sample_data = batch.build_sample(
+                samples_data.append(batch.build_sample(
                     name=sample['name'],
                     project=lims_project,
-                    container=lims_container,
+                    container=container_map[container['name']],
                     location=sample['location'],
                     udfs=sample['udfs'],
-                )
-                samples_data.append(sample_data)
+                ))
         sample_details = batch.build_sample_batch(samples_data)
         process_reagentlabels = len(reagentlabel_samples) > 0
         sample_map = self.save_samples(sample_details, map_samples=process_reagentlabels)
 
         if process_reagentlabels:
-            artifacts_data = [batch.build_artifact(
-                artifact=sample_map[sample['name']].artifact,
-                reagent_label=sample['index_sequence'],
-            ) for sample in reagentlabel_samples]
+            artifacts_data = self._reagentlabel_artifacts(reagentlabel_samples, sample_map)
             artifact_details = batch.build_artifact_batch(artifacts_data)
             self.update_artifacts(artifact_details)
 
         lims_project_data = self._export_project(lims_project)
         return lims_project_data
 
+    def _reagentlabel_artifacts(self, samples: List[dict], sample_map: dict) -> list:
+        """Build the artifacts of samples with their reagent labels."""
+        lims_artifacts = fetch_all((sample_map[sample['name']].artifact for sample in samples),
+                                   workers=self.workers)
+        return [batch.build_artifact(artifact=lims_artifact, reagent_label=sample['index_sequence'])
+                for lims_artifact, sample in zip(lims_artifacts, samples)]
+
     @classmethod
     def prepare(cls, samples):
         """Convert API input to LIMS input data."""
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
-from typing import List
-
-import xlrd
+import datetime as dt
+import time
+import zipfile
+from typing import BinaryIO, Iterator, List, Union
+
+import openpyxl
+from openpyxl.utils.datetime import to_excel
+from openpyxl.utils.exceptions import InvalidFileException
 from cg.constants import METAGENOME_SOURCES, ANALYSIS_SOURCES
 
 from cg.exc import OrderFormError
@@ -29,24 +34,39 @@ def check_orderform_version(document_title):
     raise OrderFormError(f"Unsupported orderform: {document_title}")
 
 
-def parse_orderform(excel_path: str) -> dict:
-    """Parse out information from an order form."""
-    workbook = xlrd.open_workbook(excel_path)
+def parse_orderform(orderform: Union[str, BinaryIO], time_limit: float = None) -> dict:
+    """Parse out information from an order form, given as a path or a binary file object.
+
+    The rows of the sheets are read one at a time. Parsing is stopped if it takes longer than
+    `time_limit` seconds.
+    """
+    deadline = time.monotonic() + time_limit if time_limit else None
+    try:
+        workbook = openpyxl.load_workbook(orderform, read_only=True, data_only=True)
+    except (InvalidFileException, KeyError, OSError, zipfile.BadZipFile) as error:
+        raise OrderFormError(f"Unable to read the orderform: {error}")
+    try:
+        return parse_workbook(workbook, deadline)
+    finally:
+        workbook.close()
 
+
+def parse_workbook(workbook: openpyxl.Workbook, deadline: float = None) -> dict:
+    """Parse out information from the sheets of an order form."""
     sheet_name = None
-    sheet_names = workbook.sheet_names()
+    sheet_names = workbook.sheetnames
     for name in ['orderform', 'order form']:
         if name in sheet_names:
             sheet_name = name
             break
     if sheet_name is None:
         raise OrderFormError("'orderform' sheet not found in Excel file")
-    orderform_sheet = workbook.sheet_by_name(sheet_name)
+    orderform_sheet = workbook[sheet_name]
 
     document_title = get_document_title(workbook, orderform_sheet)
     check_orderform_version(document_title)
 
-    raw_samples = relevant_rows(orderform_sheet)
+    raw_samples = relevant_rows(orderform_sheet, deadline)
     if len(raw_samples) == 0:
         raise OrderFormError("orderform doesn't contain any samples")
     parsed_samples = [parse_sample(raw_sample) for raw_sample in raw_samples]
@@ -80,14 +100,35 @@ def parse_orderform(excel_path: str) -> dict:
     return data
 
 
-def get_document_title(workbook: xlrd.book.Book, orderform_sheet: xlrd.sheet.Sheet) -> str:
+def cell_value(value):
+    """Convert a cell value to what xlrd returns: numbers and dates as floats, empty as ''."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, (dt.datetime, dt.date, dt.time)):
+        return to_excel(value)
+    return value
+
+
+def sheet_rows(sheet, deadline: float = None) -> Iterator[list]:
+    """Read the values of the rows of a sheet lazily."""
+    for row in sheet.iter_rows(values_only=True):
+        if deadline and time.monotonic() > deadline:
+            raise OrderFormError("orderform took too long to parse")
+        yield [cell_value(value) for value in row] or ['']
+
+
+def get_document_title(workbook: openpyxl.Workbook, orderform_sheet) -> str:
     """Get the document title for the order form."""
-    if 'information' in workbook.sheet_names():
-        information_sheet = workbook.sheet_by_name('information')
-        document_title = information_sheet.row(0)[2].value
+    if 'information' in workbook.sheetnames:
+        information_sheet = workbook['information']
+        document_title = next(sheet_rows(information_sheet))[2]
         return document_title
 
-    document_title = orderform_sheet.row(0)[1].value
+    document_title = next(sheet_rows(orderform_sheet))[1]
     return document_title
 
 
@@ -251,20 +292,20 @@ def parse_sample(raw_sample):
     return sample
 
 
-def relevant_rows(orderform_sheet):
+def relevant_rows(orderform_sheet, deadline: float = None):
     """Get the relevant rows from an order form sheet."""
     raw_samples = []
     current_row = None
     empty_row_found = False
-    for row in orderform_sheet.get_rows():
-        if row[0].value == '</SAMPLE ENTRIES>':
+    for row in sheet_rows(orderform_sheet, deadline):
+        if row[0] == '</SAMPLE ENTRIES>':
             break
 
         if current_row == 'header':
-            header_row = [cell.value for cell in row]
+            header_row = row
             current_row = None
         elif current_row == 'samples':
-            values = [str(cell.value) for cell in row]
+            values = [str(value) for value in row]
 
             # skip empty rows
             if values[0]:
@@ -278,8 +319,8 @@ def relevant_rows(orderform_sheet):
             else:
                 empty_row_found = True
 
-        if row[0].value == '<TABLE HEADER>':
+        if row[0] == '<TABLE HEADER>':
             current_row = 'header'
-        elif row[0].value == '<SAMPLE ENTRIES>':
+        elif row[0] == '<SAMPLE ENTRIES>':
             current_row = 'samples'
     return raw_samples
@@ -7,6 +7,7 @@ import ruamel.yaml
 
 import cg
 from cg.store import Store
+from cg.store import profiling
 
 from .analysis import analysis
 from .store import store
@@ -30,15 +31,30 @@ LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
 @click.option('-d', '--database', help='path/URI of the SQL database')
 @click.option('-l', '--log-level', type=click.Choice(LEVELS), default='INFO',
               help='lowest level to log at')
+@click.option('--profile-sql', is_flag=True, help='report the SQL statements issued')
 @click.version_option(cg.__version__, prog_name=cg.__title__)
 @click.pass_context
-def base(context, config, database, log_level):
+def base(context, config, database, log_level, profile_sql):
     """cg - interface between tools at Clinical Genomics."""
     log_format = "%(message)s" if sys.stdout.isatty() else None
     coloredlogs.install(level=log_level, fmt=log_format)
     context.obj = ruamel.yaml.safe_load(config) if config else {}
     if database:
         context.obj['database'] = database
+    if profile_sql:
+        _profile_command(context)
+
+
+def _profile_command(context):
+    """Report the SQL statements issued by the command once it has finished."""
+    profiler = profiling.profile_sql()
+    profile = profiler.__enter__()
+
+    def report():
+        profiler.__exit__(None, None, None)
+        click.echo(profile.report(), err=True)
+
+    context.call_on_close(report)
 
 
 @base.command()
@@ -33,3 +33,31 @@ def observations(context, case_id):
         LOG.info("Reset loqus observations for: %s", family_obj.internal_id)
 
     context.obj['status'].commit()
+
+
+@reset_cmd.command('search-index')
+@click.pass_context
+def search_index(context):
+    """Rebuild the index used to search records by name and id. Run after creating the index
+    table and after changing records outside of cg, e.g. with SQL or bulk inserts."""
+    context.obj['status'].rebuild_search_index()
+    context.obj['status'].commit()
+    LOG.info("Rebuilt the search index")
+
+
+@reset_cmd.command('trends')
+@click.argument('years', nargs=-1, type=int)
+@click.pass_context
+def trends(context, years):
+    """Build the monthly trend rollup of past years, or rebuild its stale months if no year is
+    given. Run regularly, e.g. nightly, to serve changed samples from the rollup again."""
+    status = context.obj['status']
+    if years:
+        for year in years:
+            status.refresh_trends(year)
+        status.commit()
+        LOG.info("Built the trend rollup of %s", ', '.join(str(year) for year in years))
+    else:
+        stale_months = status.refresh_stale_trends()
+        status.commit()
+        LOG.info("Rebuilt %s stale months of the trend rollup", len(stale_months))
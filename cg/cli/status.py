@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import csv
+import datetime as dt
+import json
+import sys
 
 import click
 from tabulate import tabulate
@@ -115,6 +119,12 @@ def present_string(case, param, show_negative):
 @click.option('-D', '--exclude-delivered', is_flag=True, help='exclude completely delivered cases')
 @click.option('-i', '--only-invoiced', is_flag=True, help='only completely invoiced cases')
 @click.option('-I', '--exclude-invoiced', is_flag=True, help='exclude completely invoiced cases')
+@click.option('--limit', type=int, help='maximum number of cases to show')
+@click.option('--after-tat', type=int, help='show cases after this TAT (next page)')
+@click.option('--after-id', help='show cases after this internal id (next page)')
+@click.option('-f', '--format', 'output_format', type=click.Choice(['table', 'jsonl', 'csv']),
+              default='table', help='output format')
+@click.option('--stream', is_flag=True, help='write rows as they are fetched, with jsonl or csv')
 def cases(context, output_type, verbose, days, internal_id, name, action, priority,
           customer_id, data_analysis, sample_id,
           only_received,
@@ -132,9 +142,17 @@ def cases(context, output_type, verbose, days, internal_id, name, action, priori
           exclude_uploaded,
           exclude_delivered,
           exclude_invoiced,
+          limit,
+          after_tat,
+          after_id,
+          output_format,
+          stream,
           ):
     """progress of each case"""
-    records = context.obj['db'].cases(
+    if stream and output_format == 'table':
+        context.fail('--stream needs --format jsonl or csv')
+
+    filters = dict(
         days=days,
         internal_id=internal_id,
         name=name,
@@ -158,7 +176,17 @@ def cases(context, output_type, verbose, days, internal_id, name, action, priori
         exclude_uploaded=exclude_uploaded,
         exclude_delivered=exclude_delivered,
         exclude_invoiced=exclude_invoiced,
+        limit=limit,
+        after_tat=after_tat,
+        after_id=after_id,
     )
+    if output_format != 'table':
+        records = (context.obj['db'].iter_cases(**filters) if stream else
+                   context.obj['db'].cases(**filters))
+        write_cases(records, output_format, sys.stdout)
+        return
+
+    records = context.obj['db'].cases(**filters)
     case_rows = []
 
     if output_type == 'bool':
@@ -250,6 +278,41 @@ def cases(context, output_type, verbose, days, internal_id, name, action, priori
             header_description = f"{header_description} {case_header[i]}={CASE_HEADERS_LONG[i]}"
     click.echo(header_description)
 
+    if limit and len(records) == limit:
+        last_case = records[-1]
+        click.echo(f"next page: --after-tat {last_case['tat']} --after-id "
+                   f"{last_case['internal_id']}")
+
+
+def serialize_case_value(value):
+    """Convert a case status value to a plain value for jsonl and csv rows"""
+    if isinstance(value, (dt.date, dt.datetime)):
+        return value.isoformat()
+    if isinstance(value, set):
+        return sorted(str(item) for item in value if item is not None)
+    return value
+
+
+def csv_field(value) -> str:
+    """Write lists as comma separated values and missing values as empty fields"""
+    if value is None:
+        return ''
+    return ','.join(value) if isinstance(value, list) else value
+
+
+def write_cases(records, output_format, stream):
+    """Write case statuses one row at a time as JSON lines or CSV"""
+    writer = None
+    for case in records:
+        row = {key: serialize_case_value(value) for key, value in case.items()}
+        if output_format == 'jsonl':
+            stream.write(json.dumps(row) + '\n')
+            continue
+        if writer is None:
+            writer = csv.DictWriter(stream, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow({key: csv_field(value) for key, value in row.items()})
+
 
 @status.command()
 @click.option('-s', '--skip', default=0, help='skip initial records')
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
+from contextlib import contextmanager
 
 import click
 
@@ -9,6 +10,30 @@ from cg.store import Store
 
 log = logging.getLogger(__name__)
 
+BATCH_SIZE_OPTION = click.option('--batch-size', default=100, show_default=True,
+                                 help='changed records per commit')
+REPORT_OPTION = click.option('--report', type=click.Path(dir_okay=False),
+                             help='write a JSON report of the transfer to a file')
+INCREMENTAL_OPTION = click.option('--incremental', is_flag=True,
+                                  help='only read what changed in LIMS since the last '
+                                       'incremental run, for the same records')
+
+
+@contextmanager
+def transfer_lims_api(context, batch_size: int, report: str):
+    """Set up a LIMS transfer and write its report when it ends. The SQL is only profiled for
+    the report."""
+    lims_api = lims_app.LimsAPI(context.obj)
+    transfer_api = transfer_app.TransferLims(context.obj['db'], lims_api, batch_size=batch_size,
+                                             profile_sql=report is not None)
+    try:
+        yield transfer_api
+    finally:
+        transfer_api.report.lims_cache = lims_api.responses.stats()
+        log.info(f"LIMS cache: {transfer_api.report.lims_cache}")
+        if report:
+            transfer_api.report.write(report)
+
 
 @click.group()
 @click.pass_context
@@ -35,37 +60,53 @@ def flowcell(context, flowcell_name):
               default='received')
 @click.option('-i', '--include', type=click.Choice(['unset', 'not-invoiced', 'all']),
               default='unset')
+@INCREMENTAL_OPTION
+@BATCH_SIZE_OPTION
+@REPORT_OPTION
 @click.pass_context
-def lims(context, status, include):
+def lims(context, status, include, incremental, batch_size, report):
     """Check if samples have been updated in LIMS."""
-    lims_api = lims_app.LimsAPI(context.obj)
-    transfer_api = transfer_app.TransferLims(context.obj['db'], lims_api)
-    transfer_api.transfer_samples(transfer_app.SampleState[status.upper()], include)
+    with transfer_lims_api(context, batch_size, report) as transfer_api:
+        if incremental:
+            transfer_api.sync(transfer_app.SampleState[status.upper()], include)
+        else:
+            transfer_api.transfer_samples(transfer_app.SampleState[status.upper()], include)
 
 
 @transfer.command()
 @click.option('-s', '--status', type=click.Choice(['received', 'delivered']),
               default='delivered')
+@INCREMENTAL_OPTION
+@BATCH_SIZE_OPTION
+@REPORT_OPTION
 @click.pass_context
-def pools(context, status):
+def pools(context, status, incremental, batch_size, report):
     """
     Update pools with received_at or delivered_at dates from LIMS. Defaults to delivered if no
     option is provided.
     """
-    lims_api = lims_app.LimsAPI(context.obj)
-    transfer_api = transfer_app.TransferLims(context.obj['db'], lims_api)
-    transfer_api.transfer_pools(transfer_app.PoolState[status.upper()])
+    with transfer_lims_api(context, batch_size, report) as transfer_api:
+        if incremental:
+            transfer_api.sync(transfer_app.PoolState[status.upper()])
+        else:
+            transfer_api.transfer_pools(transfer_app.PoolState[status.upper()])
 
 
 @transfer.command()
 @click.option('-s', '--status', type=click.Choice(['received', 'prepared', 'sequenced',
                                                    'delivered']), default='delivered')
+@INCREMENTAL_OPTION
+@BATCH_SIZE_OPTION
+@REPORT_OPTION
 @click.pass_context
-def microbials(context, status):
+def microbials(context, status, incremental, batch_size, report):
     """
     Update microbial samples with received_at, prepared_at, sequenced_at or delivered_at dates
     from LIMS. Defaults to delivered if no option is provided.
     """
-    lims_api = lims_app.LimsAPI(context.obj)
-    transfer_api = transfer_app.TransferLims(context.obj['db'], lims_api)
-    transfer_api.transfer_microbial_samples(transfer_app.MicrobialState[status.upper()])
+    with transfer_lims_api(context, batch_size, report) as transfer_api:
+        if incremental:
+            transfer_api.sync(transfer_app.MicrobialState[status.upper()])
+        else:
+            transfer_api.transfer_microbial_samples(
+                transfer_app.MicrobialState[status.upper()])
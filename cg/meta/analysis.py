@@ -113,6 +113,7 @@ class AnalysisAPI:
             'default_gene_panels': family_obj.panels,
             'samples': [],
         }
+        capture_kits = self._get_capture_kits(family_obj)
         for link in family_obj.links:
             sample_data = {
                 'sample_id': link.sample.internal_id,
@@ -130,15 +131,12 @@ class AnalysisAPI:
                     if link.sample.downsampled_to:
                         self.LOG.debug(f"{link.sample.name}: downsampled sample, skipping")
                     else:
-                        try:
-                            capture_kit = self.lims.capture_kit(link.sample.internal_id)
-                            if capture_kit is None or capture_kit == 'NA':
-                                self.LOG.warning(
-                                    f"%s: capture kit not found", link.sample.internal_id)
-                            else:
-                                sample_data['capture_kit'] = CAPTUREKIT_MAP[capture_kit]
-                        except HTTPError:
-                            self.LOG.warning(f"{link.sample.internal_id}: not found (LIMS)")
+                        capture_kit = capture_kits.get(link.sample.internal_id)
+                        if capture_kit is None or capture_kit == 'NA':
+                            self.LOG.warning(
+                                f"%s: capture kit not found", link.sample.internal_id)
+                        else:
+                            sample_data['capture_kit'] = CAPTUREKIT_MAP[capture_kit]
             if link.mother:
                 sample_data['mother'] = link.mother.internal_id
             if link.father:
@@ -146,6 +144,22 @@ class AnalysisAPI:
             data['samples'].append(sample_data)
         return data
 
+    def _get_capture_kits(self, family_obj: models.Family) -> dict:
+        """Fetch the capture kits from LIMS of the targeted samples without one in status,
+        concurrently. Samples not found in LIMS have none."""
+        lims_ids = [link.sample.internal_id for link in family_obj.links
+                    if link.sample.application_version.application.analysis_type in ('tgs', 'wes')
+                    and not link.sample.capture_kit and not link.sample.downsampled_to]
+
+        def get_capture_kit(lims_id: str) -> str:
+            try:
+                return self.lims.capture_kit(lims_id)
+            except HTTPError:
+                self.LOG.warning(f"{lims_id}: not found (LIMS)")
+                return None
+
+        return self.lims.map_samples(get_capture_kit, lims_ids) if lims_ids else {}
+
     @staticmethod
     def _fastq_header(line):
         """handle illumina's two different header formats
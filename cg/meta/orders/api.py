@@ -10,6 +10,7 @@ be validated and if passing all checks be accepted as new samples.
 import datetime as dt
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from cg.apps.lims import LimsAPI
@@ -31,12 +32,18 @@ class OrdersAPI(LimsHandler, StatusHandler):
         self.lims = lims
         self.status = status
         self.osticket = osticket
+        self._pending_ticket = None
 
     def submit(self, project: OrderType, data: dict, ticket: dict) -> dict:
         """Submit a batch of samples.
 
         Main entry point for the class towards interfaces that implements it.
         """
+        self.validate(project, data)
+        return self.process(project, data, ticket)
+
+    def validate(self, project: OrderType, data: dict):
+        """Check that an order can be submitted before processing it."""
         try:
             ORDER_SCHEMES[project].validate(data)
         except (ValueError, TypeError) as error:
@@ -44,6 +51,14 @@ class OrdersAPI(LimsHandler, StatusHandler):
 
         self._validate_customer_on_imported_samples(project, data)
 
+    def process(self, project: OrderType, data: dict, ticket: dict) -> dict:
+        """Open a ticket for a validated order and add its samples to LIMS and status.
+
+        A new ticket is opened while the order is added to LIMS, until the ticket number is
+        needed.
+        """
+        order_func = getattr(self, f"submit_{project.value}")
+
         # detect manual ticket assignment
         ticket_match = re.fullmatch(r'#([0-9]{6})', data['name'])
 
@@ -51,54 +66,74 @@ class OrdersAPI(LimsHandler, StatusHandler):
             ticket_number = int(ticket_match.group(1))
             LOG.info(f"{ticket_number}: detected ticket in order name")
             data['ticket'] = ticket_number
-        else:
+        elif self.osticket:
             # open and assign ticket to order
-            try:
-                if self.osticket:
-                    message = f"data:text/html;charset=utf-8,New incoming samples: "
+            message = self.ticket_message(data, ticket)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                self._pending_ticket = executor.submit(self.open_ticket, data['name'], ticket,
+                                                       message)
+                try:
+                    return order_func(data)
+                finally:
+                    self._pending_ticket = None
+        else:
+            data['ticket'] = None
+        result = order_func(data)
+        return result
 
-                    for sample in data.get('samples'):
-                        message += '<br />' + sample.get('name')
+    def ticket_message(self, data: dict, ticket: dict) -> str:
+        """Describe the samples of an order in a new ticket."""
+        message = f"data:text/html;charset=utf-8,New incoming samples: "
 
-                        if sample.get('family_name'):
-                            message += f", family: {sample.get('family_name')}"
+        for sample in data.get('samples'):
+            message += '<br />' + sample.get('name')
 
-                        if sample.get('internal_id'):
+            if sample.get('family_name'):
+                message += f", family: {sample.get('family_name')}"
 
-                            existing_sample = self.status.sample(sample.get('internal_id'))
-                            sample_customer = ''
-                            if existing_sample.customer_id != data['customer']:
-                                sample_customer = ' from ' + existing_sample.customer.internal_id
+            if sample.get('internal_id'):
 
-                            message += f" (already existing sample{sample_customer})"
+                existing_sample = self.status.sample(sample.get('internal_id'))
+                sample_customer = ''
+                if existing_sample.customer_id != data['customer']:
+                    sample_customer = ' from ' + existing_sample.customer.internal_id
 
-                        if sample.get('comment'):
-                            message += ', ' + sample.get('comment')
+                message += f" (already existing sample{sample_customer})"
 
-                    message += f"<br />"
+            if sample.get('comment'):
+                message += ', ' + sample.get('comment')
 
-                    if data.get('comment'):
-                        message += f"<br />{data.get('comment')}."
+        message += f"<br />"
 
-                    if ticket.get('name'):
-                        message += f"<br />{ticket.get('name')}"
+        if data.get('comment'):
+            message += f"<br />{data.get('comment')}."
 
-                    data['ticket'] = self.osticket.open_ticket(
-                        name=ticket['name'],
-                        email=ticket['email'],
-                        subject=data['name'],
-                        message=message,
-                    )
+        if ticket.get('name'):
+            message += f"<br />{ticket.get('name')}"
 
-                    LOG.info(f"{data['ticket']}: opened new ticket")
-                else:
-                    data['ticket'] = None
-            except TicketCreationError as error:
-                LOG.warning(error.message)
-                data['ticket'] = None
-        order_func = getattr(self, f"submit_{project.value}")
-        result = order_func(data)
-        return result
+        return message
+
+    def open_ticket(self, subject: str, ticket: dict, message: str) -> int:
+        """Open a ticket, None if it could not be opened."""
+        try:
+            ticket_number = self.osticket.open_ticket(
+                name=ticket['name'],
+                email=ticket['email'],
+                subject=subject,
+                message=message,
+            )
+        except TicketCreationError as error:
+            LOG.warning(error.message)
+            return None
+        LOG.info(f"{ticket_number}: opened new ticket")
+        return ticket_number
+
+    def ticket_number(self, data: dict) -> int:
+        """The ticket of an order, waiting for it to be opened if needed."""
+        if self._pending_ticket is not None:
+            data['ticket'] = self._pending_ticket.result()
+            self._pending_ticket = None
+        return data['ticket']
 
     def submit_rml(self, data: dict) -> dict:
         """Submit a batch of ready made libraries."""
@@ -108,7 +143,7 @@ class OrdersAPI(LimsHandler, StatusHandler):
             customer=status_data['customer'],
             order=status_data['order'],
             ordered=project_data['date'],
-            ticket=data['ticket'],
+            ticket=self.ticket_number(data),
             pools=status_data['pools'],
         )
         return {'project': project_data, 'records': new_records}
@@ -122,7 +157,7 @@ class OrdersAPI(LimsHandler, StatusHandler):
             customer=status_data['customer'],
             order=status_data['order'],
             ordered=project_data['date'],
-            ticket=data['ticket'],
+            ticket=self.ticket_number(data),
             samples=status_data['samples'],
         )
         self.add_missing_reads(new_samples)
@@ -137,7 +172,7 @@ class OrdersAPI(LimsHandler, StatusHandler):
             customer=status_data['customer'],
             order=status_data['order'],
             ordered=project_data['date'],
-            ticket=data['ticket'],
+            ticket=self.ticket_number(data),
             samples=status_data['samples'],
         )
         self.add_missing_reads(new_samples)
@@ -154,9 +189,9 @@ class OrdersAPI(LimsHandler, StatusHandler):
         for family_obj in result['records']:
             LOG.info(f"{family_obj.name}: submit family samples")
             status_samples = [link_obj.sample for link_obj in family_obj.links if
-                              link_obj.sample.ticket_number == data['ticket']]
+                              link_obj.sample.ticket_number == self.ticket_number(data)]
             self.add_missing_reads(status_samples)
-        self.update_application(data['ticket'], result['records'])
+        self.update_application(self.ticket_number(data), result['records'])
         return result
 
     def submit_mip(self, data: dict) -> dict:
@@ -184,7 +219,7 @@ class OrdersAPI(LimsHandler, StatusHandler):
             customer=status_data['customer'],
             order=status_data['order'],
             ordered=dt.datetime.now(),
-            ticket=data['ticket'],
+            ticket=self.ticket_number(data),
             lims_project=project_data['id'],
             samples=status_data['samples'],
             comment=status_data['comment'],
@@ -209,7 +244,7 @@ class OrdersAPI(LimsHandler, StatusHandler):
             customer=status_data['customer'],
             order=status_data['order'],
             ordered=project_data['date'] if project_data else dt.datetime.now(),
-            ticket=data['ticket'],
+            ticket=self.ticket_number(data),
             families=status_data['families'],
         )
         return {'project': project_data, 'records': new_families}
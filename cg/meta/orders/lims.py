@@ -56,7 +56,8 @@ class LimsHandler:
     def process_lims(self, data: dict, samples: List[dict]):
         """Process samples to add them to LIMS."""
         samples_lims = self.to_lims(data['customer'], samples)
-        project_name = data['ticket'] or data['name']
-        project_data = self.lims.submit_project(project_name, samples_lims)
+        # the project is named when it is created, after the ticket has been opened
+        project_data = self.lims.submit_project(lambda: self.ticket_number(data) or data['name'],
+                                                samples_lims)
         lims_map = self.lims.get_samples(projectlimsid=project_data['id'], map_ids=True)
         return project_data, lims_map
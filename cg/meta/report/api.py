@@ -87,12 +87,15 @@ class ReportAPI:
     def _incorporate_lims_methods(self, samples: list):
         """Fetch the methods used for preparation, sequencing and delivery of the samples."""
 
+        method_types = ['prep_method', 'sequencing_method', 'delivery_method']
+
+        def get_methods(lims_id: str) -> dict:
+            return {method_type: getattr(self.lims, f"get_{method_type}")(lims_id)
+                    for method_type in method_types}
+
+        sample_methods = self.lims.map_samples(get_methods, [sample['id'] for sample in samples])
         for sample in samples:
-            lims_id = sample['id']
-            method_types = ['prep_method', 'sequencing_method', 'delivery_method']
-            for method_type in method_types:
-                get_method = getattr(self.lims, f"get_{method_type}")
-                method_name = get_method(lims_id)
+            for method_type, method_name in sample_methods[sample['id']].items():
                 sample[method_type] = Presenter.process_string(method_name)
 
     @staticmethod
@@ -223,21 +226,25 @@ class ReportAPI:
 
     def _incorporate_lims_data(self, report_data: dict):
         """Incorporate data from LIMS for each sample ."""
-        for sample in report_data.get('samples'):
-            lims_id = sample['id']
-
-            try:
-                lims_sample = self.lims.sample(lims_id)
-            except requests.exceptions.HTTPError as e:
-                lims_sample = dict()
-                self.LOG.info(f"could not fetch sample {lims_id} from LIMS: {e}")
-
+        samples = report_data.get('samples')
+        lims_samples = self.lims.map_samples(self._get_lims_sample,
+                                             [sample['id'] for sample in samples])
+        for sample in samples:
+            lims_sample = lims_samples[sample['id']]
             sample['name'] = Presenter.process_string(lims_sample.get('name'))
             sample['sex'] = Presenter.process_string(lims_sample.get('sex'))
             sample['source'] = Presenter.process_string(lims_sample.get('source'))
             sample['application'] = Presenter.process_string(lims_sample.get('application'))
             sample['application_version'] = lims_sample.get('application_version')
 
+    def _get_lims_sample(self, lims_id: str) -> dict:
+        """Fetch a sample from LIMS, empty if it couldn't be fetched."""
+        try:
+            return self.lims.sample(lims_id)
+        except requests.exceptions.HTTPError as e:
+            self.LOG.info(f"could not fetch sample {lims_id} from LIMS: {e}")
+            return dict()
+
     def _get_genes_from_scout(self, panels: list) -> list:
         panel_genes = list()
 
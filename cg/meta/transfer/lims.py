@@ -1,11 +1,24 @@
 # -*- coding: utf-8 -*-
+import datetime as dt
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
 from enum import Enum
+from functools import wraps
 import logging
+import time
+from typing import Callable, List
 
 from cg.store import Store
 from cg.apps.lims import LimsAPI
 
 LOG = logging.getLogger(__name__)
+# processes modified this long before the first order are also harvested, for clock skew
+ORDER_MARGIN = dt.timedelta(days=1)
+# processes modified this long before the last sync are read again, for clock skew
+SYNC_OVERLAP = dt.timedelta(hours=1)
+# records looked up per query when syncing
+SYNC_BATCH_SIZE = 500
 
 
 class SampleState(Enum):
@@ -32,11 +45,85 @@ class IncludeOptions(Enum):
     ALL = 'all'
 
 
+class TransferReport:
+    """What a transfer from LIMS examined and changed per state, and where it spent its time."""
+
+    def __init__(self):
+        self.started_at = dt.datetime.now()
+        self.states = OrderedDict()
+        # the time spent on the database is only measured when the SQL is profiled
+        self.seconds = {'lims': 0.0, 'db': None}
+        self.commits = 0
+        # hits and misses of the cache of LIMS responses
+        self.lims_cache = None
+
+    def _state(self, status_type) -> dict:
+        name = f"{status_type.__class__.__name__}.{status_type.value}"
+        return self.states.setdefault(name, {'examined': 0, 'changed': 0})
+
+    def examined(self, status_type, count: int = 1):
+        self._state(status_type)['examined'] += count
+
+    def changed(self, status_type):
+        self._state(status_type)['changed'] += 1
+
+    @contextmanager
+    def timing(self, kind: str):
+        """Add the time spent in a block to LIMS or the database."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[kind] += time.perf_counter() - start
+
+    def to_dict(self) -> dict:
+        return {
+            'started_at': self.started_at.isoformat(),
+            'finished_at': dt.datetime.now().isoformat(),
+            'states': self.states,
+            'lims_seconds': round(self.seconds['lims'], 3),
+            'db_seconds': (round(self.seconds['db'], 3) if self.seconds['db'] is not None
+                           else None),
+            'commits': self.commits,
+            'lims_cache': self.lims_cache,
+        }
+
+    def write(self, path: str):
+        """Write the report as JSON."""
+        with open(path, 'w') as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+
+
+def unit_of_work(transfer):
+    """Commit the changes of a transfer in batches and roll back the pending ones if it fails.
+    With `profile_sql` the time spent on the database is added to the report."""
+    @wraps(transfer)
+    def wrapper(self, *args, **kwargs):
+        self._pending = 0
+        with self._profiled():
+            try:
+                result = transfer(self, *args, **kwargs)
+                self._commit()
+            except Exception:
+                self.status.rollback()
+                raise
+        return result
+    return wrapper
+
+
 class TransferLims(object):
 
-    def __init__(self, status: Store, lims: LimsAPI):
+    # records from which dates are harvested in bulk, for fewer it's cheaper to ask per record
+    bulk_threshold = 50
+
+    def __init__(self, status: Store, lims: LimsAPI, batch_size: int = 100,
+                 profile_sql: bool = False):
         self.status = status
         self.lims = lims
+        self.batch_size = batch_size
+        self.profile_sql = profile_sql
+        self.report = TransferReport()
+        self._pending = 0
 
         self._sample_functions = {
             SampleState.RECEIVED: self.status.samples_to_recieve,
@@ -68,9 +155,148 @@ class TransferLims(object):
             MicrobialState.DELIVERED: self.lims.get_delivery_date,
         }
 
+    @contextmanager
+    def _profiled(self):
+        """Add the time spent on the database in a block to the report, if profiling SQL."""
+        if not self.profile_sql:
+            yield
+            return
+        with self.status.profile_sql() as profile:
+            try:
+                yield
+            finally:
+                self.report.seconds['db'] = (self.report.seconds['db'] or 0.0) + profile.total_time
+
+    def _changed(self, status_type):
+        """Count a changed record, committing the changes when a batch is complete."""
+        self.report.changed(status_type)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._commit()
+
+    def _commit(self):
+        if self._pending:
+            self.status.commit()
+            self.report.commits += 1
+            self._pending = 0
+
+    def _lims_dates(self, status_type, records: List, lims_ids: List[str] = None) -> Callable:
+        """Function that looks up the date of a LIMS sample, from an index harvested from
+        the processes modified since the first record was ordered when there are many.
+
+        For fewer records the dates of `lims_ids`, if given, are looked up concurrently first.
+        """
+        if len(records) < self.bulk_threshold:
+            date_function = self._date_functions[status_type]
+            if lims_ids is None:
+                return date_function
+            with self.report.timing('lims'):
+                return self.lims.map_samples(date_function, lims_ids).get
+        ordered_dates = [getattr(record, 'ordered_at', None) or record.created_at
+                         for record in records]
+        ordered_dates = [ordered_at for ordered_at in ordered_dates if ordered_at]
+        since = min(ordered_dates) - ORDER_MARGIN if ordered_dates else None
+        with self.report.timing('lims'):
+            return self.lims.harvest_dates(status_type.value, since).get
+
+    @unit_of_work
+    def sync(self, status_type, include: str = 'unset'):
+        """Transfer the dates of a state from the processes modified in LIMS since it was last
+        synced. The first sync reads all the processes.
+
+        The records are picked like in a full transfer, by `include` for samples and by the
+        queue of the state otherwise. A date is set if it's missing or earlier than the one in
+        the status database. A later date may only come from a process that was run again,
+        so the date of such a sample is looked up from all of its processes, like a full
+        transfer does, and only replaced if that differs. The time of the sync is committed
+        last, after all the changes.
+        """
+        if isinstance(status_type, PoolState):
+            query = self._pool_functions[status_type]()
+        elif isinstance(status_type, MicrobialState):
+            query = self._microbial_samples_functions[status_type]()
+        else:
+            query = self._get_samples_to_include(include, status_type)
+        if query is None:
+            LOG.info(f"No records to sync found with {include} {status_type.value}")
+            return
+
+        sync_name = f"{status_type.__class__.__name__}.{status_type.value}"
+        sync_obj = self.status.lims_sync(sync_name) or self.status.add_lims_sync(sync_name)
+        started_at = dt.datetime.now()
+        since = sync_obj.synced_at - SYNC_OVERLAP if sync_obj.synced_at else None
+        with self.report.timing('lims'):
+            lims_dates = self.lims.harvest_dates(status_type.value, since)
+
+        if isinstance(status_type, PoolState):
+            records = self._pools_with_dates(query, lims_dates)
+        else:
+            records = self._records_with_dates(query, lims_dates)
+
+        field = f"{status_type.value}_at"
+        rerun_records = []
+        for record, lims_date in records:
+            self.report.examined(status_type)
+            statusdb_date = getattr(record, field)
+            if statusdb_date and _as_date(statusdb_date) < _as_date(lims_date):
+                # pools take the earliest date of their samples and are only ever moved back
+                if not isinstance(status_type, PoolState):
+                    rerun_records.append(record)
+                continue
+            if statusdb_date and _as_date(statusdb_date) == _as_date(lims_date):
+                continue
+            self._sync_date(status_type, record, statusdb_date, lims_date)
+
+        if rerun_records:
+            lims_ids = [record.internal_id for record in rerun_records]
+            with self.report.timing('lims'):
+                first_dates = self.lims.map_samples(self._date_functions[status_type], lims_ids)
+            for record in rerun_records:
+                statusdb_date = getattr(record, field)
+                lims_date = first_dates[record.internal_id]
+                if lims_date and _as_date(statusdb_date) != _as_date(lims_date):
+                    self._sync_date(status_type, record, statusdb_date, lims_date)
+
+        self._commit()
+        sync_obj.synced_at = started_at
+        self.status.add_commit(sync_obj)
+        self.report.commits += 1
+        LOG.info(f"{status_type.value} dates synced from {len(lims_dates)} samples in LIMS")
+
+    def _sync_date(self, status_type, record, statusdb_date, lims_date):
+        LOG.info(f"Found new {status_type.value} date for {record}: {lims_date}, "
+                 f"old value: {statusdb_date}")
+        setattr(record, f"{status_type.value}_at", lims_date)
+        self._changed(status_type)
+
+    def _records_with_dates(self, query, lims_dates: dict):
+        """Samples or microbial samples of a query with a date in LIMS, with the date."""
+        model = query.column_descriptions[0]['entity']
+        internal_ids = list(lims_dates)
+        for start in range(0, len(internal_ids), SYNC_BATCH_SIZE):
+            batch = internal_ids[start:start + SYNC_BATCH_SIZE]
+            for record in query.filter(model.internal_id.in_(batch)):
+                yield record, lims_dates[record.internal_id]
+
+    def _pools_with_dates(self, query, lims_dates: dict):
+        """Pools of a query with samples with a date in LIMS, with the earliest date."""
+        pool_dates = {}
+        with self.report.timing('lims'):
+            sample_pools = self.lims.sample_pools(list(lims_dates))
+        for sample_id, pool_key in sample_pools.items():
+            date = lims_dates[sample_id]
+            if pool_key not in pool_dates or _as_date(date) < _as_date(pool_dates[pool_key]):
+                pool_dates[pool_key] = date
+        for (ticket_number, name), date in pool_dates.items():
+            if not ticket_number.isdigit():
+                continue
+            for pool_obj in query.filter_by(ticket_number=int(ticket_number), name=name):
+                yield pool_obj, date
+
     def _get_all_samples_not_yet_delivered(self):
         return self.status.samples_not_delivered()
 
+    @unit_of_work
     def transfer_samples(self, status_type: SampleState, include='unset'):
         """Transfer information about samples."""
 
@@ -80,10 +306,15 @@ class TransferLims(object):
             LOG.info(f"No samples to process found with {include} {status_type.value}")
             return
         else:
-            LOG.info(f"{samples.count()} samples to process")
+            samples = samples.all()
+            LOG.info(f"{len(samples)} samples to process")
 
+        lims_dates = self._lims_dates(status_type, samples,
+                                      [sample_obj.internal_id for sample_obj in samples])
+        self.report.examined(status_type, len(samples))
         for sample_obj in samples:
-            lims_date = self._date_functions[status_type](sample_obj.internal_id)
+            with self.report.timing('lims'):
+                lims_date = lims_dates(sample_obj.internal_id)
             statusdb_date = getattr(sample_obj, f'{status_type.value}_at')
             if lims_date:
 
@@ -94,7 +325,7 @@ class TransferLims(object):
                               f"{lims_date}, old value: {statusdb_date} ")
 
                 setattr(sample_obj, f"{status_type.value}_at", lims_date)
-                self.status.commit()
+                self._changed(status_type)
             else:
                 LOG.debug(f"no {status_type.value} date found for {sample_obj.internal_id}")
 
@@ -108,30 +339,38 @@ class TransferLims(object):
             samples = self._get_all_relevant_samples()
         return samples
 
+    @unit_of_work
     def transfer_pools(self, status_type: PoolState):
         """Transfer information about pools."""
-        pools = self._pool_functions[status_type]()
+        pools = self._pool_functions[status_type]().all()
 
+        lims_dates = self._lims_dates(status_type, pools)
+        self.report.examined(status_type, len(pools))
         for pool_obj in pools:
             ticket_number = pool_obj.ticket_number
-            number_of_samples = self.lims.get_sample_number(projectname=ticket_number)
+            with self.report.timing('lims'):
+                number_of_samples = self.lims.get_sample_number(projectname=ticket_number)
 
             if ticket_number is None:
                 LOG.warning(f"No ticket number found for pool with order number {pool_obj.order}.")
             elif number_of_samples == 0:
                 LOG.warning(f"No samples found for pool with ticket number {ticket_number}.")
             else:
-                samples_in_pool = self.lims.get_samples(projectname=ticket_number)
+                with self.report.timing('lims'):
+                    samples_in_pool = self.lims.get_samples(projectname=ticket_number)
                 for sample_obj in samples_in_pool:
-                    status_date = self._date_functions[status_type](sample_obj.id)
-                    if sample_obj.udf['pool name'] == pool_obj.name and status_date is not None:
+                    with self.report.timing('lims'):
+                        status_date = lims_dates(sample_obj.id)
+                        pool_name = sample_obj.udf['pool name']
+                    if pool_name == pool_obj.name and status_date is not None:
                         LOG.info(f"Found {status_type.value} date for pool id {pool_obj.id}: {status_date}.")
                         setattr(pool_obj, f"{status_type.value}_at", status_date)
-                        self.status.commit()
+                        self._changed(status_type)
                         break
                     else:
                         continue
 
+    @unit_of_work
     def transfer_microbial_samples(self, status_type: MicrobialState):
         """Transfer information about microbial samples."""
 
@@ -141,12 +380,17 @@ class TransferLims(object):
             LOG.info(f"No microbial samples found with {status_type.value}")
             return
         else:
-            LOG.info(f"Processing {microbial_samples.count()} microbial samples")
+            microbial_samples = microbial_samples.all()
+            LOG.info(f"Processing {len(microbial_samples)} microbial samples")
 
+        lims_dates = self._lims_dates(status_type, microbial_samples,
+                                      [sample_obj.internal_id for sample_obj in microbial_samples])
+        self.report.examined(status_type, len(microbial_samples))
         for microbial_sample_obj in microbial_samples:
             internal_id = microbial_sample_obj.internal_id
 
-            lims_date = self._date_functions[status_type](microbial_sample_obj.internal_id)
+            with self.report.timing('lims'):
+                lims_date = lims_dates(microbial_sample_obj.internal_id)
             statusdb_date = getattr(microbial_sample_obj, f'{status_type.value}_at')
             if lims_date:
 
@@ -157,7 +401,7 @@ class TransferLims(object):
                          f"{lims_date}, old value: {statusdb_date} ")
 
                 setattr(microbial_sample_obj, f"{status_type.value}_at", lims_date)
-                self.status.commit()
+                self._changed(status_type)
             else:
                 LOG.debug(f"no {status_type.value} date found for {microbial_sample_obj.internal_id}")
                 LOG.info(f"no {status_type.value} date found for {microbial_sample_obj.internal_id}")
@@ -167,3 +411,8 @@ class TransferLims(object):
 
     def _get_all_relevant_samples(self):
         return self.status.samples_not_downsampled()
+
+
+def _as_date(value) -> dt.date:
+    """The date of a date or datetime, to compare the two."""
+    return value.date() if isinstance(value, dt.datetime) else value
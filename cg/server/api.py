@@ -2,22 +2,27 @@
 import json
 import logging
 from functools import wraps
-from pathlib import Path
-import tempfile
 
-from cg.constants import METAGENOME_SOURCES, ANALYSIS_SOURCES
-from flask import abort, current_app, Blueprint, jsonify, g, make_response, request
+from flask import abort, current_app, Blueprint, jsonify, g, make_response, request, url_for
 from google.auth import jwt
 from requests.exceptions import HTTPError
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
 
 from cg.exc import DuplicateRecordError, OrderFormError, OrderError
 from cg.apps.lims import parse_orderform, parse_json
 from cg.meta.orders import OrdersAPI, OrderType
-from .ext import db, lims, osticket
+from cg.store import models
+from cg.store.api import pages
+from cg.store.api.loaders import loader_options
+from .cache import cached_response
+from .ext import (db, google_certs, lims, options_cache, order_jobs, osticket, response_cache,
+                  token_cache)
 
 LOG = logging.getLogger(__name__)
 BLUEPRINT = Blueprint('api', __name__, url_prefix='/api/v1')
+# most records a list endpoint returns per request
+MAX_LIMIT = 500
 
 
 def public(route_function):
@@ -41,36 +46,121 @@ def before_request():
             jwt_token = auth_header.split('Bearer ')[-1]
         else:
             return abort(403, 'no JWT token found on request')
-        try:
-            user_data = jwt.decode(jwt_token, certs=current_app.config['GOOGLE_OAUTH_CERTS'])
-        except ValueError as error:
-            return abort(make_response(jsonify(message='outdated login certificate'), 403))
-        user_obj = db.user(user_data['email'])
+        certs = google_certs.certs
+        user_id = token_cache.get(jwt_token, certs)
+        if user_id is None:
+            try:
+                user_data = jwt.decode(jwt_token, certs=certs)
+            except ValueError as error:
+                return abort(make_response(jsonify(message='outdated login certificate'), 403))
+            user_obj = db.user(user_data['email'])
+            if user_obj is None:
+                message = f"{user_data['email']} doesn't have access"
+                return abort(make_response(jsonify(message=message), 403))
+            user_id = user_obj.id
+            token_cache.add(jwt_token, certs, user_id, expires_at=user_data.get('exp'))
+            g.current_user_obj = user_obj
+        g.current_user_id = user_id
+        g.current_user = LocalProxy(current_user)
+
+
+def current_user():
+    """Load the user of the current request, once per request."""
+    if 'current_user_obj' not in g:
+        user_obj = db.User.get(g.current_user_id)
         if user_obj is None:
-            message = f"{user_data['email']} doesn't have access"
-            return abort(make_response(jsonify(message=message), 403))
-        g.current_user = user_obj
+            return abort(make_response(jsonify(message="user doesn't have access"), 403))
+        g.current_user_obj = user_obj
+    return g.current_user_obj
+
+
+def request_limit(default: int) -> int:
+    """Number of records to respond with, from the `limit` argument between 1 and MAX_LIMIT."""
+    limit = request.args.get('limit', default, type=int)
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def list_response(key: str, query, model, order: pages.Order, serialize, limit: int):
+    """Respond with a page of records from a list query, sorted by `order`.
+
+    Pass the id of the last record of a page as `after` to fetch the next page, a comma
+    separated list of columns as `fields` to only fetch those and `count=false` to skip
+    counting all records.
+    """
+    fields = request.args.get('fields')
+    fields = fields.split(',') if fields else None
+    limit = request_limit(limit)
+    after_id = request.args.get('after', type=int)
+    try:
+        records = (pages.after(query, model, order, after_id) if after_id is not None else
+                   pages.ordered(query, model, order))
+        records = pages.project(records, model, fields) if fields else records
+    except ValueError as error:
+        return abort(make_response(jsonify(message=str(error)), 400))
+
+    records = records.limit(limit).all()
+    if fields:
+        data = [{field: getattr(record, field) for field in fields} for record in records]
+    else:
+        data = [serialize(record) for record in records]
+    response = {key: data, 'next': records[-1].id if len(records) == limit else None}
+    if request.args.get('count') != 'false':
+        response['total'] = query.count()
+    return jsonify(**response)
 
 
 @BLUEPRINT.route('/submit_order/<order_type>', methods=['POST'])
 def submit_order(order_type):
-    """Submit an order for samples."""
+    """Submit an order for samples.
+
+    With `async=true` the order is validated and queued, and the job that processes it is
+    returned right away.
+    """
     api = OrdersAPI(lims=lims, status=db, osticket=osticket)
     post_data = request.get_json()
     LOG.info("processing '%s' order: %s", order_type, post_data)
     try:
         ticket = {'name': g.current_user.name, 'email': g.current_user.email}
+        if request.args.get('async') == 'true':
+            api.validate(OrderType[order_type.upper()], post_data)
+            job = order_jobs.submit('order', user_id=g.current_user_id, order_type=order_type,
+                                    data=post_data, ticket=ticket)
+            response = make_response(jsonify(job=job), 202)
+            response.headers['Location'] = url_for('.order_job', job_id=job['id'])
+            return response
         result = api.submit(OrderType[order_type.upper()], post_data, ticket=ticket)
     except (DuplicateRecordError, OrderError) as error:
         return abort(make_response(jsonify(message=error.message), 401))
     except HTTPError as error:
         return abort(make_response(jsonify(message=error.args[0]), 401))
 
-    return jsonify(project=result['project'],
-                   records=[record.to_dict() for record in result['records']])
+    return jsonify(**order_result(result))
+
+
+@BLUEPRINT.route('/submit_order/jobs/<job_id>')
+def order_job(job_id):
+    """Fetch the status of a submitted order, and its result when it is done."""
+    job = order_jobs.get(job_id)
+    if job is None or (job['user_id'] != g.current_user_id and not g.current_user.is_admin):
+        return abort(404)
+    return jsonify(job=job)
+
+
+@order_jobs.handler('order')
+def process_order(order_type: str, data: dict, ticket: dict) -> dict:
+    """Add a validated order to LIMS and status."""
+    api = OrdersAPI(lims=lims, status=db, osticket=osticket)
+    result = api.process(OrderType[order_type.upper()], data, ticket=ticket)
+    return order_result(result)
+
+
+def order_result(result: dict) -> dict:
+    return {'project': result['project'],
+            'records': [record.to_dict() for record in result['records']]}
 
 
 @BLUEPRINT.route('/customers')
+@cached_response(response_cache, 'customer', 'customer_group', 'user')
 def customers():
     """Fetch customers."""
     query = db.Customer.query
@@ -79,6 +169,7 @@ def customers():
 
 
 @BLUEPRINT.route('/panels')
+@cached_response(response_cache, 'panel', 'customer')
 def panels():
     """Fetch panels."""
     query = db.Panel.query
@@ -90,19 +181,20 @@ def panels():
 def families():
     """Fetch families."""
     if request.args.get('status') == 'analysis':
-        records = db.families_to_mip_analyze()
-        count = len(records)
-    else:
-        customer_obj = None if g.current_user.is_admin else g.current_user.customer
-        families_q = db.families(
-            enquiry=request.args.get('enquiry'),
-            customer=customer_obj,
-            action=request.args.get('action'),
-        )
-        count = families_q.count()
-        records = families_q.limit(30)
-    data = [family_obj.to_dict(links=True) for family_obj in records]
-    return jsonify(families=data, total=count)
+        records = db.families_to_mip_analyze(profile='family_links')
+        data = [family_obj.to_dict(links=True) for family_obj in records]
+        return jsonify(families=data, total=len(records))
+
+    customer_obj = None if g.current_user.is_admin else g.current_user.customer
+    families_q = db.families(
+        enquiry=request.args.get('enquiry'),
+        customer=customer_obj,
+        action=request.args.get('action'),
+        profile='family_links',
+    )
+    return list_response('families', families_q, models.Family,
+                         [(models.Family.created_at, True)],
+                         lambda family_obj: family_obj.to_dict(links=True), limit=30)
 
 
 @BLUEPRINT.route('/families_in_customer_group')
@@ -112,6 +204,7 @@ def families_in_customer_group():
     families_q = db.families_in_customer_group(
         enquiry=request.args.get('enquiry'),
         customer=customer_obj,
+        profile='family_links',
     )
     count = families_q.count()
     records = families_q.limit(30)
@@ -151,21 +244,26 @@ def samples():
     """Fetch samples."""
     if request.args.get('status') and not g.current_user.is_admin:
         return abort(401)
+    queue_order = [(models.Sample.priority, True), (models.Sample.received_at, False)]
     if request.args.get('status') == 'incoming':
-        samples_q = db.samples_to_recieve()
+        samples_q = db.samples_to_recieve().options(*loader_options('sample'))
+        order = [(models.Sample.ordered_at, False)]
     elif request.args.get('status') == 'labprep':
-        samples_q = db.samples_to_prepare()
+        samples_q = db.samples_to_prepare().options(*loader_options('sample'))
+        order = queue_order
     elif request.args.get('status') == 'sequencing':
-        samples_q = db.samples_to_sequence()
+        samples_q = db.samples_to_sequence().options(*loader_options('sample'))
+        order = queue_order
     else:
         customer_obj = None if g.current_user.is_admin else g.current_user.customer
         samples_q = db.samples(
             enquiry=request.args.get('enquiry'),
             customer=customer_obj,
+            profile='sample',
         )
-    limit = int(request.args.get('limit', 50))
-    data = [sample_obj.to_dict() for sample_obj in samples_q.limit(limit)]
-    return jsonify(samples=data, total=samples_q.count())
+        order = [(models.Sample.created_at, True)]
+    return list_response('samples', samples_q, models.Sample, order,
+                         lambda sample_obj: sample_obj.to_dict(), limit=50)
 
 
 @BLUEPRINT.route('/samples_in_customer_group')
@@ -175,8 +273,9 @@ def samples_in_customer_group():
     samples_q = db.samples_in_customer_group(
         enquiry=request.args.get('enquiry'),
         customer=customer_obj,
+        profile='sample',
     )
-    limit = int(request.args.get('limit', 50))
+    limit = request_limit(50)
     data = [sample_obj.to_dict() for sample_obj in samples_q.limit(limit)]
     return jsonify(samples=data, total=samples_q.count())
 
@@ -212,7 +311,8 @@ def microbial_orders():
     customer_obj = None if g.current_user.is_admin else g.current_user.customer
     orders_q = db.microbial_orders(
         enquiry=request.args.get('enquiry'),
-        customer=customer_obj
+        customer=customer_obj,
+        profile='microbial_order_samples',
     )
     count = orders_q.count()
     records = orders_q.limit(30)
@@ -239,10 +339,11 @@ def microbial_samples():
     samples_q = db.microbial_samples(
         enquiry=request.args.get('enquiry'),
         customer=customer_obj,
+        profile='microbial_sample',
     )
-    limit = int(request.args.get('limit', 50))
-    data = [sample_obj.to_dict(order=True) for sample_obj in samples_q.limit(limit)]
-    return jsonify(samples=data, total=samples_q.count())
+    return list_response('samples', samples_q, models.MicrobialSample,
+                         [(models.MicrobialSample.created_at, True)],
+                         lambda sample_obj: sample_obj.to_dict(order=True), limit=50)
 
 
 @BLUEPRINT.route('/microbial_samples/<sample_id>')
@@ -261,10 +362,10 @@ def microbial_sample(sample_id):
 def pools():
     """Fetch pools."""
     customer_obj = None if g.current_user.is_admin else g.current_user.customer
-    pools_q = db.pools(customer=customer_obj,
-                       enquiry=request.args.get('enquiry'))
-    data = [pool_obj.to_dict() for pool_obj in pools_q.limit(30)]
-    return jsonify(pools=data, total=pools_q.count())
+    pools_q = db.pools(customer=customer_obj, enquiry=request.args.get('enquiry'),
+                       profile='pool')
+    return list_response('pools', pools_q, models.Pool, [(models.Pool.created_at, True)],
+                         lambda pool_obj: pool_obj.to_dict(), limit=30)
 
 
 @BLUEPRINT.route('/pools/<pool_id>')
@@ -285,8 +386,9 @@ def flowcells():
         status=request.args.get('status'),
         enquiry=request.args.get('enquiry'),
     )
-    data = [record.to_dict() for record in query.limit(50)]
-    return jsonify(flowcells=data, total=query.count())
+    return list_response('flowcells', query, models.Flowcell,
+                         [(models.Flowcell.sequenced_at, True)], lambda record: record.to_dict(),
+                         limit=50)
 
 
 @BLUEPRINT.route('/flowcells/<flowcell_id>')
@@ -303,44 +405,25 @@ def analyses():
     """Fetch analyses."""
     if request.args.get('status') == 'delivery':
         analyses_q = db.analyses_to_deliver()
+        order = [(models.Analysis.uploaded_at, True)]
     elif request.args.get('status') == 'upload':
         analyses_q = db.analyses_to_upload()
+        order = [(models.Analysis.id, False)]
     else:
         analyses_q = db.Analysis.query
-    data = [analysis_obj.to_dict() for analysis_obj in analyses_q.limit(30)]
-    return jsonify(analyses=data, total=analyses_q.count())
+        order = [(models.Analysis.id, False)]
+    analyses_q = analyses_q.options(*loader_options('analysis'))
+    return list_response('analyses', analyses_q, models.Analysis, order,
+                         lambda analysis_obj: analysis_obj.to_dict(), limit=30)
 
 
 @BLUEPRINT.route('/options')
+@cached_response(response_cache, 'customer', 'application', 'panel', 'organism', 'user',
+                 per_user=True)
 def options():
     """Fetch various options."""
-    customer_objs = db.Customer.query.all() if g.current_user.is_admin else [g.current_user.customer]
-    apptag_groups = {'ext': []}
-    for application_obj in db.applications(archived=False):
-        if application_obj.is_external:
-            apptag_groups['ext'].append(application_obj.tag)
-        else:
-            if application_obj.prep_category not in apptag_groups:
-                apptag_groups[application_obj.prep_category] = []
-            apptag_groups[application_obj.prep_category].append(application_obj.tag)
-
-    source_groups = {'metagenome': METAGENOME_SOURCES, 'analysis': ANALYSIS_SOURCES}
-
-    return jsonify(
-        customers=[{
-            'text': f"{customer.name} ({customer.internal_id})",
-            'value': customer.internal_id,
-        } for customer in customer_objs],
-        applications=apptag_groups,
-        panels=[panel.abbrev for panel in db.panels()],
-        organisms=[{
-            'name': organism.name,
-            'reference_genome': organism.reference_genome,
-            'internal_id': organism.internal_id,
-            'verified': organism.verified,
-        } for organism in db.Organism.query],
-        sources=source_groups
-    )
+    snapshot = options_cache.snapshot(db)
+    return jsonify(**snapshot.for_role(g.current_user.is_admin, g.current_user.customer_id))
 
 
 @BLUEPRINT.route('/me')
@@ -351,6 +434,7 @@ def me():
 
 @BLUEPRINT.route('/applications')
 @public
+@cached_response(response_cache, 'application', 'application_version')
 def applications():
     """Fetch application tags."""
     query = db.applications(archived=False)
@@ -360,6 +444,7 @@ def applications():
 
 @BLUEPRINT.route('/applications/<tag>')
 @public
+@cached_response(response_cache, 'application', 'application_version')
 def application(tag):
     """Fetch an application tag."""
     record = db.application(tag)
@@ -376,10 +461,8 @@ def orderform():
 
     try:
         if filename.lower().endswith('.xlsx'):
-            temp_dir = Path(tempfile.gettempdir())
-            saved_path = str(temp_dir / filename)
-            input_file.save(saved_path)
-            project_data = parse_orderform(saved_path)
+            project_data = parse_orderform(
+                input_file.stream, time_limit=current_app.config['CG_ORDERFORM_TIME_LIMIT'])
         else:
             json_data = json.load(input_file.stream)
             project_data = parse_json(json_data)
@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 import coloredlogs
-from flask import Flask, redirect, url_for, session
+from flask import Flask, g, redirect, url_for, session
 from flask_admin.base import AdminIndexView
 from flask_dance.contrib.google import make_google_blueprint, google
 from flask_dance.consumer import oauth_authorized
-import requests
 
 from cg.store import models
+from cg.store.profiling import profile_sql
 from . import api, ext, admin, invoices
 
 
@@ -16,6 +16,8 @@ def create_app():
     _load_config(app)
     _configure_extensions(app)
     _register_blueprints(app)
+    if app.config['CG_PROFILE_SQL']:
+        _configure_sql_profiling(app)
 
     return app
 
@@ -27,12 +29,15 @@ def _load_config(app):
 def _configure_extensions(app: Flask):
 
     _initialize_logging(app)
-    certs_resp = requests.get('https://www.googleapis.com/oauth2/v1/certs')
-    app.config['GOOGLE_OAUTH_CERTS'] = certs_resp.json()
+    ext.google_certs.init_app(app)
 
     ext.cors.init_app(app)
     ext.db.init_app(app)
     ext.lims.init_app(app)
+    ext.token_cache.init_app(app)
+    ext.response_cache.init_app(app, ext.db)
+    ext.options_cache.init_app(app, ext.db)
+    ext.order_jobs.init_app(app)
     if app.config['OSTICKET_API_KEY']:
         ext.osticket.init_app(app)
     ext.admin.init_app(app, index_view=AdminIndexView(endpoint='admin'))
@@ -78,6 +83,27 @@ def _register_blueprints(app: Flask):
         return redirect(url_for('index'))
 
 
+def _configure_sql_profiling(app: Flask):
+    """Report the SQL statements issued by each request in a response header."""
+
+    @app.before_request
+    def start_profile():
+        g.sql_profiler = profile_sql(engine=ext.db.engine)
+        g.sql_profile = g.sql_profiler.__enter__()
+
+    @app.after_request
+    def add_profile_header(response):
+        if 'sql_profiler' in g:
+            g.pop('sql_profiler').__exit__(None, None, None)
+            response.headers['X-SQL-Profile'] = g.sql_profile.header()
+        return response
+
+    @app.teardown_request
+    def stop_profile(error=None):
+        if 'sql_profiler' in g:
+            g.pop('sql_profiler').__exit__(None, None, None)
+
+
 def _register_admin_views():
     ext.admin.add_view(admin.CustomerView(models.Customer, ext.db.session))
     ext.admin.add_view(admin.CustomerGroupView(models.CustomerGroup, ext.db.session))
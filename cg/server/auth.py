@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Caching of verified JSON Web Tokens for the API."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """Bounded cache of verified tokens to user ids.
+
+    A token is kept until it expires, for at most `ttl` seconds, and the least recently used
+    tokens are dropped when more than `size` tokens are cached. All tokens are dropped when the
+    certificates change, so tokens signed with a rotated key are verified again. A size of 0
+    disables the cache.
+    """
+
+    def __init__(self, size: int = 1024, ttl: int = 300):
+        self.size = size
+        self.ttl = ttl
+        self._tokens = OrderedDict()
+        self._certs = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.size = app.config['CG_TOKEN_CACHE_SIZE']
+        self.ttl = app.config['CG_TOKEN_CACHE_TTL']
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def get(self, token: str, certs: dict):
+        """Fetch the user id of a verified token, None if it needs to be verified."""
+        with self._lock:
+            if certs is not self._certs:
+                self._tokens.clear()
+                self._certs = certs
+                return None
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._tokens[token]
+                return None
+            self._tokens.move_to_end(token)
+            return user_id
+
+    def add(self, token: str, certs: dict, user_id: int, expires_at: float = None):
+        """Cache the user id of a token verified with the given certificates."""
+        if self.size <= 0:
+            return
+        expires_at = min(expires_at or float('inf'), time.time() + self.ttl)
+        with self._lock:
+            if certs is not self._certs:
+                self._tokens.clear()
+                self._certs = certs
+            self._tokens[token] = (user_id, expires_at)
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.size:
+                self._tokens.popitem(last=False)
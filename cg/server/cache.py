@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""In-process cache of API responses that depend on a few rarely changing tables.
+
+Each table has a version that is bumped when a session of the served database that changed
+it commits, in this process. Cached responses are dropped when a table they depend on changes
+or, to pick up changes from the CLI and other processes, after `ttl` seconds. Responses carry
+an ETag of their content and a Last-Modified date so that clients can revalidate them with
+conditional requests.
+"""
+import datetime as dt
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+Entry = namedtuple('Entry', ['versions', 'created_at', 'body', 'mimetype', 'etag',
+                             'last_modified'])
+CHANGED_TABLES = 'changed_tables'
+
+
+class TableVersions:
+    """Versions of the tables changed in this process."""
+
+    def __init__(self):
+        self._versions = {}
+        self._modified = {}
+        self._started_at = dt.datetime.utcnow().replace(microsecond=0)
+        self._lock = threading.Lock()
+
+    def get(self, tables) -> tuple:
+        """Current versions of tables."""
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def last_modified(self, tables) -> dt.datetime:
+        """When any of the tables last changed in this process, or the process started."""
+        return max([self._modified.get(table, self._started_at) for table in tables])
+
+    def bump(self, *tables):
+        """Mark tables as changed."""
+        now = dt.datetime.utcnow().replace(microsecond=0)
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified[table] = now
+
+
+TABLE_VERSIONS = TableVersions()
+
+
+def _collect_changed_tables(session, flush_context):
+    """Remember the tables with flushed changes until the transaction ends."""
+    tables = session.info.setdefault(CHANGED_TABLES, set())
+    for instance in session.new | session.dirty | session.deleted:
+        table = getattr(instance, '__table__', None)
+        if table is not None:
+            tables.add(table.name)
+
+
+def _bump_changed_tables(session):
+    tables = session.info.pop(CHANGED_TABLES, None)
+    if tables:
+        TABLE_VERSIONS.bump(*tables)
+
+
+def _forget_changed_tables(session):
+    session.info.pop(CHANGED_TABLES, None)
+
+
+def track_changes(session_class):
+    """Bump the versions of the tables that the sessions of a class change when they commit."""
+    # the event registry goes by id() which is reused by new classes, so mark the class itself
+    if vars(session_class).get('_tracks_changes'):
+        return
+    event.listen(session_class, 'after_flush', _collect_changed_tables)
+    event.listen(session_class, 'after_commit', _bump_changed_tables)
+    event.listen(session_class, 'after_rollback', _forget_changed_tables)
+    session_class._tracks_changes = True
+
+
+class ResponseCache:
+    """Bounded cache of response bodies, invalidated by writes to the tables they depend on."""
+
+    def __init__(self, size: int = 256, ttl: int = 60, versions: TableVersions = TABLE_VERSIONS):
+        self.size = size
+        self.ttl = ttl
+        self.versions = versions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.size = app.config['CG_RESPONSE_CACHE_SIZE']
+        self.ttl = app.config['CG_RESPONSE_CACHE_TTL']
+        track_changes(db.session_class)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key, tables) -> Entry:
+        """Fetch a response that is still valid, None otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if (entry.versions != self.versions.get(tables) or
+                    entry.created_at + self.ttl <= time.time()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def add(self, key, tables, versions: tuple, response: Response) -> Entry:
+        """Cache the body of a response built from the given table versions."""
+        body = response.get_data()
+        entry = Entry(versions=versions, created_at=time.time(), body=body,
+                      mimetype=response.mimetype, etag=hashlib.sha1(body).hexdigest(),
+                      last_modified=self.versions.last_modified(tables))
+        if self.size <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+
+def entry_response(entry: Entry) -> Response:
+    """Respond with a cached body, or 304 if the client has the same version."""
+    response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.last_modified = entry.last_modified
+    return response.make_conditional(request)
+
+
+def cached_response(cache: ResponseCache, *tables: str, per_user: bool = False):
+    """Cache the responses of a view until one of the tables it reads changes.
+
+    Responses that depend on the current user are cached per user.
+    """
+    def decorator(view):
+        @wraps(view)
+        def cached_view(*args, **kwargs):
+            key = (request.full_path, g.get('current_user_id') if per_user else None)
+            entry = cache.get(key, tables)
+            if entry is None:
+                versions = cache.versions.get(tables)
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+                entry = cache.add(key, tables, versions, response)
+            return entry_response(entry)
+        return cached_view
+    return decorator
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Certificates to verify Google OAuth tokens, refreshed in the background."""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Callable, Tuple
+
+import requests
+
+LOG = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+DEFAULT_MAX_AGE = 3600
+RETRY_DELAY = 60
+REFRESH_MARGIN = 0.1
+
+Source = Callable[[], Tuple[dict, int]]
+
+
+def max_age(cache_control: str) -> int:
+    """Parse the max-age of a Cache-Control header, None if missing."""
+    match = re.search(r'max-age=(\d+)', cache_control or '')
+    return int(match.group(1)) if match else None
+
+
+def url_source(url: str = GOOGLE_CERTS_URL) -> Source:
+    """Fetch certificates over HTTP, valid for the max-age of the response."""
+    def fetch():
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        return response.json(), max_age(response.headers.get('Cache-Control'))
+    return fetch
+
+
+def file_source(path: str) -> Source:
+    """Read certificates from a local JSON file, e.g. to run offline."""
+    def read():
+        with open(path) as handle:
+            return json.load(handle), None
+    return read
+
+
+class CertProvider:
+    """Keep a current set of certificates.
+
+    Certificates are loaded from the disk cache on start and fetched from the source on first
+    use if there are none. A background thread fetches new certificates before the cached ones
+    expire, and the last good certificates are kept if fetching fails. The certificate set is
+    only replaced when it changes.
+    """
+
+    def __init__(self, source: Source = None, cache_path: str = None):
+        self.source = source or url_source()
+        self.cache_path = cache_path
+        self._certs = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        certs_file = app.config['CG_GOOGLE_CERTS_FILE']
+        self.source = file_source(certs_file) if certs_file else url_source()
+        self.cache_path = app.config['CG_GOOGLE_CERTS_CACHE']
+        self._certs = None
+        self._expires_at = self._refresh_at = 0.0
+        self._load_cache()
+
+    @property
+    def certs(self) -> dict:
+        """Fetch the current certificates."""
+        if self._certs is None and not self.refresh_in():
+            self.refresh()
+        self._start_refresh()
+        return self._certs or {}
+
+    def refresh(self) -> bool:
+        """Fetch certificates from the source, keeping the current ones on failure."""
+        with self._lock:
+            try:
+                certs, seconds = self.source()
+            except (requests.RequestException, OSError, ValueError) as error:
+                LOG.warning("failed to fetch certificates: %s", error)
+                self._refresh_at = time.time() + RETRY_DELAY
+                return False
+            self._update(certs, time.time() + (seconds or DEFAULT_MAX_AGE))
+            self._save_cache()
+            return True
+
+    def refresh_in(self) -> float:
+        """Seconds until the certificates should be refreshed."""
+        return max(self._refresh_at - time.time(), 0)
+
+    def _update(self, certs: dict, expires_at: float):
+        if certs != self._certs:
+            self._certs = certs
+        self._expires_at = expires_at
+        self._refresh_at = expires_at - REFRESH_MARGIN * max(expires_at - time.time(), 0)
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as handle:
+                content = json.load(handle)
+            self._update(content['certs'], content['expires_at'])
+        except (OSError, ValueError, KeyError) as error:
+            LOG.warning("ignoring certificate cache %s: %s", self.cache_path, error)
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        content = {'certs': self._certs, 'expires_at': self._expires_at}
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as handle:
+                json.dump(content, handle)
+            os.replace(handle.name, self.cache_path)
+        except OSError as error:
+            LOG.warning("failed to cache certificates in %s: %s", self.cache_path, error)
+
+    def _start_refresh(self):
+        """Start refreshing in the background, once per process."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name='google-certs',
+                                        daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_in())
+            self.refresh()
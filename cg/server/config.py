@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
+import tempfile
 
 # flask
 SECRET_KEY = os.environ.get('CG_SECRET_KEY') or 'thisIsNotASafeKey'
@@ -7,16 +8,32 @@ TEMPLATES_AUTO_RELOAD = True
 
 # sqlalchemy
 SQLALCHEMY_DATABASE_URI = os.environ['CG_SQL_DATABASE_URI']
-SQLALCHEMY_POOL_RECYCLE = 7200
+SQLALCHEMY_POOL_RECYCLE = int(os.environ.get('CG_SQL_POOL_RECYCLE', 7200))
+SQLALCHEMY_POOL_PRE_PING = os.environ.get('CG_SQL_POOL_PRE_PING', '1') == '1'
 SQLALCHEMY_TRACK_MODIFICATIONS = 'FLASK_DEBUG' in os.environ
 
 # server
 CG_ENABLE_ADMIN = ('FLASK_DEBUG' in os.environ) or (os.environ.get('CG_ENABLE_ADMIN') == '1')
+CG_PROFILE_SQL = ('FLASK_DEBUG' in os.environ) or (os.environ.get('CG_PROFILE_SQL') == '1')
+CG_RESPONSE_CACHE_SIZE = int(os.environ.get('CG_RESPONSE_CACHE_SIZE', 256))
+CG_RESPONSE_CACHE_TTL = int(os.environ.get('CG_RESPONSE_CACHE_TTL', 60))
+CG_JOB_DATABASE = os.environ.get('CG_JOB_DATABASE')
+CG_JOB_WORKERS = int(os.environ.get('CG_JOB_WORKERS', 2))
+CG_JOB_TTL = int(os.environ.get('CG_JOB_TTL', 86400))
+# connections of a server process: one per request thread and job worker, a few to spare
+CG_SERVER_THREADS = int(os.environ.get('CG_SERVER_THREADS', 4))
+SQLALCHEMY_POOL_SIZE = int(os.environ.get('CG_SQL_POOL_SIZE',
+                                          CG_SERVER_THREADS + CG_JOB_WORKERS))
+SQLALCHEMY_MAX_OVERFLOW = int(os.environ.get('CG_SQL_MAX_OVERFLOW', 2))
+SQLALCHEMY_POOL_TIMEOUT = int(os.environ.get('CG_SQL_POOL_TIMEOUT', 30))
+CG_ORDERFORM_TIME_LIMIT = float(os.environ.get('CG_ORDERFORM_TIME_LIMIT', 10))
 
 # lims
 LIMS_HOST = os.environ['LIMS_HOST']
 LIMS_USERNAME = os.environ['LIMS_USERNAME']
 LIMS_PASSWORD = os.environ['LIMS_PASSWORD']
+LIMS_CACHE_SIZE = int(os.environ.get('LIMS_CACHE_SIZE', 4096))
+LIMS_CACHE_TTL = int(os.environ.get('LIMS_CACHE_TTL', 300))
 
 OSTICKET_API_KEY = os.environ.get('OSTICKET_API_KEY')
 OSTICKET_DOMAIN = os.environ.get('OSTICKET_DOMAIN')
@@ -24,3 +41,8 @@ OSTICKET_DOMAIN = os.environ.get('OSTICKET_DOMAIN')
 # oauth
 GOOGLE_OAUTH_CLIENT_ID = os.environ['GOOGLE_OAUTH_CLIENT_ID']
 GOOGLE_OAUTH_CLIENT_SECRET = os.environ['GOOGLE_OAUTH_CLIENT_SECRET']
+CG_GOOGLE_CERTS_FILE = os.environ.get('CG_GOOGLE_CERTS_FILE')
+CG_GOOGLE_CERTS_CACHE = (os.environ.get('CG_GOOGLE_CERTS_CACHE') or
+                         os.path.join(tempfile.gettempdir(), 'cg-google-certs.json'))
+CG_TOKEN_CACHE_SIZE = int(os.environ.get('CG_TOKEN_CACHE_SIZE', 1024))
+CG_TOKEN_CACHE_TTL = int(os.environ.get('CG_TOKEN_CACHE_TTL', 300))
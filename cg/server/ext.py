@@ -1,15 +1,37 @@
 # -*- coding: utf-8 -*-
 from flask_admin import Admin
 from flask_alchy import Alchy
+from flask_sqlalchemy import SignallingSession
 from flask_cors import CORS
 
 from cg.apps.lims import LimsAPI
 from cg.apps.osticket import OsTicket
 from cg.store import models, api
+from .auth import TokenCache
+from .cache import ResponseCache
+from .certs import CertProvider
+from .jobs import JobQueue
+from .options import OptionsCache
 
 
 class CgAlchy(Alchy, api.CoreHandler):
-    pass
+
+    def __init__(self, *args, **kwargs):
+        self.session_class = api.store_session_class(SignallingSession)
+        super(CgAlchy, self).__init__(*args, **kwargs)
+
+    def create_session(self, options):
+        """Create the sessions of the served database from its own session class."""
+        return self.session_class(self, **options)
+
+    def apply_driver_hacks(self, app, info, options):
+        """Size the pool of served databases, SQLite gets the pool of Flask-SQLAlchemy."""
+        if info.drivername == 'sqlite':
+            for option in ('pool_size', 'max_overflow', 'pool_timeout'):
+                options.pop(option, None)
+        elif app.config.get('SQLALCHEMY_POOL_PRE_PING'):
+            options['pool_pre_ping'] = True
+        super(CgAlchy, self).apply_driver_hacks(app, info, options)
 
 
 class FlaskLims(LimsAPI):
@@ -24,6 +46,9 @@ class FlaskLims(LimsAPI):
                 'host': app.config['LIMS_HOST'],
                 'username': app.config['LIMS_USERNAME'],
                 'password': app.config['LIMS_PASSWORD'],
+                'pool_size': app.config['CG_SERVER_THREADS'] * self.workers,
+                'cache_size': app.config['LIMS_CACHE_SIZE'],
+                'cache_ttl': app.config['LIMS_CACHE_TTL'],
             }
         }
         super(FlaskLims, self).__init__(config)
@@ -34,3 +59,8 @@ db = CgAlchy(Model=models.Model)
 admin = Admin(name='Clinical Genomics')
 lims = FlaskLims()
 osticket = OsTicket()
+token_cache = TokenCache()
+google_certs = CertProvider()
+response_cache = ResponseCache()
+options_cache = OptionsCache()
+order_jobs = JobQueue()
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""Production profile of the server for gunicorn.
+
+    gunicorn --config python:cg.server.gunicorn_config cg.server.auto:app
+
+Each worker process loads its own app, with a database pool sized by the request threads of
+the worker and the job workers (see config.py) and a LIMS session that keeps connections alive.
+The app is not preloaded, so no connection is ever shared between processes. Workers are
+restarted after a number of requests to bound the memory of the per-process caches.
+
+Jobs are only seen by the process that accepted them unless CG_JOB_DATABASE points the
+processes to a shared database, so it's required with more than one worker.
+"""
+import os
+
+bind = os.environ.get('CG_SERVER_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('CG_SERVER_WORKERS', 4))
+if workers > 1 and not os.environ.get('CG_JOB_DATABASE'):
+    raise RuntimeError(f"CG_JOB_DATABASE must be set to share jobs between {workers} workers")
+worker_class = 'gthread'
+threads = int(os.environ.get('CG_SERVER_THREADS', 4))
+preload_app = False
+timeout = int(os.environ.get('CG_SERVER_TIMEOUT', 120))
+keepalive = 5
+max_requests = int(os.environ.get('CG_SERVER_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
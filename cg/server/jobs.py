@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""Queue of jobs that run in background workers of the server.
+
+Long running work, like adding an order to LIMS, is accepted as a job and run by worker
+threads outside of the request, and clients poll the status of the job. Jobs are kept in
+memory by default, which only works with a single server process. With a SQLite database,
+shared by the server processes on a host, every process can report the status of a job and
+the workers of all the processes take jobs from the same queue.
+
+Jobs that were running when a process stopped are not run again, since their work is not
+safe to repeat. They are marked as failed when a process opens the database.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import json
+
+from cg.exc import CgError
+
+LOG = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+JOB_FIELDS = ('id', 'kind', 'status', 'user_id', 'payload', 'result', 'error', 'created_at',
+              'started_at', 'finished_at')
+STOPPED_ERROR = 'the server stopped while the job was running'
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process on this host is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MemoryJobs:
+    """Jobs of this process."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def add(self, job: dict):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+        self._queue.put(job['id'])
+
+    def claim(self, timeout: float) -> dict:
+        """Take the next queued job, waiting up to `timeout` seconds for one."""
+        try:
+            job_id = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return self.update(job_id, status=RUNNING, started_at=time.time())
+
+    def update(self, job_id: str, **fields) -> dict:
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            return dict(self._jobs[job_id])
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def prune(self, finished_before: float):
+        """Forget the jobs that finished before a point in time."""
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job['finished_at'] and job['finished_at'] < finished_before:
+                    del self._jobs[job_id]
+
+
+class SqliteJobs:
+    """Jobs shared by the processes on a host in a SQLite database."""
+
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._added = threading.Event()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS job (id TEXT PRIMARY KEY, kind TEXT, status TEXT, "
+                "user_id INTEGER, payload TEXT, result TEXT, error TEXT, created_at REAL, "
+                "started_at REAL, finished_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS job_status_idx ON job (status, "
+                               "created_at)")
+            columns = [row['name'] for row in connection.execute('PRAGMA table_info(job)')]
+            if 'pid' not in columns:
+                connection.execute('ALTER TABLE job ADD COLUMN pid INTEGER')
+        self.recover()
+
+    def recover(self):
+        """Fail the jobs that were running in processes that have stopped."""
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            rows = connection.execute('SELECT id, pid FROM job WHERE status = ?',
+                                      (RUNNING,)).fetchall()
+            stopped = [row['id'] for row in rows
+                       if row['pid'] is None or not process_alive(row['pid'])]
+            connection.executemany('UPDATE job SET status = ?, error = ?, finished_at = ? '
+                                   'WHERE id = ?', [(FAILED, STOPPED_ERROR, time.time(), job_id)
+                                                    for job_id in stopped])
+            connection.execute('COMMIT')
+        if stopped:
+            LOG.warning(f"failed {len(stopped)} jobs of stopped processes")
+
+    @contextmanager
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> dict:
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        for key in ('payload', 'result'):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def add(self, job: dict):
+        values = dict(job, payload=json.dumps(job['payload']))
+        with self._connect() as connection:
+            connection.execute(
+                f"INSERT INTO job ({', '.join(JOB_FIELDS)}) VALUES "
+                f"({', '.join(':' + field for field in JOB_FIELDS)})", values,
+            )
+        self._added.set()
+
+    def claim(self, timeout: float) -> dict:
+        """Take the next queued job, waiting up to `timeout` seconds for one."""
+        deadline = time.time() + timeout
+        while True:
+            job = self._claim_next()
+            if job or time.time() >= deadline:
+                return job
+            self._added.wait(min(self.poll_interval, max(deadline - time.time(), 0)))
+            self._added.clear()
+
+    def _claim_next(self) -> dict:
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute("SELECT id FROM job WHERE status = ? ORDER BY created_at "
+                                     "LIMIT 1", (QUEUED,)).fetchone()
+            if row:
+                connection.execute("UPDATE job SET status = ?, started_at = ?, pid = ? "
+                                   "WHERE id = ?", (RUNNING, time.time(), os.getpid(), row['id']))
+            connection.execute('COMMIT')
+        return self.get(row['id']) if row else None
+
+    def update(self, job_id: str, **fields) -> dict:
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        assignments = ', '.join(f"{field} = :{field}" for field in fields)
+        with self._connect() as connection:
+            connection.execute(f"UPDATE job SET {assignments} WHERE id = :id",
+                               dict(fields, id=job_id))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict:
+        with self._connect() as connection:
+            return self._job(connection.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM job WHERE id = ?", (job_id,)
+            ).fetchone())
+
+    def prune(self, finished_before: float):
+        """Forget the jobs that finished before a point in time."""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM job WHERE finished_at < ?", (finished_before,))
+
+
+class JobQueue:
+    """Run jobs in worker threads, started when the first job is submitted.
+
+    Each kind of job has a handler that is called with the payload of the job within an app
+    context. What the handler returns is the result of the job, an exception fails the job.
+    """
+
+    def __init__(self, backend=None, workers: int = 2, ttl: int = 86400):
+        self.backend = backend or MemoryJobs()
+        self.workers = workers
+        self.ttl = ttl
+        self._app = None
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        path = app.config['CG_JOB_DATABASE']
+        self.backend = SqliteJobs(path) if path else MemoryJobs()
+        self.workers = app.config['CG_JOB_WORKERS']
+        self.ttl = app.config['CG_JOB_TTL']
+        self._app = app
+
+    def handler(self, kind: str):
+        """Register the handler of a kind of job."""
+        def decorator(function):
+            self._handlers[kind] = function
+            return function
+        return decorator
+
+    def submit(self, kind: str, user_id: int = None, **payload) -> dict:
+        """Queue a job and return it."""
+        if kind not in self._handlers:
+            raise ValueError(f"unknown kind of job: {kind}")
+        job = {field: None for field in JOB_FIELDS}
+        job.update(id=uuid.uuid4().hex, kind=kind, status=QUEUED, user_id=user_id,
+                   payload=payload, created_at=time.time())
+        self.backend.prune(time.time() - self.ttl)
+        self.backend.add(job)
+        self._start_workers()
+        return self.get(job['id'])
+
+    def get(self, job_id: str) -> dict:
+        """Fetch a job, without its payload."""
+        job = self.backend.get(job_id)
+        if job:
+            del job['payload']
+        return job
+
+    def run_next(self, timeout: float = 0) -> bool:
+        """Run the next queued job, return if there was one."""
+        job = self.backend.claim(timeout)
+        if job is None:
+            return False
+        try:
+            with self._app.app_context():
+                result = self._handlers[job['kind']](**job['payload'])
+        except Exception as error:
+            if isinstance(error, CgError):
+                message = error.message
+            else:
+                LOG.exception("job %s failed", job['id'])
+                message = str(error) or error.__class__.__name__
+            self.backend.update(job['id'], status=FAILED, error=message,
+                                finished_at=time.time())
+        else:
+            self.backend.update(job['id'], status=DONE, result=result, finished_at=time.time())
+        return True
+
+    def _start_workers(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name='cg-job-worker', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            try:
+                self.run_next(timeout=60)
+            except Exception:
+                LOG.exception("job worker failed to take a job")
+                time.sleep(1)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Options for the order forms, built once and shared between requests."""
+import threading
+import time
+
+from cg.constants import METAGENOME_SOURCES, ANALYSIS_SOURCES
+from cg.store import models
+from .cache import TABLE_VERSIONS, TableVersions, track_changes
+
+OPTIONS_TABLES = ('customer', 'application', 'panel', 'organism')
+
+
+class OptionsSnapshot:
+    """The order form options at one point in time.
+
+    Only the columns that are presented are fetched. The options of each role, admins or the
+    users of a customer, are put together once per snapshot.
+    """
+
+    def __init__(self, customers: list, applications: list, panels: list, organisms: list):
+        self.customers = customers
+        self.applications = applications
+        self.panels = panels
+        self.organisms = organisms
+        self._roles = {}
+
+    @classmethod
+    def build(cls, store) -> 'OptionsSnapshot':
+        """Fetch the options from the store."""
+        customers = store.Customer.query.with_entities(
+            models.Customer.id, models.Customer.internal_id, models.Customer.name,
+        ).all()
+        applications = store.applications(archived=False).with_entities(
+            models.Application.tag, models.Application.is_external,
+            models.Application.prep_category,
+        ).all()
+        panels = [abbrev for abbrev, in store.panels().with_entities(models.Panel.abbrev)]
+        organisms = [{
+            'name': organism.name,
+            'reference_genome': organism.reference_genome,
+            'internal_id': organism.internal_id,
+            'verified': organism.verified,
+        } for organism in store.Organism.query.with_entities(
+            models.Organism.name, models.Organism.reference_genome,
+            models.Organism.internal_id, models.Organism.verified,
+        )]
+        return cls(customers, applications, panels, organisms)
+
+    def for_role(self, is_admin: bool, customer_id: int) -> dict:
+        """Options for admins, who can order for all customers, or the users of a customer."""
+        role = None if is_admin else customer_id
+        if role not in self._roles:
+            self._roles[role] = self._options([customer for customer in self.customers if
+                                               is_admin or customer.id == customer_id])
+        return self._roles[role]
+
+    def _options(self, customers: list) -> dict:
+        apptag_groups = {'ext': []}
+        for application in self.applications:
+            group = 'ext' if application.is_external else application.prep_category
+            apptag_groups.setdefault(group, []).append(application.tag)
+        return {
+            'customers': [{
+                'text': f"{customer.name} ({customer.internal_id})",
+                'value': customer.internal_id,
+            } for customer in customers],
+            'applications': apptag_groups,
+            'panels': self.panels,
+            'organisms': self.organisms,
+            'sources': {'metagenome': METAGENOME_SOURCES, 'analysis': ANALYSIS_SOURCES},
+        }
+
+
+class OptionsCache:
+    """Keep an options snapshot until the tables it was built from change.
+
+    Changes from other processes are picked up after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: int = 60, versions: TableVersions = TABLE_VERSIONS):
+        self.ttl = ttl
+        self.versions = versions
+        self._snapshot = None
+        self._key = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.ttl = app.config['CG_RESPONSE_CACHE_TTL']
+        track_changes(db.session_class)
+        self._snapshot = None
+
+    def snapshot(self, store) -> OptionsSnapshot:
+        """Fetch the current snapshot, building a new one if the options have changed."""
+        versions = self.versions.get(OPTIONS_TABLES)
+        with self._lock:
+            if (self._snapshot is None or self._key[0] != versions or
+                    self._key[1] + self.ttl <= time.time()):
+                self._snapshot = OptionsSnapshot.build(store)
+                self._key = (versions, time.time())
+            return self._snapshot
@@ -1,2 +1,2 @@
 # -*- coding: utf-8 -*-
-from .core import CoreHandler, Store
+from .core import CoreHandler, Store, store_session_class
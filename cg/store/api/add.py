@@ -207,6 +207,11 @@ class AddHandler:
         new_sample.application_version = application_version
         return new_sample
 
+    def add_lims_sync(self, name: str, synced_at: dt.datetime = None) -> models.LimsSync:
+        """Build a new record of when the dates of a state were synced from LIMS."""
+        new_record = self.LimsSync(name=name, synced_at=synced_at)
+        return new_record
+
     def add_organism(self, internal_id: str, name: str, reference_genome: str = None, verified: bool
     = False, **kwargs) -> models.Organism:
         """Build a new Organism record."""
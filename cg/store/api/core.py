@@ -5,11 +5,13 @@ import alchy
 
 from cg.store import models
 from cg.store.api.reset import ResetHandler
+from cg.store.profiling import profile_sql
 
 from .add import AddHandler
 from .find import FindHandler
+from .search import SearchHandler, listen_for_search_changes
 from .status import StatusHandler
-from .trends import TrendsHandler
+from .trends import TrendsHandler, listen_for_trend_changes
 
 LOG = logging.getLogger(__name__)
 
@@ -33,14 +35,34 @@ class BaseHandler:
     MicrobialSample = models.MicrobialSample
     MicrobialOrder = models.MicrobialOrder
     Organism = models.Organism
+    SampleTrend = models.SampleTrend
+    SampleTrendMonth = models.SampleTrendMonth
+    SearchTrigram = models.SearchTrigram
+    SearchIndex = models.SearchIndex
+    LimsSync = models.LimsSync
 
+    def profile_sql(self, slowest: int = 5):
+        """Record the SQL statements issued on the store engine within a block."""
+        return profile_sql(engine=self.engine, slowest=slowest)
 
-class CoreHandler(BaseHandler, AddHandler, FindHandler, StatusHandler, TrendsHandler, ResetHandler):
+
+class CoreHandler(BaseHandler, AddHandler, FindHandler, SearchHandler, StatusHandler, TrendsHandler,
+                  ResetHandler):
     pass
 
 
+def store_session_class(base=alchy.Session) -> type:
+    """A session class of a store's own, so that its events only apply to the sessions of the
+    store and not to every session of the process."""
+    session_class = type('StoreSession', (base,), {})
+    listen_for_trend_changes(session_class)
+    listen_for_search_changes(session_class)
+    return session_class
+
+
 class Store(alchy.Manager, CoreHandler):
 
     def __init__(self, uri):
         self.uri = uri
-        super(Store, self).__init__(config=dict(SQLALCHEMY_DATABASE_URI=uri), Model=models.Model)
+        super(Store, self).__init__(config=dict(SQLALCHEMY_DATABASE_URI=uri), Model=models.Model,
+                                    session_class=store_session_class())
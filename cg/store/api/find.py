@@ -2,10 +2,11 @@
 import datetime as dt
 from typing import List
 
-from sqlalchemy import or_, and_, func, desc
+from sqlalchemy import and_, func, desc
 from sqlalchemy.orm import Query
 
 from cg.store import models
+from .loaders import loader_options
 
 
 class FindHandler:
@@ -35,22 +36,20 @@ class FindHandler:
         return self.Family.query.filter_by(internal_id=internal_id).first()
 
     def families(self, *, customer: models.Customer = None, enquiry: str = None,
-                 action: str = None) -> List[models.Family]:
-        """Fetch families."""
+                 action: str = None, profile: str = None) -> List[models.Family]:
+        """Fetch families, eager loading the relationships of a loader profile."""
         records = self.Family.query
         records = records.filter_by(customer=customer) if customer else records
 
-        records = records.filter(or_(
-            models.Family.name.like(f"%{enquiry}%"),
-            models.Family.internal_id.like(f"%{enquiry}%"),
-        )) if enquiry else records
+        records = self.search(records, models.Family, enquiry)
 
         records = records.filter_by(action=action) if action else records
+        records = records.options(*loader_options(profile)) if profile else records
 
         return records.order_by(models.Family.created_at.desc())
 
     def families_in_customer_group(self, *, customer: models.Customer = None, enquiry: str =
-    None) -> List[models.Family]:
+    None, profile: str = None) -> List[models.Family]:
         """Fetch all families including those from collaborating customers."""
         records = self.Family.query \
             .join(
@@ -62,10 +61,8 @@ class FindHandler:
             records = records.filter(
                 models.CustomerGroup.id == customer.customer_group_id)
 
-        records = records.filter(or_(
-            models.Family.name.like(f"%{enquiry}%"),
-            models.Family.internal_id.like(f"%{enquiry}%"),
-        )) if enquiry else records
+        records = self.search(records, models.Family, enquiry)
+        records = records.options(*loader_options(profile)) if profile else records
 
         return records.order_by(models.Family.created_at.desc())
 
@@ -77,18 +74,16 @@ class FindHandler:
         """Fetch a sample by lims id."""
         return self.Sample.query.filter_by(internal_id=internal_id).first()
 
-    def samples(self, *, customer: models.Customer = None, enquiry: str = None) -> List[
-        models.Sample]:
+    def samples(self, *, customer: models.Customer = None, enquiry: str = None,
+                profile: str = None) -> List[models.Sample]:
         records = self.Sample.query
         records = records.filter_by(customer=customer) if customer else records
-        records = records.filter(or_(
-            models.Sample.name.like(f"%{enquiry}%"),
-            models.Sample.internal_id.like(f"%{enquiry}%"),
-        )) if enquiry else records
+        records = self.search(records, models.Sample, enquiry)
+        records = records.options(*loader_options(profile)) if profile else records
         return records.order_by(models.Sample.created_at.desc())
 
-    def samples_in_customer_group(self, *, customer: models.Customer = None, enquiry: str = None)\
-            -> List[models.Sample]:
+    def samples_in_customer_group(self, *, customer: models.Customer = None, enquiry: str = None,
+                                  profile: str = None) -> List[models.Sample]:
         """Fetch all samples including those from collaborating customers."""
 
         records = self.Sample.query \
@@ -101,20 +96,16 @@ class FindHandler:
             records = records.filter(
                 models.CustomerGroup.id == customer.customer_group_id)
 
-        records = records.filter(or_(
-            models.Sample.name.like(f"%{enquiry}%"),
-            models.Sample.internal_id.like(f"%{enquiry}%"),
-        )) if enquiry else records
+        records = self.search(records, models.Sample, enquiry)
+        records = records.options(*loader_options(profile)) if profile else records
         return records.order_by(models.Sample.created_at.desc())
 
-    def microbial_samples(self, *, customer: models.Customer = None, enquiry: str = None) -> List[
-        models.MicrobialSample]:
+    def microbial_samples(self, *, customer: models.Customer = None, enquiry: str = None,
+                          profile: str = None) -> List[models.MicrobialSample]:
         records = self.MicrobialSample.query
         records = records.filter_by(customer=customer) if customer else records
-        records = records.filter(or_(
-            models.MicrobialSample.name.like(f"%{enquiry}%"),
-            models.MicrobialSample.internal_id.like(f"%{enquiry}%"),
-        )) if enquiry else records
+        records = self.search(records, models.MicrobialSample, enquiry)
+        records = records.options(*loader_options(profile)) if profile else records
         return records.order_by(models.MicrobialSample.created_at.desc())
 
     def microbial_sample(self, internal_id: str) -> models.MicrobialSample:
@@ -233,15 +224,15 @@ class FindHandler:
                 .all()
         )
 
-    def pools(self, *, customer: models.Customer, enquiry: str = None) -> Query:
-        """Fetch all the pools for a customer."""
+    def pools(self, *, customer: models.Customer, enquiry: str = None,
+              profile: str = None) -> Query:
+        """Fetch all the pools for a customer, eager loading the relationships of a loader
+        profile."""
         records = self.Pool.query
         records = records.filter_by(customer=customer) if customer else records
+        records = records.options(*loader_options(profile)) if profile else records
 
-        records = records.filter(or_(
-            models.Pool.name.like(f"%{enquiry}%"),
-            models.Pool.order.like(f"%{enquiry}%"),
-        )) if enquiry else records
+        records = self.search(records, models.Pool, enquiry)
 
         return records.order_by(models.Pool.created_at.desc())
 
@@ -282,15 +273,13 @@ class FindHandler:
         samples = self.Sample.query.filter_by(invoice_id=invoice_id).all()
         return pools + samples
 
-    def microbial_orders(self, *, customer: models.Customer = None, enquiry: str = None) -> List[
-        models.MicrobialOrder]:
+    def microbial_orders(self, *, customer: models.Customer = None, enquiry: str = None,
+                         profile: str = None) -> List[models.MicrobialOrder]:
         """Fetch all microbial_orders."""
         records = self.MicrobialOrder.query
         records = records.filter_by(customer=customer) if customer else records
-        records = records.filter(or_(
-            models.MicrobialOrder.name.like(f"%{enquiry}%"),
-            models.MicrobialOrder.internal_id.like(f"%{enquiry}%"),
-        )) if enquiry else records
+        records = self.search(records, models.MicrobialOrder, enquiry)
+        records = records.options(*loader_options(profile)) if profile else records
         return records.order_by(models.MicrobialOrder.created_at.desc())
 
     def microbial_order(self, internal_id: str) -> models.MicrobialOrder:
@@ -303,3 +292,7 @@ class FindHandler:
     def organism(self, internal_id: str) -> models.Organism:
         """Find an Organism by internal_id."""
         return self.Organism.query.filter_by(internal_id=internal_id).first()
+
+    def lims_sync(self, name: str) -> models.LimsSync:
+        """Find when the dates of a state were last synced from LIMS."""
+        return self.LimsSync.query.get(name)
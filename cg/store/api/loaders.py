@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Eager loading profiles for the serialization shapes of the models.
+
+Each profile loads the relationships that the matching `to_dict` call walks, so that serializing
+a page of records takes a constant number of queries.
+"""
+from typing import Callable, List
+
+from sqlalchemy.orm import Load, joinedload, selectinload
+
+from cg.store import models
+
+
+def _sample_options(path: Callable[[], Load]) -> List[Load]:
+    """Load what Sample.to_dict() serializes, below the given loader path."""
+    return [
+        path().joinedload(models.Sample.customer),
+        path().joinedload(models.Sample.application_version)
+        .joinedload(models.ApplicationVersion.application),
+    ]
+
+
+def _microbial_sample_options(path: Callable[[], Load]) -> List[Load]:
+    """Load what MicrobialSample.to_dict() serializes, below the given loader path."""
+    return [
+        path().joinedload(models.MicrobialSample.application_version)
+        .joinedload(models.ApplicationVersion.application),
+        path().joinedload(models.MicrobialSample.invoice),
+        path().joinedload(models.MicrobialSample.organism),
+    ]
+
+
+def sample() -> List[Load]:
+    """Sample.to_dict()"""
+    return _sample_options(lambda: Load(models.Sample))
+
+
+def family() -> List[Load]:
+    """Family.to_dict()"""
+    return [joinedload(models.Family.customer)]
+
+
+def family_links() -> List[Load]:
+    """Family.to_dict(links=True)"""
+    options = family()
+    for relationship in (models.FamilySample.sample, models.FamilySample.mother,
+                         models.FamilySample.father):
+        options.extend(_sample_options(
+            lambda: selectinload(models.Family.links).joinedload(relationship)
+        ))
+    return options
+
+
+def analysis() -> List[Load]:
+    """Analysis.to_dict()"""
+    return [joinedload(models.Analysis.family).joinedload(models.Family.customer)]
+
+
+def pool() -> List[Load]:
+    """Pool.to_dict(), which only serializes columns"""
+    return []
+
+
+def microbial_sample() -> List[Load]:
+    """MicrobialSample.to_dict(order=True)"""
+    options = _microbial_sample_options(lambda: Load(models.MicrobialSample))
+    options.append(joinedload(models.MicrobialSample.microbial_order)
+                   .joinedload(models.MicrobialOrder.customer))
+    return options
+
+
+def microbial_order_samples() -> List[Load]:
+    """MicrobialOrder.to_dict(samples=True)"""
+    options = [joinedload(models.MicrobialOrder.customer)]
+    options.extend(_microbial_sample_options(
+        lambda: selectinload(models.MicrobialOrder.microbial_samples)
+    ))
+    return options
+
+
+PROFILES = {
+    'sample': sample,
+    'family': family,
+    'family_links': family_links,
+    'analysis': analysis,
+    'pool': pool,
+    'microbial_sample': microbial_sample,
+    'microbial_order_samples': microbial_order_samples,
+}
+
+
+def loader_options(profile: str) -> List[Load]:
+    """Build the loader options for a named profile."""
+    if profile not in PROFILES:
+        raise ValueError(f"unknown loader profile: {profile}")
+    return PROFILES[profile]()
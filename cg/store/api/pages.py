@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Keyset pagination and column projection of list queries.
+
+A page continues after the record with a given primary key instead of skipping an offset, so
+deep pages cost the same as the first one. The order is given as (column, descending) pairs,
+usually the same order the store sorts the query by, and the primary key is added as a tie
+breaker unless the order ends with it.
+
+NULLs are taken as the smallest values, which is how MySQL and SQLite sort them. PostgreSQL
+sorts them as the largest values, so pages would skip or repeat records there, and only MySQL
+and SQLite are supported.
+"""
+from typing import List, Tuple
+
+from sqlalchemy import and_, false, or_, true
+from sqlalchemy.orm import Query
+
+from cg.store import models
+
+
+Order = List[Tuple[object, bool]]
+
+
+def order_columns(model: models.Model, order: Order) -> Order:
+    """List the (column, descending) pairs to sort by, ending with the primary key."""
+    columns = list(order)
+    if columns and columns[-1][0] is model.id:
+        return columns
+    descending = columns[0][1] if columns else True
+    columns.append((model.id, descending))
+    return columns
+
+
+def ordered(query: Query, model: models.Model, order: Order) -> Query:
+    """Sort a query by the given columns and then by the primary key."""
+    columns = order_columns(model, order)
+    return query.order_by(None).order_by(*[column.desc() if descending else column
+                                           for column, descending in columns])
+
+
+def _after_value(column, value, descending: bool):
+    """Criterion for rows sorted after a value in a single column."""
+    if descending:
+        return false() if value is None else or_(column < value, column == None)
+    return column != None if value is None else column > value
+
+
+def after(query: Query, model: models.Model, order: Order, record_id: int) -> Query:
+    """Continue a query after the record with the given primary key.
+
+    Raises ValueError if the record is not part of the query.
+    """
+    columns = order_columns(model, order)
+    values = (
+        query
+        .order_by(None)
+        .with_entities(*[column for column, _ in columns])
+        .filter(model.id == record_id)
+        .first()
+    )
+    if values is None:
+        raise ValueError(f"record not found: {record_id}")
+
+    criteria = []
+    for index, (column, descending) in enumerate(columns):
+        equal = [previous == value for (previous, _), value in zip(columns[:index], values)]
+        criteria.append(and_(true(), *equal, _after_value(column, values[index], descending)))
+    return ordered(query, model, order).filter(or_(*criteria))
+
+
+def project(query: Query, model: models.Model, fields: List[str]) -> Query:
+    """Only select the given columns, and the primary key, of a query.
+
+    Raises ValueError for fields that are not columns of the model.
+    """
+    columns = model.__table__.columns
+    unknown = [field for field in fields if field not in columns]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return query.with_entities(model.id, *[getattr(model, field) for field in fields])
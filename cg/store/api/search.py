@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Search records by a substring of their names and ids.
+
+A substring search with `LIKE '%enquiry%'` has to scan the whole table. The trigram index
+keeps the three letter fragments of the searched columns in the `search_trigram` table,
+updated in the same flush as the records by the sessions of a store, and narrows a search down
+to the records with all the fragments of the enquiry before the substring is matched.
+
+Writes that bypass the unit of work of a store session, like `query.update()`, bulk inserts or
+SQL run directly on the database, are not indexed and have to be followed by
+`cg reset search-index`. Until the index of a kind of record has been built, as recorded in
+the `search_index` table, it is searched without.
+"""
+import datetime as dt
+
+from sqlalchemy import and_, event, func, inspect, or_
+from sqlalchemy.orm import Query, Session
+
+from cg.store import models
+
+# the columns searched for each kind of record
+SEARCH_COLUMNS = {
+    models.Family: ('name', 'internal_id'),
+    models.Sample: ('name', 'internal_id'),
+    models.MicrobialSample: ('name', 'internal_id'),
+    models.MicrobialOrder: ('name', 'internal_id'),
+    models.Pool: ('name', 'order'),
+}
+INDEX_BATCH_SIZE = 1000
+
+
+def trigrams(*values: str) -> set:
+    """Three letter fragments of values, ignoring case."""
+    fragments = set()
+    for value in values:
+        value = (value or '').lower()
+        fragments.update(value[index:index + 3] for index in range(len(value) - 2))
+    return fragments
+
+
+def _record_type(model) -> str:
+    return model.__table__.name
+
+
+def _trigram_rows(model, record) -> list:
+    values = (getattr(record, column) for column in SEARCH_COLUMNS[model])
+    return [{'record_type': _record_type(model), 'record_id': record.id, 'trigram': trigram}
+            for trigram in trigrams(*values)]
+
+
+def _delete_trigrams(session: Session, model, record_ids: list):
+    trigram_table = models.SearchTrigram.__table__
+    session.execute(trigram_table.delete().where(and_(
+        trigram_table.c.record_type == _record_type(model),
+        trigram_table.c.record_id.in_(record_ids),
+    )))
+
+
+def _indexed_model(instance):
+    model = type(instance)
+    return model if model in SEARCH_COLUMNS else None
+
+
+def _update_search_index(session, flush_context):
+    """Index new records and records with changed names within the same transaction."""
+    stale = {}
+    changed = []
+    for instance in session.new | session.dirty | session.deleted:
+        model = _indexed_model(instance)
+        if model is None:
+            continue
+        if instance in session.dirty:
+            state = inspect(instance)
+            if not any(state.attrs[column].history.has_changes()
+                       for column in SEARCH_COLUMNS[model]):
+                continue
+        if instance not in session.new:
+            stale.setdefault(model, []).append(instance.id)
+        if instance not in session.deleted:
+            changed.append((model, instance))
+
+    for model, record_ids in stale.items():
+        _delete_trigrams(session, model, record_ids)
+    rows = [row for model, instance in changed for row in _trigram_rows(model, instance)]
+    if rows:
+        session.execute(models.SearchTrigram.__table__.insert(), rows)
+
+
+def listen_for_search_changes(session_class):
+    """Index the records that the sessions of a class change."""
+    event.listen(session_class, 'after_flush', _update_search_index)
+
+
+class LikeSearch:
+    """Match the substring in every record."""
+
+    @staticmethod
+    def filter(query: Query, model, enquiry: str) -> Query:
+        return query.filter(or_(*[getattr(model, column).like(f"%{enquiry}%")
+                                  for column in SEARCH_COLUMNS[model]]))
+
+
+class TrigramSearch(LikeSearch):
+    """Match the substring in the records that have the rarest trigrams of the enquiry.
+
+    How many records have each trigram of the enquiry is counted up to `max_candidates`, and
+    the records with all of the `intersect` rarest trigrams are matched. Enquiries too short
+    to have a trigram, with LIKE wildcards or with only common trigrams, and kinds of records
+    not yet indexed, are matched in every record.
+    """
+
+    def __init__(self, max_candidates: int = 10000, intersect: int = 3):
+        self.max_candidates = max_candidates
+        self.intersect = intersect
+
+    @staticmethod
+    def _postings(model, fragment: str) -> Query:
+        """Ids of the records with a trigram."""
+        return models.SearchTrigram.query.with_entities(models.SearchTrigram.record_id).filter_by(
+            record_type=_record_type(model), trigram=fragment)
+
+    @staticmethod
+    def indexed(model) -> bool:
+        """If the index of a kind of record has been built."""
+        return models.SearchIndex.query.get(_record_type(model)) is not None
+
+    def rarest(self, model, enquiry: str) -> list:
+        """The trigrams of an enquiry, rarest first, or none if they are all common."""
+        fragments = trigrams(enquiry)
+        found = dict(
+            models.SearchTrigram.query
+            .with_entities(models.SearchTrigram.trigram, func.count())
+            .filter(models.SearchTrigram.record_type == _record_type(model),
+                    models.SearchTrigram.trigram.in_(fragments))
+            .group_by(models.SearchTrigram.trigram)
+        ) if fragments else {}
+        counts = sorted((found.get(fragment, 0), fragment) for fragment in fragments)
+        if not counts or counts[0][0] >= self.max_candidates:
+            return []
+        return [fragment for count, fragment in counts]
+
+    def filter(self, query: Query, model, enquiry: str) -> Query:
+        query = super().filter(query, model, enquiry)
+        if len(enquiry) < 3 or '%' in enquiry or '_' in enquiry or not self.indexed(model):
+            return query
+        for fragment in self.rarest(model, enquiry)[:self.intersect]:
+            query = query.filter(model.id.in_(self._postings(model, fragment).subquery()))
+        return query
+
+
+class SearchHandler:
+    """Search records by enquiry through a pluggable search backend."""
+
+    search_backend = TrigramSearch()
+
+    def search(self, query: Query, model, enquiry: str = None) -> Query:
+        """Filter records with a name or id containing the enquiry."""
+        return self.search_backend.filter(query, model, enquiry) if enquiry else query
+
+    def rebuild_search_index(self):
+        """Index all the searchable records, e.g. after creating the index table, and mark
+        the index of each kind of record as built."""
+        trigram_table = models.SearchTrigram.__table__
+        self.session.execute(trigram_table.delete())
+        built_at = dt.datetime.now()
+        for model, columns in SEARCH_COLUMNS.items():
+            query = self.session.query(model.id, *[getattr(model, column) for column in columns])
+            last_id = 0
+            while True:
+                records = query.filter(model.id > last_id).order_by(model.id).limit(
+                    INDEX_BATCH_SIZE).all()
+                if not records:
+                    break
+                rows = [row for record in records for row in _trigram_rows(model, record)]
+                if rows:
+                    self.session.execute(trigram_table.insert(), rows)
+                last_id = records[-1].id
+            self.session.merge(models.SearchIndex(record_type=_record_type(model),
+                                                  built_at=built_at))
@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime, timedelta
+from itertools import islice
 from typing import List
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, not_, func, case, literal, types
+from sqlalchemy.orm import aliased
 
 from cg.constants import PRIORITY_MAP
 from cg.store import models
+from cg.store.functions import WholeDaysBetween
+from .loaders import loader_options
 
 
 class StatusHandler:
@@ -63,27 +67,34 @@ class StatusHandler:
         )
         return records
 
-    def families_to_mip_analyze(self, limit: int = 50):
+    def families_to_mip_analyze(self, limit: int = 50, profile: str = None) -> List[models.Family]:
         """Fetch families without analyses where all samples are sequenced."""
 
+        # the samples must external or be sequenced to be analysed
+        sample_has_sequence_data = or_(
+            models.Sample.is_external,
+            models.Sample.sequenced_at.isnot(None),
+        )
+        sample_lacks_sequence_data = and_(
+            or_(models.Sample.is_external.is_(None), models.Sample.is_external == False),
+            models.Sample.sequenced_at.is_(None),
+        )
+        # The data_analysis is unset or not Balsamic only
+        sample_is_not_balsamic = or_(
+            models.Sample.data_analysis.is_(None),
+            models.Sample.data_analysis != 'Balsamic'
+        )
+
         # there are two cases when a sample should be analysed:
         families_q = (
             self.Family.query
-            .outerjoin(models.Analysis)
-            .join(models.Family.links, models.FamilySample.sample)
-            # the samples must external or be sequenced to be analysed
-            .filter(
-                or_(
-                    models.Sample.is_external,
-                    models.Sample.sequenced_at.isnot(None),
-                )
-            )
-            # The data_analysis is unset or not Balsamic only
             .filter(
-                or_(
-                    models.Sample.data_analysis.is_(None),
-                    models.Sample.data_analysis != 'Balsamic'
-                )
+                models.Family.links.any(models.FamilySample.sample.has(
+                    and_(sample_has_sequence_data, sample_is_not_balsamic)
+                )),
+                ~models.Family.links.any(models.FamilySample.sample.has(
+                    sample_lacks_sequence_data
+                )),
             )
             # 1. family that has been analysed but now is requested for re-analysing
             # 2. new family with that haven't been analysed
@@ -92,17 +103,16 @@ class StatusHandler:
                     models.Family.action == 'analyze',
                     and_(
                         models.Family.action.is_(None),
-                        models.Analysis.created_at.is_(None),
+                        ~models.Family.analyses.any(),
                     ),
                 )
             )
             .order_by(models.Family.priority.desc(), models.Family.ordered_at)
+            .limit(limit)
         )
+        families_q = families_q.options(*loader_options(profile)) if profile else families_q
 
-        families = [record for record in families_q if self._all_samples_have_sequence_data(
-            record.links)]
-
-        return families[:limit]
+        return families_q.all()
 
     def cases(self,
               internal_id=None,
@@ -128,275 +138,449 @@ class StatusHandler:
               exclude_uploaded=False,
               exclude_delivered=False,
               exclude_invoiced=False,
+              limit=None,
+              after_tat=None,
+              after_id=None,
               ):
-        """Fetch cases with and w/o analyses"""
-        families_q = self.Family.query
+        """Fetch cases with and w/o analyses, sorted by estimated turnaround time.
+
+        Pass the tat and internal id of the last case on a page as `after_tat` and `after_id`
+        to fetch the next page.
+        """
+        cases_q = self._filter_cases(
+            internal_id=internal_id,
+            name=name,
+            days=days,
+            action=action,
+            priority=priority,
+            customer_id=customer_id,
+            exclude_customer_id=exclude_customer_id,
+            data_analysis=data_analysis,
+            sample_id=sample_id,
+            only_received=only_received,
+            only_prepared=only_prepared,
+            only_sequenced=only_sequenced,
+            only_analysed=only_analysed,
+            only_uploaded=only_uploaded,
+            only_delivered=only_delivered,
+            only_invoiced=only_invoiced,
+            exclude_received=exclude_received,
+            exclude_prepared=exclude_prepared,
+            exclude_sequenced=exclude_sequenced,
+            exclude_analysed=exclude_analysed,
+            exclude_uploaded=exclude_uploaded,
+            exclude_delivered=exclude_delivered,
+            exclude_invoiced=exclude_invoiced,
+            limit=limit,
+            after_tat=after_tat,
+            after_id=after_id,
+        )
+        records = cases_q.all()
+        return self._cases_from_records(records)
+
+    def iter_cases(self, batch_size: int = 1000, **filters):
+        """Stream cases with the same filters and order as `cases`.
+
+        Rows are fetched from the database cursor in batches with constant memory use. Drivers
+        with server side cursors can't run other queries while a result is being streamed, so
+        the sample and flowcell details of each batch are then looked up on a separate
+        connection.
+        """
+        records = iter(self._filter_cases(**filters).yield_per(batch_size))
+        connection = (self.engine.connect() if self.engine.dialect.supports_server_side_cursors
+                      else None)
+        try:
+            batch = list(islice(records, batch_size))
+            while batch:
+                yield from self._cases_from_records(batch, connection=connection)
+                batch = list(islice(records, batch_size))
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _cases_from_records(self, records: list, connection=None) -> List[dict]:
+        """Build the case statuses of aggregated family records."""
+        family_ids = [record.id for record in records]
+        data_analyses = self._cases_data_analyses(family_ids, connection=connection)
+        flowcell_statuses = self._cases_flowcell_statuses(family_ids, connection=connection)
+        return [self._case_from_record(record, data_analyses.get(record.id, set()),
+                                       flowcell_statuses.get(record.id, set()))
+                for record in records]
+
+    def _filter_cases(self,
+                      internal_id=None,
+                      name=None,
+                      days=31,
+                      action=None,
+                      priority=None,
+                      customer_id=None,
+                      exclude_customer_id=None,
+                      data_analysis=None,
+                      sample_id=None,
+                      only_received=False,
+                      only_prepared=False,
+                      only_sequenced=False,
+                      only_analysed=False,
+                      only_uploaded=False,
+                      only_delivered=False,
+                      only_invoiced=False,
+                      exclude_received=False,
+                      exclude_prepared=False,
+                      exclude_sequenced=False,
+                      exclude_analysed=False,
+                      exclude_uploaded=False,
+                      exclude_delivered=False,
+                      exclude_invoiced=False,
+                      limit=None,
+                      after_tat=None,
+                      after_id=None,
+                      ):
+        """Build the aggregated and filtered case query, sorted by estimated turnaround time."""
+        cases_q = self._cases_query()
 
         # family filters
         if days != 0:
             filter_date = datetime.now() - timedelta(days=days)
-            families_q = families_q.filter(models.Family.ordered_at > filter_date)
+            cases_q = cases_q.filter(models.Family.ordered_at > filter_date)
 
         if action:
-            families_q = families_q.filter(models.Family.action == action)
+            cases_q = cases_q.filter(models.Family.action == action)
 
         if priority:
             priority_db = PRIORITY_MAP[priority]
-            families_q = families_q.filter(models.Family.priority == priority_db)
+            cases_q = cases_q.filter(models.Family.priority == priority_db)
 
         if internal_id:
-            families_q = families_q.filter(models.Family.internal_id.like('%' + internal_id + '%'))
+            cases_q = cases_q.filter(models.Family.internal_id.like('%' + internal_id + '%'))
 
         if name:
-            families_q = families_q.filter(models.Family.name.like('%' + name + '%'))
+            cases_q = cases_q.filter(models.Family.name.like('%' + name + '%'))
 
         # customer filters
         if customer_id or exclude_customer_id:
-            families_q = families_q.join(models.Family.customer)
+            cases_q = cases_q.join(models.Family.customer)
 
             if customer_id:
-                families_q = families_q.filter(models.Customer.internal_id == customer_id)
+                cases_q = cases_q.filter(models.Customer.internal_id == customer_id)
 
             if exclude_customer_id:
-                families_q = families_q.filter(models.Customer.internal_id != exclude_customer_id)
+                cases_q = cases_q.filter(models.Customer.internal_id != exclude_customer_id)
 
-        # sample filters
+        # sample filters, the counts should still include all samples of the family
         if data_analysis or sample_id:
-            families_q = families_q.join(models.Family.links, models.FamilySample.sample)
+            sample_filters = []
             if data_analysis:
-                families_q = families_q.filter(models.Sample.data_analysis.like('%' +
-                                                                                data_analysis +
-                                                                                '%'))
+                sample_filters.append(models.Sample.data_analysis.like('%' + data_analysis + '%'))
             if sample_id:
-                families_q = families_q.filter(models.Sample.internal_id.like(sample_id))
-
-        else:
-            families_q = families_q.outerjoin(models.Family.links, models.FamilySample.sample)
-
-        # other joins
-        families_q = families_q.outerjoin(models.Family.analyses, models.Sample.invoice,
-                                          models.Sample.flowcells)
-
-        cases = []
-
-        for record in families_q:
-
-            samples_received = None
-            samples_prepared = None
-            samples_sequenced = None
-            samples_delivered = None
-            samples_invoiced = None
-            samples_received_at = None
-            samples_prepared_at = None
-            samples_sequenced_at = None
-            samples_delivered_at = None
-            samples_invoiced_at = None
-            samples_to_receive = None
-            samples_to_prepare = None
-            samples_to_sequence = None
-            samples_to_deliver = None
-            samples_to_invoice = None
-            samples_received_bool = None
-            samples_prepared_bool = None
-            samples_sequenced_bool = None
-            samples_invoiced_bool = None
-            analysis_completed_at = None
-            analysis_uploaded_at = None
-            analysis_pipeline = None
-            analysis_completed_bool = None
-            analysis_uploaded_bool = None
-            samples_delivered_bool = None
-            samples_data_analyses = None
-            flowcells_status = None
-            flowcells_on_disk = None
-            flowcells_on_disk_bool = None
-            tat = None
-
-            analysis_in_progress = record.action is not None
-            analysis_action = record.action
-
-            total_samples = len(record.links)
-            total_external_samples = len([link.sample.is_external for link in record.links if
-                                          link.sample.is_external])
-            total_internal_samples = total_samples - total_external_samples
-
-            if total_samples > 0:
-                samples_received = len([link.sample.received_at for link in record.links if
-                                        link.sample.received_at is not None])
-                samples_prepared = len([link.sample.prepared_at for link in record.links if
-                                        link.sample.prepared_at is not None])
-                samples_sequenced = len([link.sample.sequenced_at for link in record.links if
-                                         link.sample.sequenced_at is not None])
-                samples_delivered = len([link.sample.delivered_at for link in record.links if
-                                         link.sample.delivered_at is not None])
-                samples_invoiced = len([link.sample.invoice.invoiced_at for link in record.links if
-                                        link.sample.invoice and link.sample.invoice.invoiced_at])
-
-                samples_to_receive = total_internal_samples
-                samples_to_prepare = total_internal_samples
-                samples_to_sequence = total_internal_samples
-                samples_to_deliver = total_samples
-                samples_to_invoice = total_samples - len([link.sample.no_invoice for link in
-                                                          record.links if link.sample.no_invoice])
-
-                samples_received_bool = samples_received == samples_to_receive
-                samples_prepared_bool = samples_prepared == samples_to_prepare
-                samples_sequenced_bool = samples_sequenced == samples_to_sequence
-                samples_delivered_bool = samples_delivered == samples_to_deliver
-                samples_invoiced_bool = samples_invoiced == samples_to_invoice
-                samples_data_analyses = set(link.sample.data_analysis for link in record.links)
-
-                if samples_to_receive > 0 and samples_received_bool:
-                    samples_received_at = max([link.sample.received_at for link in record.links if
-                                               link.sample.received_at is not None])
-
-                if samples_to_prepare > 0 and samples_prepared_bool:
-                    samples_prepared_at = max([link.sample.prepared_at for link in record.links if
-                                               link.sample.prepared_at is not None])
-
-                if samples_to_sequence > 0 and samples_sequenced_bool:
-                    samples_sequenced_at = max([link.sample.sequenced_at for link in record.links if
-                                                link.sample.sequenced_at is not None])
-
-                if samples_to_deliver > 0 and samples_delivered_bool:
-                    samples_delivered_at = max([link.sample.delivered_at for link in record.links if
-                                                link.sample.delivered_at is not None])
-
-                if samples_to_invoice > 0 and samples_invoiced_bool:
-                    samples_invoiced_at = max([link.sample.invoice.invoiced_at for link in
-                                               record.links if link.sample.invoice and
-                                               link.sample.invoice.invoiced_at])
-
-                flowcells = len([flowcell.status
-                                         for link in record.links
-                                         for flowcell in link.sample.flowcells])
-
-                flowcells_status = list(set(flowcell.status
-                                                      for link in record.links
-                                                      for flowcell in link.sample.flowcells))
-                if flowcells < total_samples:
-                    flowcells_status.append('new')
-
-                flowcells_status = ', '.join(flowcells_status)
-
-                flowcells_on_disk = len([flowcell.status
-                                         for link in record.links
-                                         for flowcell in link.sample.flowcells
-                                         if flowcell.status == 'ondisk'])
-
-                flowcells_on_disk_bool = flowcells_on_disk == total_samples
-
-            if record.analyses and not analysis_in_progress:
-                analysis_completed_at = record.analyses[0].completed_at
-                analysis_uploaded_at = record.analyses[0].uploaded_at
-                analysis_pipeline = record.analyses[0].pipeline
-                analysis_completed_bool = analysis_completed_at is not None
-                analysis_uploaded_bool = analysis_uploaded_at is not None
-            elif total_samples > 0:
-                analysis_completed_bool = False
-                analysis_uploaded_bool = False
-
-            if only_received and not samples_received_bool:
-                continue
-
-            if only_prepared and not samples_prepared_bool:
-                continue
-
-            if only_sequenced and not samples_sequenced_bool:
-                continue
-
-            if only_analysed and not analysis_completed_bool:
-                continue
-
-            if only_uploaded and not analysis_uploaded_bool:
-                continue
-
-            if only_delivered and not samples_delivered_bool:
-                continue
-
-            if only_invoiced and not samples_invoiced_bool:
-                continue
-
-            if exclude_received and samples_received_bool:
-                continue
-
-            if exclude_prepared and samples_prepared_bool:
-                continue
-
-            if exclude_sequenced and samples_sequenced_bool:
-                continue
-
-            if exclude_analysed and analysis_completed_bool:
-                continue
-
-            if exclude_uploaded and analysis_uploaded_bool:
-                continue
+                sample_filters.append(models.Sample.internal_id.like(sample_id))
+            cases_q = cases_q.filter(
+                models.Family.links.any(models.FamilySample.sample.has(and_(*sample_filters)))
+            )
 
-            if exclude_delivered and samples_delivered_bool:
-                continue
+        # status filters
+        completed = self._case_completed_expressions()
+        status_filters = [
+            ('samples_received_bool', only_received, exclude_received),
+            ('samples_prepared_bool', only_prepared, exclude_prepared),
+            ('samples_sequenced_bool', only_sequenced, exclude_sequenced),
+            ('analysis_completed_bool', only_analysed, exclude_analysed),
+            ('analysis_uploaded_bool', only_uploaded, exclude_uploaded),
+            ('samples_delivered_bool', only_delivered, exclude_delivered),
+            ('samples_invoiced_bool', only_invoiced, exclude_invoiced),
+        ]
+        for key, only, exclude in status_filters:
+            if only:
+                cases_q = cases_q.having(completed[key])
+            if exclude:
+                cases_q = cases_q.having(not_(completed[key]))
+
+        tat = self._estimated_turnaround_time_expression(datetime.now())
+        tat_label = tat.label('tat')
+        cases_q = cases_q.add_columns(tat_label)
+
+        if after_tat is not None:
+            next_cases = tat < after_tat
+            if after_id:
+                next_cases = or_(
+                    next_cases,
+                    and_(tat == after_tat, models.Family.internal_id < after_id),
+                )
+            cases_q = cases_q.having(next_cases)
+
+        cases_q = cases_q.order_by(tat_label.desc(), models.Family.internal_id.desc())
+        if limit:
+            cases_q = cases_q.limit(limit)
+
+        return cases_q
+
+    def _cases_query(self):
+        """Build a query with one aggregated row of sample and analysis status per family."""
+        flowcells_q = (
+            self.FamilySample.query.with_entities(
+                models.FamilySample.family_id.label('family_id'),
+                func.count(models.Flowcell.id).label('flowcells'),
+                func.count(case([(models.Flowcell.status == 'ondisk', 1)])).label(
+                    'flowcells_on_disk'),
+            )
+            .join(models.FamilySample.sample, models.Sample.flowcells)
+            .group_by(models.FamilySample.family_id)
+            .subquery()
+        )
 
-            if exclude_invoiced and samples_invoiced_bool:
-                continue
+        # the first analysis of the family, same ordering as Family.analyses
+        first_analysis_id = (
+            self.Analysis.query.with_entities(models.Analysis.id)
+            .filter(models.Analysis.family_id == models.Family.id)
+            .order_by(-models.Analysis.completed_at)
+            .limit(1)
+            .correlate(models.Family)
+            .as_scalar()
+        )
 
-            tat = self._calculate_estimated_turnaround_time(
-                samples_received_at,
-                samples_prepared_at,
-                samples_sequenced_at,
-                analysis_completed_at,
-                analysis_uploaded_at,
-                samples_delivered_at
+        family_columns = [
+            models.Family.id,
+            models.Family.internal_id,
+            models.Family.name,
+            models.Family.ordered_at,
+            models.Family.action,
+            models.Analysis.id.label('analysis_id'),
+            models.Analysis.completed_at,
+            models.Analysis.uploaded_at,
+            models.Analysis.pipeline,
+            flowcells_q.c.flowcells,
+            flowcells_q.c.flowcells_on_disk,
+        ]
+
+        query = (
+            self.Family.query.with_entities(
+                *family_columns,
+                func.count(models.FamilySample.id).label('total_samples'),
+                func.count(case([(models.Sample.is_external, 1)])).label(
+                    'total_external_samples'),
+                func.count(case([(models.Sample.no_invoice, 1)])).label('samples_no_invoice'),
+                func.count(models.Sample.received_at).label('samples_received'),
+                func.count(models.Sample.prepared_at).label('samples_prepared'),
+                func.count(models.Sample.sequenced_at).label('samples_sequenced'),
+                func.count(models.Sample.delivered_at).label('samples_delivered'),
+                func.count(models.Invoice.invoiced_at).label('samples_invoiced'),
+                func.max(models.Sample.received_at).label('samples_received_at'),
+                func.max(models.Sample.prepared_at).label('samples_prepared_at'),
+                func.max(models.Sample.sequenced_at).label('samples_sequenced_at'),
+                func.max(models.Sample.delivered_at).label('samples_delivered_at'),
+                func.max(models.Invoice.invoiced_at).label('samples_invoiced_at'),
             )
+            .outerjoin(models.Family.links, models.FamilySample.sample, models.Sample.invoice)
+            .outerjoin(models.Analysis, models.Analysis.id == first_analysis_id)
+            .outerjoin(flowcells_q, flowcells_q.c.family_id == models.Family.id)
+            .group_by(*family_columns)
+        )
+        return query
 
-            case = {
-                'internal_id': record.internal_id,
-                'name': record.name,
-                'ordered_at': record.ordered_at,
-                'total_samples': total_samples,
-                'total_external_samples': total_external_samples,
-                'total_internal_samples': total_internal_samples,
-                'samples_to_receive': samples_to_receive,
-                'samples_to_prepare': samples_to_prepare,
-                'samples_to_sequence': samples_to_sequence,
-                'samples_to_deliver': samples_to_deliver,
-                'samples_to_invoice': samples_to_invoice,
-                'samples_data_analyses': samples_data_analyses,
-                'samples_received': samples_received,
-                'samples_prepared': samples_prepared,
-                'samples_sequenced': samples_sequenced,
-                'samples_received_at': samples_received_at,
-                'samples_prepared_at': samples_prepared_at,
-                'samples_sequenced_at': samples_sequenced_at,
-                'samples_delivered_at': samples_delivered_at,
-                'samples_invoiced_at': samples_invoiced_at,
-                'analysis_action': analysis_action,
-                'analysis_completed_at': analysis_completed_at,
-                'analysis_uploaded_at': analysis_uploaded_at,
-                'samples_delivered': samples_delivered,
-                'samples_invoiced': samples_invoiced,
-                'analysis_pipeline': analysis_pipeline,
-                'samples_received_bool': samples_received_bool,
-                'samples_prepared_bool': samples_prepared_bool,
-                'samples_sequenced_bool': samples_sequenced_bool,
-                'analysis_completed_bool': analysis_completed_bool,
-                'analysis_uploaded_bool': analysis_uploaded_bool,
-                'samples_delivered_bool': samples_delivered_bool,
-                'samples_invoiced_bool': samples_invoiced_bool,
-                'flowcells_status': flowcells_status,
-                'flowcells_on_disk': flowcells_on_disk,
-                'flowcells_on_disk_bool': flowcells_on_disk_bool,
-                'tat': tat,
-            }
-
-            cases.append(case)
-
-        cases_sorted = sorted(cases, key=lambda k: k['tat'], reverse=True)
-
-        return cases_sorted
+    @staticmethod
+    def _case_completed_expressions() -> dict:
+        """Build SQL expressions for the completed states of an aggregated case."""
+        total_samples = func.count(models.FamilySample.id)
+        total_internal_samples = total_samples - func.count(case([(models.Sample.is_external,
+                                                                    1)]))
+        samples_to_invoice = total_samples - func.count(case([(models.Sample.no_invoice, 1)]))
+        analysis_done = and_(models.Family.action.is_(None), models.Analysis.id.isnot(None))
+
+        return {
+            'samples_received_bool': and_(
+                total_samples > 0,
+                func.count(models.Sample.received_at) == total_internal_samples,
+            ),
+            'samples_prepared_bool': and_(
+                total_samples > 0,
+                func.count(models.Sample.prepared_at) == total_internal_samples,
+            ),
+            'samples_sequenced_bool': and_(
+                total_samples > 0,
+                func.count(models.Sample.sequenced_at) == total_internal_samples,
+            ),
+            'samples_delivered_bool': and_(
+                total_samples > 0,
+                func.count(models.Sample.delivered_at) == total_samples,
+            ),
+            'samples_invoiced_bool': and_(
+                total_samples > 0,
+                func.count(models.Invoice.invoiced_at) == samples_to_invoice,
+            ),
+            'analysis_completed_bool': and_(analysis_done,
+                                            models.Analysis.completed_at.isnot(None)),
+            'analysis_uploaded_bool': and_(analysis_done,
+                                           models.Analysis.uploaded_at.isnot(None)),
+        }
+
+    def _cases_data_analyses(self, family_ids: List[int], connection=None) -> dict:
+        """Fetch the set of sample data analyses for each family."""
+        data_analyses = {}
+        if not family_ids:
+            return data_analyses
+        query = (
+            self.FamilySample.query.with_entities(models.FamilySample.family_id,
+                                                 models.Sample.data_analysis)
+            .join(models.FamilySample.sample)
+            .filter(models.FamilySample.family_id.in_(family_ids))
+            .distinct()
+        )
+        rows = connection.execute(query.statement) if connection else query
+        for family_id, data_analysis in rows:
+            data_analyses.setdefault(family_id, set()).add(data_analysis)
+        return data_analyses
+
+    def _cases_flowcell_statuses(self, family_ids: List[int], connection=None) -> dict:
+        """Fetch the set of flowcell statuses for each family."""
+        flowcell_statuses = {}
+        if not family_ids:
+            return flowcell_statuses
+        query = (
+            self.FamilySample.query.with_entities(models.FamilySample.family_id,
+                                                 models.Flowcell.status)
+            .join(models.FamilySample.sample, models.Sample.flowcells)
+            .filter(models.FamilySample.family_id.in_(family_ids))
+            .distinct()
+        )
+        rows = connection.execute(query.statement) if connection else query
+        for family_id, flowcell_status in rows:
+            flowcell_statuses.setdefault(family_id, set()).add(flowcell_status)
+        return flowcell_statuses
 
     @staticmethod
-    def _all_samples_have_sequence_data(links: List[models.FamilySample]) -> bool:
-        """Return True if all samples are external or sequenced inhouse."""
-        return all((link.sample.sequenced_at or link.sample.is_external) for link in links)
+    def _case_from_record(record, data_analyses: set, flowcell_statuses: set) -> dict:
+        """Build the case status from an aggregated family record."""
+        samples_received = None
+        samples_prepared = None
+        samples_sequenced = None
+        samples_delivered = None
+        samples_invoiced = None
+        samples_received_at = None
+        samples_prepared_at = None
+        samples_sequenced_at = None
+        samples_delivered_at = None
+        samples_invoiced_at = None
+        samples_to_receive = None
+        samples_to_prepare = None
+        samples_to_sequence = None
+        samples_to_deliver = None
+        samples_to_invoice = None
+        samples_received_bool = None
+        samples_prepared_bool = None
+        samples_sequenced_bool = None
+        samples_invoiced_bool = None
+        analysis_completed_at = None
+        analysis_uploaded_at = None
+        analysis_pipeline = None
+        analysis_completed_bool = None
+        analysis_uploaded_bool = None
+        samples_delivered_bool = None
+        samples_data_analyses = None
+        flowcells_status = None
+        flowcells_on_disk = None
+        flowcells_on_disk_bool = None
+
+        analysis_in_progress = record.action is not None
+        analysis_action = record.action
+
+        total_samples = record.total_samples
+        total_external_samples = record.total_external_samples
+        total_internal_samples = total_samples - total_external_samples
+
+        if total_samples > 0:
+            samples_received = record.samples_received
+            samples_prepared = record.samples_prepared
+            samples_sequenced = record.samples_sequenced
+            samples_delivered = record.samples_delivered
+            samples_invoiced = record.samples_invoiced
+
+            samples_to_receive = total_internal_samples
+            samples_to_prepare = total_internal_samples
+            samples_to_sequence = total_internal_samples
+            samples_to_deliver = total_samples
+            samples_to_invoice = total_samples - record.samples_no_invoice
+
+            samples_received_bool = samples_received == samples_to_receive
+            samples_prepared_bool = samples_prepared == samples_to_prepare
+            samples_sequenced_bool = samples_sequenced == samples_to_sequence
+            samples_delivered_bool = samples_delivered == samples_to_deliver
+            samples_invoiced_bool = samples_invoiced == samples_to_invoice
+            samples_data_analyses = data_analyses
+
+            if samples_to_receive > 0 and samples_received_bool:
+                samples_received_at = record.samples_received_at
+
+            if samples_to_prepare > 0 and samples_prepared_bool:
+                samples_prepared_at = record.samples_prepared_at
+
+            if samples_to_sequence > 0 and samples_sequenced_bool:
+                samples_sequenced_at = record.samples_sequenced_at
+
+            if samples_to_deliver > 0 and samples_delivered_bool:
+                samples_delivered_at = record.samples_delivered_at
+
+            if samples_to_invoice > 0 and samples_invoiced_bool:
+                samples_invoiced_at = record.samples_invoiced_at
+
+            flowcells = record.flowcells or 0
+            flowcells_status = sorted(flowcell_statuses)
+            if flowcells < total_samples:
+                flowcells_status.append('new')
+
+            flowcells_status = ', '.join(flowcells_status)
+
+            flowcells_on_disk = record.flowcells_on_disk or 0
+
+            flowcells_on_disk_bool = flowcells_on_disk == total_samples
+
+        if record.analysis_id is not None and not analysis_in_progress:
+            analysis_completed_at = record.completed_at
+            analysis_uploaded_at = record.uploaded_at
+            analysis_pipeline = record.pipeline
+            analysis_completed_bool = analysis_completed_at is not None
+            analysis_uploaded_bool = analysis_uploaded_at is not None
+        elif total_samples > 0:
+            analysis_completed_bool = False
+            analysis_uploaded_bool = False
+
+        return {
+            'internal_id': record.internal_id,
+            'name': record.name,
+            'ordered_at': record.ordered_at,
+            'total_samples': total_samples,
+            'total_external_samples': total_external_samples,
+            'total_internal_samples': total_internal_samples,
+            'samples_to_receive': samples_to_receive,
+            'samples_to_prepare': samples_to_prepare,
+            'samples_to_sequence': samples_to_sequence,
+            'samples_to_deliver': samples_to_deliver,
+            'samples_to_invoice': samples_to_invoice,
+            'samples_data_analyses': samples_data_analyses,
+            'samples_received': samples_received,
+            'samples_prepared': samples_prepared,
+            'samples_sequenced': samples_sequenced,
+            'samples_received_at': samples_received_at,
+            'samples_prepared_at': samples_prepared_at,
+            'samples_sequenced_at': samples_sequenced_at,
+            'samples_delivered_at': samples_delivered_at,
+            'samples_invoiced_at': samples_invoiced_at,
+            'analysis_action': analysis_action,
+            'analysis_completed_at': analysis_completed_at,
+            'analysis_uploaded_at': analysis_uploaded_at,
+            'samples_delivered': samples_delivered,
+            'samples_invoiced': samples_invoiced,
+            'analysis_pipeline': analysis_pipeline,
+            'samples_received_bool': samples_received_bool,
+            'samples_prepared_bool': samples_prepared_bool,
+            'samples_sequenced_bool': samples_sequenced_bool,
+            'analysis_completed_bool': analysis_completed_bool,
+            'analysis_uploaded_bool': analysis_uploaded_bool,
+            'samples_delivered_bool': samples_delivered_bool,
+            'samples_invoiced_bool': samples_invoiced_bool,
+            'flowcells_status': flowcells_status,
+            'flowcells_on_disk': flowcells_on_disk,
+            'flowcells_on_disk_bool': flowcells_on_disk_bool,
+            'tat': record.tat,
+        }
 
     def analyses_to_upload(self):
         """Fetch analyses that haven't been uploaded."""
@@ -507,39 +691,84 @@ class StatusHandler:
         """Fetch samples that should be invoiced.
 
         Return samples have been delivered but invoiced, excluding those that
-        have been marked to skip invoicing.
+        have been marked to skip invoicing, and the customers with samples to invoice.
         """
-        records = (
-            self.Sample.query.filter(
-                models.Sample.delivered_at != None,
-                models.Sample.invoice_id == None,
-                models.Sample.no_invoice == False,
-                models.Sample.downsampled_to == None
-            )
-        )
-        customers_to_invoice = [record.customer for record in records.all() if
-                                not record.customer.internal_id == 'cust000']
-        customers_to_invoice = list(set(customers_to_invoice))
+        records = self.Sample.query.filter(*self._sample_invoice_criteria())
+        customers_to_invoice = [row for row in self.customers_to_invoice() if row.samples]
         records = records.filter(models.Sample.customer == customer) if customer else records
         return records, customers_to_invoice
 
     def pools_to_invoice(self, customer: models.Customer = None):
         """
-        Fetch pools that should be invoiced.
+        Fetch pools that should be invoiced, and the customers with pools to invoice.
+        """
+        records = self.Pool.query.filter(*self._pool_invoice_criteria())
+        customers_to_invoice = [row for row in self.customers_to_invoice() if row.pools]
+        records = records.filter(models.Pool.customer_id == customer.id) if customer else records
+        return records, customers_to_invoice
+
+    def customers_to_invoice(self):
+        """Fetch customers with samples or pools to invoice.
+
+        Each row holds the customer with the number and the total standard price of its
+        samples and pools that should be invoiced.
         """
+        samples_q = self._pending_invoice_totals(self.Sample, models.Sample,
+                                                 self._sample_invoice_criteria())
+        pools_q = self._pending_invoice_totals(self.Pool, models.Pool,
+                                               self._pool_invoice_criteria())
+        customer = aliased(models.Customer, name='customer')
         records = (
-            self.Pool.query.filter(
-                models.Pool.invoice_id == None,
-                models.Pool.no_invoice == False,
-                models.Pool.delivered_at != None
+            self.Customer.query
+            .with_entities(
+                customer,
+                func.coalesce(samples_q.c.records, 0).label('samples'),
+                func.coalesce(samples_q.c.price, 0).label('samples_price'),
+                func.coalesce(pools_q.c.records, 0).label('pools'),
+                func.coalesce(pools_q.c.price, 0).label('pools_price'),
             )
+            .outerjoin(samples_q, samples_q.c.customer_id == customer.id)
+            .outerjoin(pools_q, pools_q.c.customer_id == customer.id)
+            .filter(
+                or_(samples_q.c.records != None, pools_q.c.records != None),
+                customer.internal_id != 'cust000',
+            )
+            .order_by(customer.internal_id)
         )
+        return records.all()
 
-        customers_to_invoice = [record.customer for record in records.all() if
-                                not record.customer.internal_id == 'cust000']
-        customers_to_invoice = list(set(customers_to_invoice))
-        records = records.filter(models.Pool.customer_id == customer.id) if customer else records
-        return records, customers_to_invoice
+    @staticmethod
+    def _sample_invoice_criteria():
+        return (
+            models.Sample.delivered_at != None,
+            models.Sample.invoice_id == None,
+            models.Sample.no_invoice == False,
+            models.Sample.downsampled_to == None,
+        )
+
+    @staticmethod
+    def _pool_invoice_criteria():
+        return (
+            models.Pool.invoice_id == None,
+            models.Pool.no_invoice == False,
+            models.Pool.delivered_at != None,
+        )
+
+    @staticmethod
+    def _pending_invoice_totals(model_query, model, criteria):
+        """Count and sum the standard price of records per customer."""
+        return (
+            model_query.query
+            .join(model.application_version)
+            .with_entities(
+                model.customer_id,
+                func.count(model.id).label('records'),
+                func.sum(models.ApplicationVersion.price_standard).label('price'),
+            )
+            .filter(*criteria)
+            .group_by(model.customer_id)
+            .subquery()
+        )
 
     def pools_to_receive(self):
         """Fetch pools that have been not yet been received."""
@@ -626,32 +855,43 @@ class StatusHandler:
         )
         return records
 
-    def _calculate_estimated_turnaround_time(self,
-                                             samples_received_at,
-                                             samples_prepared_at,
-                                             samples_sequenced_at,
-                                             analysis_completed_at,
-                                             analysis_uploaded_at,
-                                             samples_delivered_at
-                                             ):
-
-        if samples_received_at and samples_delivered_at:
-            return self._calculate_date_delta(None, samples_received_at, samples_delivered_at)
-
-        r_p = self._calculate_date_delta(4, samples_received_at, samples_prepared_at)
-        p_s = self._calculate_date_delta(5, samples_prepared_at, samples_sequenced_at)
-        s_a = self._calculate_date_delta(4, samples_sequenced_at, analysis_completed_at)
-        a_u = self._calculate_date_delta(1, analysis_completed_at, analysis_uploaded_at)
-        u_d = self._calculate_date_delta(2, analysis_uploaded_at, samples_delivered_at)
-
-        return r_p + p_s + s_a + a_u + u_d
+    @classmethod
+    def _estimated_turnaround_time_expression(cls, now: datetime):
+        """Build a SQL expression for the estimated turnaround time of an aggregated case."""
+        completed = cls._case_completed_expressions()
+        total_internal_samples = (func.count(models.FamilySample.id) -
+                                  func.count(case([(models.Sample.is_external, 1)])))
+        analysis_done = models.Family.action.is_(None)
+
+        samples_received_at = case([(and_(total_internal_samples > 0,
+                                          completed['samples_received_bool']),
+                                     func.max(models.Sample.received_at))])
+        samples_prepared_at = case([(and_(total_internal_samples > 0,
+                                          completed['samples_prepared_bool']),
+                                     func.max(models.Sample.prepared_at))])
+        samples_sequenced_at = case([(and_(total_internal_samples > 0,
+                                           completed['samples_sequenced_bool']),
+                                      func.max(models.Sample.sequenced_at))])
+        samples_delivered_at = case([(completed['samples_delivered_bool'],
+                                      func.max(models.Sample.delivered_at))])
+        analysis_completed_at = case([(analysis_done, models.Analysis.completed_at)])
+        analysis_uploaded_at = case([(analysis_done, models.Analysis.uploaded_at)])
+
+        r_p = cls._date_delta_expression(4, samples_received_at, samples_prepared_at, now)
+        p_s = cls._date_delta_expression(5, samples_prepared_at, samples_sequenced_at, now)
+        s_a = cls._date_delta_expression(4, samples_sequenced_at, analysis_completed_at, now)
+        a_u = cls._date_delta_expression(1, analysis_completed_at, analysis_uploaded_at, now)
+        u_d = cls._date_delta_expression(2, analysis_uploaded_at, samples_delivered_at, now)
+
+        return case(
+            [(and_(samples_received_at.isnot(None), samples_delivered_at.isnot(None)),
+              WholeDaysBetween(samples_received_at, samples_delivered_at))],
+            else_=r_p + p_s + s_a + a_u + u_d,
+        )
 
     @staticmethod
-    def _calculate_date_delta(default, first_date, last_date):
-        # calculates date delta between two dates, assumes last_date is today if missing
-        delta = default
-        if not last_date:
-            last_date = datetime.now()
-        if first_date:
-            delta = (last_date - first_date).days
-        return delta
+    def _date_delta_expression(default, first_date, last_date, now: datetime):
+        # calculates date delta between two dates, assumes last_date is now if missing
+        last_date = func.coalesce(last_date, literal(now, types.DateTime))
+        return case([(first_date.is_(None), default)],
+                    else_=WholeDaysBetween(first_date, last_date))
@@ -1,13 +1,106 @@
 import datetime as dt
-from itertools import groupby
+from itertools import chain, groupby
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import func, text
+from sqlalchemy import and_, event, func, inspect, or_, select
+from sqlalchemy.orm import Session
 
 from cg.store import models
+from cg.store.functions import DaysBetween, Month
 
 MONTHS = {1: 'January', 2: 'February', 3: 'March', 4: 'April', 5: 'May', 6: 'June',
           7: 'July', 8: 'August', 9: 'September', 10: 'October', 11: 'November', 12: 'December'}
 
+# turnaround times in the rollup, from first to last date
+TREND_INTERVALS = {
+    'received_to_delivered': (models.Sample.received_at, models.Sample.delivered_at),
+    'received_to_prepped': (models.Sample.received_at, models.Sample.prepared_at),
+    'prepped_to_sequenced': (models.Sample.prepared_at, models.Sample.sequenced_at),
+    'sequenced_to_delivered': (models.Sample.sequenced_at, models.Sample.delivered_at),
+    'delivered_to_invoiced': (models.Sample.delivered_at, models.Invoice.invoiced_at),
+}
+# changes to these sample attributes make the rollup of the month the sample was received stale
+TREND_ATTRIBUTES = ('received_at', 'prepared_at', 'sequenced_at', 'delivered_at', 'invoice',
+                    'invoice_id', 'customer', 'customer_id', 'application_version',
+                    'application_version_id')
+
+
+def _refresh_trend_month(session: Session, year: int, month: int):
+    """Recompute the rollup rows of one month from the samples received that month."""
+    start = dt.datetime(year, month, 1)
+    columns = [
+        models.Application.category.label('category'),
+        models.Customer.priority.label('priority'),
+        func.count(models.Sample.id).label('samples'),
+    ]
+    for name, (first, last) in TREND_INTERVALS.items():
+        days = DaysBetween(first, last)
+        columns.append(func.sum(days).label(f"{name}_days"))
+        columns.append(func.count(days).label(f"{name}_samples"))
+    query = (
+        session.query(*columns)
+            .select_from(models.Sample)
+            .join(models.Customer, models.Sample.customer_id == models.Customer.id)
+            .join(models.ApplicationVersion,
+                  models.Sample.application_version_id == models.ApplicationVersion.id)
+            .join(models.Application,
+                  models.ApplicationVersion.application_id == models.Application.id)
+            .outerjoin(models.Invoice, models.Sample.invoice_id == models.Invoice.id)
+            .filter(
+                models.Sample.received_at >= start,
+                models.Sample.received_at < start + relativedelta(months=1),
+            )
+            .group_by(models.Application.category, models.Customer.priority)
+    )
+
+    trend_table = models.SampleTrend.__table__
+    session.execute(trend_table.delete().where(and_(trend_table.c.year == year,
+                                                    trend_table.c.month == month)))
+    now = dt.datetime.now()
+    rows = [dict(row, year=year, month=month, updated_at=now)
+            for row in session.execute(query.statement)]
+    if rows:
+        session.execute(trend_table.insert(), rows)
+    session.merge(models.SampleTrendMonth(year=year, month=month, stale=False, updated_at=now))
+
+
+def _mark_stale_trends(session, flush_context, instances):
+    """Mark the months of the rollup with samples changed by the flush as stale, to be rebuilt
+    later."""
+    stale = set()
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, models.Sample):
+            state = inspect(instance)
+            if instance in session.dirty and not any(state.attrs[attribute].history.has_changes()
+                                                     for attribute in TREND_ATTRIBUTES):
+                continue
+            received = state.attrs.received_at.load_history()
+            dates = list(chain(received.added, received.unchanged, received.deleted))
+            if received.added and not received.deleted and state.has_identity:
+                # the previous date is not kept when an expired attribute is set
+                dates.append(session.execute(
+                    select([models.Sample.received_at]).where(models.Sample.id == instance.id)
+                ).scalar())
+        elif isinstance(instance, models.Invoice) and instance not in session.new:
+            if not inspect(instance).attrs.invoiced_at.history.has_changes():
+                continue
+            dates = (sample_obj.received_at for sample_obj in instance.samples)
+        else:
+            continue
+        stale.update((date.year, date.month) for date in dates if date)
+
+    if not stale:
+        return
+    month_table = models.SampleTrendMonth.__table__
+    session.execute(month_table.update().where(or_(*[
+        and_(month_table.c.year == year, month_table.c.month == month)
+        for year, month in stale
+    ])).values(stale=True))
+
+
+def listen_for_trend_changes(session_class):
+    """Mark the rollup stale when the sessions of a class change the trends of samples."""
+    event.listen(session_class, 'before_flush', _mark_stale_trends)
+
 
 class TrendsHandler:
 
@@ -27,233 +120,183 @@ class TrendsHandler:
     def get_until_date(year):
         return TrendsHandler.get_last_day_of_year(int(year))
 
-    def samples_per_month(self, year):
-        """Fetch samples per month. Grouped by priority."""
-        query = (
-            self.session.query(
-                models.Customer.priority.label('priority'),
-                func.month(models.Sample.received_at).label('month_no'),
-                func.count(models.Sample.id).label('count'),
-            )
-                .join(models.Sample.customer)
-                .filter(models.Sample.received_at > self.get_from_date(year),
-                        models.Sample.received_at < self.get_until_date(year))
-                .group_by('priority','month_no')
-        )
+    def refresh_trends(self, year: int, month: int = None):
+        """Recompute the monthly trend rollup of a year, or of one month of it."""
+        for month_no in [month] if month else MONTHS:
+            _refresh_trend_month(self.session, int(year), month_no)
 
-        for cust_priority, results in groupby(query, key=lambda result: result.priority):
-            counts = {MONTHS[result.month_no]: result.count for result in results}
-            data = {
-                'name': cust_priority,
-                'results': {month : counts.get(month) or None
-                 for month in MONTHS.values()},
-            }
-            yield data
+    def refresh_stale_trends(self) -> list:
+        """Recompute the months of the rollup whose samples have changed."""
+        stale_months = [(month_obj.year, month_obj.month) for month_obj in
+                        self.SampleTrendMonth.query.filter_by(stale=True)]
+        for year, month in stale_months:
+            _refresh_trend_month(self.session, year, month)
+        return stale_months
 
-    def samples_per_month_application(self, year):
-        """Fetch samples per month. Grouped by application cathegory."""
+    def _from_rollup(self, year) -> bool:
+        """Past years are served from the rollup once all their months are built and fresh,
+        from the samples until then."""
+        year = int(year)
+        if year >= dt.date.today().year:
+            return False
+        fresh_months = self.SampleTrendMonth.query.filter_by(year=year, stale=False).count()
+        return fresh_months == len(MONTHS)
 
+    def _rollup_samples(self, year, group_column, *criteria):
+        """Sum the received samples of a past year per month."""
         query = (
             self.session.query(
-                models.Application.category.label('category'),
-                func.month(models.Sample.received_at).label('month_no'),
-                func.count(models.Sample.id).label('count'),
+                group_column.label('name'),
+                models.SampleTrend.month.label('month_no'),
+                func.sum(models.SampleTrend.samples).label('count'),
             )
-                .join(
-                models.Sample.application_version,
-                models.ApplicationVersion.application,
-            )
-                .filter(
-                models.Sample.received_at > self.get_from_date(year),
-                models.Sample.received_at < self.get_until_date(year),
-                models.Sample.received_at,
-                models.Application.category,
-            )
-                .group_by('category', 'month_no')
+                .filter(models.SampleTrend.year == int(year), *criteria)
+                .group_by(group_column, models.SampleTrend.month)
+                .order_by(group_column)
         )
-
-        for application_cathegory, results in groupby(query, key=lambda result: result.category):
+        for name, results in groupby(query, key=lambda result: result.name):
             counts = {MONTHS[result.month_no]: result.count for result in results}
-            data = {
-                'name': application_cathegory,
-                'results': {month : counts.get(month) or None
-                 for month in MONTHS.values()},
+            yield {
+                'name': name,
+                'results': {month: counts.get(month) or None for month in MONTHS.values()},
             }
-            yield data
-    
 
-    def received_to_delivered(self, year):
-        """Calculate averages from received to delivered."""
+    def _rollup_averages(self, year, interval: str):
+        """Average the turnaround times of diagnostic samples of a past year per month."""
+        days = getattr(models.SampleTrend, f"{interval}_days")
+        samples = getattr(models.SampleTrend, f"{interval}_samples")
         query = (
             self.session.query(
-                models.Application.category.label('category'),
-                func.month(models.Sample.received_at).label('month_no'),
-                (func.avg(func.datediff(models.Sample.delivered_at, models.Sample.received_at))
-                 .label('average')),
-            )
-                .join(
-                models.Sample.customer,
-                models.Sample.application_version,
-                models.ApplicationVersion.application,
+                models.SampleTrend.category.label('category'),
+                models.SampleTrend.month.label('month_no'),
+                func.sum(days).label('days'),
+                func.sum(samples).label('samples'),
             )
                 .filter(
-                models.Customer.priority == 'diagnostic',
-                models.Sample.received_at > self.get_from_date(year),
-                models.Sample.received_at < self.get_until_date(year),
-                models.Sample.delivered_at is not None,
-            )
-                .group_by(
-                models.Application.category,
-                func.month(models.Sample.received_at),
+                models.SampleTrend.year == int(year),
+                models.SampleTrend.priority == 'diagnostic',
             )
+                .group_by(models.SampleTrend.category, models.SampleTrend.month)
+                .having(func.sum(samples) > 0)
+                .order_by(models.SampleTrend.category)
         )
         for category, results in groupby(query, key=lambda result: result.category):
-            averages = {MONTHS[result.month_no]: float(result.average) if result.average else None
+            averages = {MONTHS[result.month_no]: float(result.days) / float(result.samples)
                         for result in results}
             yield {
                 'name': category,
-                'results': {month : averages.get(month) or None
-                 for month in MONTHS.values()}
+                'results': {month: averages.get(month) or None for month in MONTHS.values()}
             }
 
-    def received_to_prepped(self, year):
-        """Calculate averages to prepp samples."""
+    @staticmethod
+    def _received_in(year) -> list:
+        """Filter samples received within a calendar year."""
+        start = dt.datetime(int(year), 1, 1)
+        return [
+            models.Sample.received_at >= start,
+            models.Sample.received_at < start + relativedelta(years=1),
+        ]
+
+    def _live_samples(self, year, group_column, *criteria):
+        """Count the samples received per month of the current year."""
+        month = Month(models.Sample.received_at)
         query = (
-            self.session.query(
-                models.Application.category.label('category'),
-                func.month(models.Sample.received_at).label('month_no'),
-                (func.avg(func.datediff(models.Sample.prepared_at, models.Sample.received_at))
-                 .label('average')),
+            self.Sample.query.with_entities(
+                group_column.label('name'),
+                month.label('month_no'),
+                func.count(models.Sample.id).label('count'),
             )
+                .select_from(models.Sample)
                 .join(
                 models.Sample.customer,
                 models.Sample.application_version,
                 models.ApplicationVersion.application,
             )
-                .filter(
-                models.Customer.priority == 'diagnostic',
-                models.Sample.received_at > self.get_from_date(year),
-                models.Sample.received_at < self.get_until_date(year),
-            )
-                .group_by(
-                models.Application.category,
-                func.month(models.Sample.received_at),
-            )
+                .filter(*self._received_in(year), *criteria)
+                .group_by(group_column, month)
+                .order_by(group_column)
         )
-        for category, results in groupby(query, key=lambda result: result.category):
-            averages = {MONTHS[result.month_no]: float(result.average) if result.average else None
-                        for result in results}
+        for name, results in groupby(query, key=lambda result: result.name):
+            counts = {MONTHS[result.month_no]: result.count for result in results}
             yield {
-                'name': category,
-                'results': {month : averages.get(month) or None
-                 for month in MONTHS.values()}
+                'name': name,
+                'results': {month: counts.get(month) or None for month in MONTHS.values()},
             }
 
-    def prepped_to_sequenced(self, year):
-        """Calculate average to sequence samples."""
+    def _live_averages(self, year, interval: str):
+        """Average the turnaround times of diagnostic samples per month of the current year."""
+        first, last = TREND_INTERVALS[interval]
+        month = Month(models.Sample.received_at)
         query = (
-            self.session.query(
+            self.Sample.query.with_entities(
                 models.Application.category.label('category'),
-                func.month(models.Sample.received_at).label('month_no'),
-                func.avg(
-                    func.datediff(models.Sample.sequenced_at, models.Sample.prepared_at)).label(
-                    'average'),
+                month.label('month_no'),
+                func.avg(DaysBetween(first, last)).label('average'),
             )
+                .select_from(models.Sample)
                 .join(
                 models.Sample.customer,
                 models.Sample.application_version,
                 models.ApplicationVersion.application,
             )
+        )
+        if last is models.Invoice.invoiced_at:
+            query = query.join(models.Sample.invoice)
+        query = (
+            query
                 .filter(
                 models.Customer.priority == 'diagnostic',
-                models.Sample.received_at > self.get_from_date(year),
-                models.Sample.received_at < self.get_until_date(year),
-            )
-                .group_by(
-                models.Application.category,
-                func.month(models.Sample.received_at),
+                *self._received_in(year),
+                first.isnot(None),
+                last.isnot(None),
             )
+                .group_by(models.Application.category, month)
+                .order_by(models.Application.category)
         )
         for category, results in groupby(query, key=lambda result: result.category):
             averages = {MONTHS[result.month_no]: float(result.average) if result.average else None
                         for result in results}
             yield {
                 'name': category,
-                'results': {month : averages.get(month) or None
-                 for month in MONTHS.values()}
+                'results': {month: averages.get(month) or None for month in MONTHS.values()}
             }
 
+    def samples_per_month(self, year):
+        """Fetch samples per month. Grouped by priority."""
+        if self._from_rollup(year):
+            return self._rollup_samples(year, models.SampleTrend.priority)
+        return self._live_samples(year, models.Customer.priority)
+
+    def samples_per_month_application(self, year):
+        """Fetch samples per month. Grouped by application cathegory."""
+        if self._from_rollup(year):
+            return self._rollup_samples(year, models.SampleTrend.category,
+                                        models.SampleTrend.category.isnot(None))
+        return self._live_samples(year, models.Application.category,
+                                  models.Application.category.isnot(None))
+
+    def received_to_delivered(self, year):
+        """Calculate averages from received to delivered."""
+        return self._averages(year, 'received_to_delivered')
+
+    def received_to_prepped(self, year):
+        """Calculate averages to prepp samples."""
+        return self._averages(year, 'received_to_prepped')
+
+    def prepped_to_sequenced(self, year):
+        """Calculate average to sequence samples."""
+        return self._averages(year, 'prepped_to_sequenced')
+
     def sequenced_to_delivered(self, year):
         """Calculate average to deliver samples."""
-        query = (
-            self.session.query(
-                models.Application.category.label('category'),
-                func.month(models.Sample.received_at).label('month_no'),
-                func.avg(
-                    func.datediff(models.Sample.delivered_at, models.Sample.sequenced_at)).label(
-                    'average'),
-            )
-                .join(
-                models.Sample.customer,
-                models.Sample.application_version,
-                models.ApplicationVersion.application,
-            )
-                .filter(
-                models.Customer.priority == 'diagnostic',
-                models.Sample.received_at > self.get_from_date(year),
-                models.Sample.received_at < self.get_until_date(year),
-                models.Sample.delivered_at is not None,
-            )
-                .group_by(
-                models.Application.category,
-                func.month(models.Sample.received_at),
-            )
-        )
-        for category, results in groupby(query, key=lambda result: result.category):
-            averages = {MONTHS[result.month_no]: float(result.average) if result.average else None
-                        for result in results}
-            yield {
-                'name': category,
-                'results': {month : averages.get(month) or None
-                 for month in MONTHS.values()}
-            }
+        return self._averages(year, 'sequenced_to_delivered')
 
     def delivered_to_invoiced(self, year):
         """Calculate average time to invoice samples."""
-        query = (
-            self.session.query(
-                models.Application.category.label('category'),
-                func.month(models.Sample.received_at).label('month_no'),
-                func.avg(
-                    func.datediff(models.Invoice.invoiced_at,
-                                  models.Sample.delivered_at)).label(
-                    'average'),
-            )
-                .join(
-                models.Sample.customer,
-                models.Sample.application_version,
-                models.ApplicationVersion.application,
-                models.Sample.invoice,
-            )
-                .filter(
-                models.Customer.priority == 'diagnostic',
-                models.Sample.received_at > self.get_from_date(year),
-                models.Sample.received_at < self.get_until_date(year),
-                models.Sample.delivered_at is not None,
-                models.Sample.invoice is not None,
-                models.Sample.invoice_id is not None,
-                models.Invoice.invoiced_at is not None,
-            )
-                .group_by(
-                models.Application.category,
-                func.month(models.Sample.received_at),
-            )
-        )
-        for category, results in groupby(query, key=lambda result: result.category):
-            averages = {MONTHS[result.month_no]: float(result.average) if result.average else None
-                        for result in results}
-            yield {
-                'name': category,
-                'results': {month : averages.get(month) or None
-                 for month in MONTHS.values()}
-            }
+        return self._averages(year, 'delivered_to_invoiced')
+
+    def _averages(self, year, interval: str):
+        """Average a turnaround time per application category and month."""
+        if self._from_rollup(year):
+            return self._rollup_averages(year, interval)
+        return self._live_averages(year, interval)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""SQL functions that need different implementations for different database dialects."""
+from sqlalchemy import types
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class DaysBetween(FunctionElement):
+    """Number of calendar days from the first to the last date, like DATEDIFF of MySQL."""
+    type = types.Integer()
+    name = 'days_between'
+
+
+@compiles(DaysBetween)
+def _days_between_default(element, compiler, **kwargs):
+    first_date, last_date = list(element.clauses)
+    return (f"DATEDIFF({compiler.process(last_date, **kwargs)}, "
+            f"{compiler.process(first_date, **kwargs)})")
+
+
+@compiles(DaysBetween, 'sqlite')
+def _days_between_sqlite(element, compiler, **kwargs):
+    first_date, last_date = list(element.clauses)
+    return (f"CAST(julianday(date({compiler.process(last_date, **kwargs)})) - "
+            f"julianday(date({compiler.process(first_date, **kwargs)})) AS INTEGER)")
+
+
+@compiles(DaysBetween, 'postgresql')
+def _days_between_postgresql(element, compiler, **kwargs):
+    first_date, last_date = list(element.clauses)
+    return (f"(CAST({compiler.process(last_date, **kwargs)} AS DATE) - "
+            f"CAST({compiler.process(first_date, **kwargs)} AS DATE))")
+
+
+class WholeDaysBetween(FunctionElement):
+    """Number of whole 24 hour periods from the first to the last point in time, like the days
+    of a Python timedelta."""
+    type = types.Integer()
+    name = 'whole_days_between'
+
+
+@compiles(WholeDaysBetween)
+def _whole_days_between_default(element, compiler, **kwargs):
+    first_date, last_date = list(element.clauses)
+    return (f"TIMESTAMPDIFF(DAY, {compiler.process(first_date, **kwargs)}, "
+            f"{compiler.process(last_date, **kwargs)})")
+
+
+@compiles(WholeDaysBetween, 'sqlite')
+def _whole_days_between_sqlite(element, compiler, **kwargs):
+    first_date, last_date = list(element.clauses)
+    return (f"CAST(julianday({compiler.process(last_date, **kwargs)}) - "
+            f"julianday({compiler.process(first_date, **kwargs)}) AS INTEGER)")
+
+
+@compiles(WholeDaysBetween, 'postgresql')
+def _whole_days_between_postgresql(element, compiler, **kwargs):
+    first_date, last_date = list(element.clauses)
+    return (f"CAST(EXTRACT(DAY FROM {compiler.process(last_date, **kwargs)} - "
+            f"{compiler.process(first_date, **kwargs)}) AS INTEGER)")
+
+
+class Month(FunctionElement):
+    """Month number, 1-12, of a date."""
+    type = types.Integer()
+    name = 'month'
+
+
+@compiles(Month)
+def _month_default(element, compiler, **kwargs):
+    return f"MONTH({compiler.process(element.clauses, **kwargs)})"
+
+
+@compiles(Month, 'sqlite')
+def _month_sqlite(element, compiler, **kwargs):
+    return f"CAST(strftime('%m', {compiler.process(element.clauses, **kwargs)}) AS INTEGER)"
+
+
+@compiles(Month, 'postgresql')
+def _month_postgresql(element, compiler, **kwargs):
+    return f"CAST(EXTRACT(MONTH FROM {compiler.process(element.clauses, **kwargs)}) AS INTEGER)"
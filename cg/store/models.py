@@ -5,9 +5,24 @@ from typing import List
 import alchy
 from cg.constants import REV_PRIORITY_MAP, PRIORITY_MAP, FAMILY_ACTIONS, FLOWCELL_STATUS, \
     PREP_CATEGORIES
-from sqlalchemy import Column, ForeignKey, orm, types, UniqueConstraint, Table
+from sqlalchemy import Column, ForeignKey, Index, orm, text, types, UniqueConstraint, Table
+from sqlalchemy.dialects import mysql
 
-Model = alchy.make_declarative_base(Base=alchy.ModelBase)
+
+class ModelBase(alchy.ModelBase):
+
+    @property
+    def __to_dict__(self):
+        """Serialize the loaded columns only, so the output doesn't depend on which
+        relationships happen to be loaded. `to_dict` adds the relationships it serializes."""
+        return super().__to_dict__ - set(self.relationships())
+
+
+Model = alchy.make_declarative_base(Base=ModelBase)
+
+# the sample queue indexes are partial where the database supports it, MySQL indexes all rows
+NOT_DOWNSAMPLED_INDEX = dict(postgresql_where=text('downsampled_to IS NULL'),
+                             sqlite_where=text('downsampled_to IS NULL'))
 
 
 flowcell_sample = Table(
@@ -443,6 +458,17 @@ class Pool(Model):
 
 
 class Sample(Model, PriorityMixin):
+    __table_args__ = (
+        Index('ix_sample_receive_queue', 'received_at', 'downsampled_to', 'ordered_at',
+              **NOT_DOWNSAMPLED_INDEX),
+        Index('ix_sample_lab_queue', 'sequenced_at', 'downsampled_to', 'prepared_at', 'priority',
+              'received_at', **NOT_DOWNSAMPLED_INDEX),
+        Index('ix_sample_delivery_queue', 'delivered_at', 'downsampled_to', 'sequenced_at',
+              **NOT_DOWNSAMPLED_INDEX),
+        Index('ix_sample_invoice_queue', 'invoice_id', 'downsampled_to', 'delivered_at',
+              'no_invoice', **NOT_DOWNSAMPLED_INDEX),
+    )
+
     id = Column(types.Integer, primary_key=True)
     internal_id = Column(types.String(32), nullable=False, unique=True)
     priority = Column(types.Integer, default=1, nullable=False)
@@ -507,6 +533,92 @@ class Sample(Model, PriorityMixin):
         return data
 
 
+class SampleTrend(Model):
+    """Monthly rollup of received samples and their turnaround times.
+
+    Samples are grouped by the month they were received, the application category and the
+    customer priority. Turnaround times are stored as the sum of days and the number of samples
+    with both dates set, to be able to compute averages over any grouping.
+    """
+    __table_args__ = (
+        UniqueConstraint('year', 'month', 'category', 'priority', name='_sample_trend_uc'),
+    )
+
+    id = Column(types.Integer, primary_key=True)
+    year = Column(types.Integer, nullable=False)
+    month = Column(types.Integer, nullable=False)
+    category = Column(types.String(32))
+    priority = Column(types.String(32))
+    samples = Column(types.Integer, nullable=False, default=0)
+    received_to_delivered_days = Column(types.Integer)
+    received_to_delivered_samples = Column(types.Integer, nullable=False, default=0)
+    received_to_prepped_days = Column(types.Integer)
+    received_to_prepped_samples = Column(types.Integer, nullable=False, default=0)
+    prepped_to_sequenced_days = Column(types.Integer)
+    prepped_to_sequenced_samples = Column(types.Integer, nullable=False, default=0)
+    sequenced_to_delivered_days = Column(types.Integer)
+    sequenced_to_delivered_samples = Column(types.Integer, nullable=False, default=0)
+    delivered_to_invoiced_days = Column(types.Integer)
+    delivered_to_invoiced_samples = Column(types.Integer, nullable=False, default=0)
+    updated_at = Column(types.DateTime, default=dt.datetime.now)
+
+    def __str__(self) -> str:
+        return f"{self.year}-{self.month} {self.category} ({self.priority})"
+
+
+class SampleTrendMonth(Model):
+    """A month of the sample trend rollup that has been built, stale once its samples change."""
+
+    year = Column(types.Integer, primary_key=True)
+    month = Column(types.Integer, primary_key=True)
+    stale = Column(types.Boolean, nullable=False, default=False)
+    updated_at = Column(types.DateTime, default=dt.datetime.now)
+
+    def __str__(self) -> str:
+        return f"{self.year}-{self.month}"
+
+
+class SearchTrigram(Model):
+    """Three letter fragments of the names and ids of records, to search them by substring.
+
+    A record matches a search if it has all the fragments of the search, which narrows a
+    substring search down to a few candidate records found by the primary key.
+    """
+    __table_args__ = (
+        Index('search_trigram_record_idx', 'record_type', 'record_id'),
+    )
+
+    record_type = Column(types.String(32), primary_key=True)
+    # binary, the default collation of MySQL would take 'afe' and 'afé' for the same trigram
+    trigram = Column(types.String(3).with_variant(
+        mysql.VARCHAR(3, charset='utf8mb4', collation='utf8mb4_bin'), 'mysql'), primary_key=True)
+    record_id = Column(types.Integer, primary_key=True, autoincrement=False)
+
+    def __str__(self) -> str:
+        return f"{self.record_type} {self.record_id}: {self.trigram}"
+
+
+class SearchIndex(Model):
+    """A kind of record whose search index has been built. Until then the kind of record is
+    searched without the index, even if some of its records have been indexed since."""
+
+    record_type = Column(types.String(32), primary_key=True)
+    built_at = Column(types.DateTime, default=dt.datetime.now)
+
+    def __str__(self) -> str:
+        return f"{self.record_type}: {self.built_at}"
+
+
+class LimsSync(Model):
+    """When the dates of a state were last synced from LIMS, to only read what changed since."""
+
+    name = Column(types.String(32), primary_key=True)
+    synced_at = Column(types.DateTime)
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.synced_at}"
+
+
 class Invoice(Model):
     id = Column(types.Integer, primary_key=True)
     customer_id = Column(ForeignKey('customer.id'), nullable=False)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Opt-in instrumentation of the SQL statements issued through the store."""
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+HANDLER_MODULE = 'cg.store.api.'
+SKIPPED_MODULES = ('sqlalchemy.', 'alchy.', 'flask_alchy.', 'flask_sqlalchemy.', __name__)
+
+Statement = namedtuple('Statement', ['tag', 'statement', 'duration'])
+
+_ACTIVE = threading.local()
+
+
+class QueryProfile:
+    """Statements recorded while a profile is active."""
+
+    def __init__(self, engine: Engine = None, slowest: int = 5):
+        self.engine = engine
+        self.limit = slowest
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        """Number of statements issued."""
+        return len(self.statements)
+
+    @property
+    def total_time(self) -> float:
+        """Seconds spent waiting for the database."""
+        return sum(statement.duration for statement in self.statements)
+
+    @property
+    def slowest(self) -> List[Statement]:
+        """The slowest statements, slowest first."""
+        ordered = sorted(self.statements, key=lambda statement: statement.duration, reverse=True)
+        return ordered[:self.limit]
+
+    @property
+    def tags(self) -> dict:
+        """Number of statements and time spent per calling handler method."""
+        tags = OrderedDict()
+        for statement in self.statements:
+            count, duration = tags.get(statement.tag, (0, 0.0))
+            tags[statement.tag] = (count + 1, duration + statement.duration)
+        return tags
+
+    def header(self) -> str:
+        """Summarize the profile on a single line, e.g. for a response header."""
+        parts = [f"count={self.count}", f"time={self.total_time * 1000:.1f}ms"]
+        parts.extend(f"{tag}={count}/{duration * 1000:.1f}ms"
+                     for tag, (count, duration) in self.tags.items())
+        return '; '.join(parts)
+
+    def report(self) -> str:
+        """Summarize the profile over multiple lines."""
+        lines = [f"{self.count} SQL statements in {self.total_time * 1000:.1f} ms"]
+        for tag, (count, duration) in self.tags.items():
+            lines.append(f"  {tag}: {count} statements in {duration * 1000:.1f} ms")
+        if self.statements:
+            lines.append("slowest statements:")
+        for statement in self.slowest:
+            sql = ' '.join(statement.statement.split())
+            lines.append(f"  {statement.duration * 1000:.1f} ms [{statement.tag}] {sql}")
+        return '\n'.join(lines)
+
+
+def _caller_tag(frame) -> str:
+    """Name the outermost store handler method on the stack.
+
+    Falls back to the first caller outside of SQLAlchemy for queries that are built by a handler
+    but executed later, e.g. when a view iterates over a returned query.
+    """
+    tag = caller = None
+    while frame is not None:
+        code = frame.f_code
+        instance = frame.f_locals.get('self')
+        for klass in type(instance).__mro__ if instance is not None else ():
+            function = klass.__dict__.get(code.co_name)
+            function = getattr(function, '__func__', function)
+            if (getattr(function, '__code__', None) is code and
+                    klass.__module__.startswith(HANDLER_MODULE)):
+                tag = f"{klass.__name__}.{code.co_name}"
+                break
+        module = frame.f_globals.get('__name__', '')
+        if caller is None and not module.startswith(SKIPPED_MODULES):
+            caller = f"{module}.{code.co_name}"
+        frame = frame.f_back
+    return tag or caller or 'unknown'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_ACTIVE, 'profiles', None):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    profiles = getattr(_ACTIVE, 'profiles', None)
+    if not profiles:
+        return
+    tag = _caller_tag(sys._getframe(1))
+    for profile in profiles:
+        if profile.engine is None or profile.engine is conn.engine:
+            profile.statements.append(Statement(tag, statement, duration))
+
+
+def _install_listeners():
+    """Listen to statements on all engines, once."""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def profile_sql(engine: Engine = None, slowest: int = 5):
+    """Record the statements issued in the current thread, optionally limited to one engine."""
+    _install_listeners()
+    profile = QueryProfile(engine=engine, slowest=slowest)
+    if not hasattr(_ACTIVE, 'profiles'):
+        _ACTIVE.profiles = []
+    _ACTIVE.profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        _ACTIVE.profiles.remove(profile)
@@ -0,0 +1,5 @@
+CREATE TABLE `lims_sync` (
+  `name` varchar(32) NOT NULL,
+  `synced_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB;
@@ -0,0 +1,5 @@
+ALTER TABLE `sample`
+ADD INDEX `ix_sample_receive_queue` (`received_at`, `downsampled_to`, `ordered_at`),
+ADD INDEX `ix_sample_lab_queue` (`sequenced_at`, `downsampled_to`, `prepared_at`, `priority`, `received_at`),
+ADD INDEX `ix_sample_delivery_queue` (`delivered_at`, `downsampled_to`, `sequenced_at`),
+ADD INDEX `ix_sample_invoice_queue` (`invoice_id`, `downsampled_to`, `delivered_at`, `no_invoice`);
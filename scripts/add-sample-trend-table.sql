@@ -0,0 +1,33 @@
+CREATE TABLE `sample_trend` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `year` int(11) NOT NULL,
+  `month` int(11) NOT NULL,
+  `category` varchar(32) DEFAULT NULL,
+  `priority` varchar(32) DEFAULT NULL,
+  `samples` int(11) NOT NULL DEFAULT '0',
+  `received_to_delivered_days` int(11) DEFAULT NULL,
+  `received_to_delivered_samples` int(11) NOT NULL DEFAULT '0',
+  `received_to_prepped_days` int(11) DEFAULT NULL,
+  `received_to_prepped_samples` int(11) NOT NULL DEFAULT '0',
+  `prepped_to_sequenced_days` int(11) DEFAULT NULL,
+  `prepped_to_sequenced_samples` int(11) NOT NULL DEFAULT '0',
+  `sequenced_to_delivered_days` int(11) DEFAULT NULL,
+  `sequenced_to_delivered_samples` int(11) NOT NULL DEFAULT '0',
+  `delivered_to_invoiced_days` int(11) DEFAULT NULL,
+  `delivered_to_invoiced_samples` int(11) NOT NULL DEFAULT '0',
+  `updated_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `_sample_trend_uc` (`year`, `month`, `category`, `priority`)
+) ENGINE=InnoDB;
+
+CREATE TABLE `sample_trend_month` (
+  `year` int(11) NOT NULL,
+  `month` int(11) NOT NULL,
+  `stale` tinyint(1) NOT NULL DEFAULT '0',
+  `updated_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`year`, `month`)
+) ENGINE=InnoDB;
+
+# build the rollup of past years, then rebuild the stale months regularly, e.g. nightly:
+#   cg reset trends 2017 2018
+#   cg reset trends
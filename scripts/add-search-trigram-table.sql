@@ -0,0 +1,18 @@
+CREATE TABLE `search_trigram` (
+  `record_type` varchar(32) NOT NULL,
+  `trigram` varchar(3) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+  `record_id` int(11) NOT NULL,
+  PRIMARY KEY (`record_type`, `trigram`, `record_id`),
+  KEY `search_trigram_record_idx` (`record_type`, `record_id`)
+) ENGINE=InnoDB;
+
+CREATE TABLE `search_index` (
+  `record_type` varchar(32) NOT NULL,
+  `built_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`record_type`)
+) ENGINE=InnoDB;
+
+# index the existing records with: cg reset search-index
+# records of a kind are searched without the index until it is built, as recorded in
+# search_index, and writes that bypass the ORM, like query.update(), bulk inserts or SQL,
+# need the index to be rebuilt
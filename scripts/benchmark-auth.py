@@ -0,0 +1,113 @@
+"""Benchmark the API authorization with and without the token cache.
+
+Signs a token with a generated key and replays requests against an in-memory database with the
+cache disabled and enabled: a route that only authorizes the request, to measure the overhead
+of the authorization itself, and a portal session of the user page and a few listings.
+
+    python scripts/benchmark-auth.py --requests 2000
+"""
+import datetime as dt
+import os
+import time
+
+import click
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+for variable in ('LIMS_HOST', 'LIMS_USERNAME', 'LIMS_PASSWORD', 'GOOGLE_OAUTH_CLIENT_ID',
+                 'GOOGLE_OAUTH_CLIENT_SECRET'):
+    os.environ.setdefault(variable, 'benchmark')
+os.environ.setdefault('CG_SQL_DATABASE_URI', 'sqlite://')
+
+from flask import Flask  # noqa: E402
+
+from cg.server import api, ext  # noqa: E402
+
+AUTHORIZE = ['/api/v1/benchmark']
+SESSION = ['/api/v1/me', '/api/v1/families?count=false', '/api/v1/samples?count=false',
+           '/api/v1/pools?count=false']
+
+
+@api.BLUEPRINT.route('/benchmark')
+def authorized():
+    """Respond without touching the database once the request is authorized."""
+    return 'ok'
+
+
+def signed_token(email: str):
+    """Sign a token with a new key and return it with the matching certificates."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048,
+                                   backend=default_backend())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'benchmark')])
+    now = dt.datetime.utcnow()
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + dt.timedelta(days=1))
+        .sign(key, hashes.SHA256(), default_backend())
+    )
+    key_pem = key.private_bytes(serialization.Encoding.PEM,
+                                serialization.PrivateFormat.TraditionalOpenSSL,
+                                serialization.NoEncryption())
+    signer = crypt.RSASigner.from_string(key_pem, key_id='benchmark')
+    token = jwt.encode(signer, {'email': email, 'iat': int(time.time()),
+                                'exp': int(time.time()) + 3600})
+    certs = {'benchmark': certificate.public_bytes(serialization.Encoding.PEM).decode()}
+    return token.decode(), certs
+
+
+def create_app(cache_size: int) -> Flask:
+    """Set up the API with a user in an in-memory database."""
+    app = Flask(__name__)
+    app.config.from_object('cg.server.config')
+    app.config['CG_TOKEN_CACHE_SIZE'] = cache_size
+    app.config['CG_GOOGLE_CERTS_CACHE'] = None
+    ext.db.init_app(app)
+    ext.token_cache.init_app(app)
+    app.register_blueprint(api.BLUEPRINT)
+    with app.app_context():
+        ext.db.create_all()
+        customer_group = ext.db.add_customer_group('benchmark', 'Benchmark')
+        customer = ext.db.add_customer('cust000', 'Benchmark', customer_group=customer_group,
+                                       invoice_address='Test street', invoice_reference='ABCDEF')
+        user = ext.db.add_user(customer, 'user@example.com', 'Benchmark User')
+        ext.db.add_commit(customer_group, customer, user)
+    return app
+
+
+def requests_per_second(app: Flask, certs: dict, token: str, urls: list,
+                        n_requests: int) -> float:
+    """Replay requests to the urls and measure the throughput."""
+    ext.google_certs.source = lambda: (certs, None)
+    ext.google_certs.refresh()
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {token}"}
+    start = time.perf_counter()
+    for index in range(n_requests):
+        response = client.get(urls[index % len(urls)], headers=headers)
+        assert response.status_code == 200, response.data
+    return n_requests / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option('-n', '--requests', 'n_requests', default=1000, help='number of requests')
+def benchmark(n_requests):
+    """Compare the API throughput with and without the token cache."""
+    token, certs = signed_token('user@example.com')
+    for session, urls in (('authorize only', AUTHORIZE), ('portal session', SESSION)):
+        for label, cache_size in (('without cache', 0), ('with cache', 1024)):
+            app = create_app(cache_size)
+            rate = requests_per_second(app, certs, token, urls, n_requests)
+            click.echo(f"{session}, {label}: {rate:.0f} requests/s")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,116 @@
+"""Benchmark the trends queries against a computation in memory.
+
+Fills a database with samples received this year and compares how long it takes to compute the
+samples per month and the received to delivered averages with the SQL trends queries and with
+plain Python over the exported date columns.
+
+    python scripts/benchmark-trends.py --samples 200000
+"""
+import datetime as dt
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import click
+
+from cg.store import Store, models
+from cg.store.api.trends import MONTHS
+
+CATEGORIES = ['wgs', 'wes', 'mic']
+
+
+def populate(store: Store, n_samples: int, year: int):
+    """Bulk insert received samples with random turnaround times."""
+    customer_group = store.add_customer_group('benchmark', 'Benchmark')
+    customer = store.add_customer('cust000', 'Benchmark', customer_group=customer_group,
+                                  invoice_address='Test street', invoice_reference='ABCDEF',
+                                  priority='diagnostic')
+    versions = []
+    for category in CATEGORIES:
+        application = store.add_application(f"{category.upper()}PCFC030", category, category)
+        application.category = category
+        versions.append(store.add_version(application, 1, valid_from=dt.datetime.now(),
+                                          prices={'standard': 1, 'priority': 1, 'express': 1,
+                                                  'research': 1}))
+    store.add_commit(customer, *versions)
+
+    start = dt.datetime(year, 1, 1)
+    seconds = int((dt.datetime.now() - start).total_seconds())
+    rows = []
+    for index in range(n_samples):
+        received_at = start + dt.timedelta(seconds=random.randrange(seconds))
+        delivered_at = (received_at + dt.timedelta(days=random.randint(1, 40))
+                        if random.random() < 0.8 else None)
+        rows.append(dict(internal_id=f"sample{index}", name=f"sample{index}", sex='unknown',
+                         priority=1, customer_id=customer.id,
+                         application_version_id=random.choice(versions).id,
+                         ordered_at=received_at, received_at=received_at,
+                         delivered_at=delivered_at))
+    store.session.execute(models.Sample.__table__.insert(), rows)
+    store.commit()
+
+
+def memory_trends(store: Store, year: int):
+    """Compute samples per month and received to delivered averages in Python."""
+    records = (
+        store.Sample.query.with_entities(
+            models.Application.category,
+            models.Customer.priority,
+            models.Sample.received_at,
+            models.Sample.delivered_at,
+        )
+            .join(models.Sample.customer, models.Sample.application_version,
+                  models.ApplicationVersion.application)
+            .filter(*store._received_in(year))
+            .all()
+    )
+    samples_per_month = [0] * 12
+    days = defaultdict(lambda: [[] for _ in range(12)])
+    for category, priority, received_at, delivered_at in records:
+        samples_per_month[received_at.month - 1] += 1
+        if priority == 'diagnostic' and delivered_at:
+            days[category][received_at.month - 1].append((delivered_at - received_at).days)
+    averages = {category: [statistics.mean(month) if month else None for month in months]
+                for category, months in days.items()}
+    return samples_per_month, averages
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option('-n', '--samples', default=100000, help='number of samples to generate')
+@click.option('-d', '--database', default='sqlite://', help='URI of an empty database')
+def benchmark(samples, database):
+    """Compare the SQL trends queries with a computation in memory."""
+    year = dt.date.today().year
+    store = Store(database)
+    store.create_all()
+    populate(store, samples, year)
+
+    def sql_trends():
+        return list(store.samples_per_month(year)), list(store.received_to_delivered(year))
+
+    (sql_received, sql_averages), sql_time = timed(sql_trends)
+    (memory_received, memory_averages), memory_time = timed(memory_trends, store, year)
+
+    sql_total = sum(count or 0 for count in sql_received[0]['results'].values())
+    assert sql_total == sum(memory_received) == samples
+    for category in sql_averages:
+        expected = memory_averages.get(category['name'], [None] * 12)
+        actual = [category['results'][month] or None for month in MONTHS.values()]
+        assert all(math.isclose(value, other) if None not in (value, other) else value == other
+                   for value, other in zip(actual, expected))
+
+    click.echo(f"samples: {samples}")
+    click.echo(f"SQL: {sql_time:.3f} s")
+    click.echo(f"in memory: {memory_time:.3f} s (including export of the date columns)")
+
+
+if __name__ == '__main__':
+    benchmark()
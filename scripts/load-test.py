@@ -0,0 +1,94 @@
+"""Load test the main read endpoints of a running server.
+
+Concurrent clients replay requests to the listings, a few records from them, the options and
+the applications, each client with a session that keeps its connection alive. Prints the
+throughput and the latencies per endpoint.
+
+    gunicorn --config python:cg.server.gunicorn_config cg.server.auto:app
+    python scripts/load-test.py --url http://localhost:8000 --token $TOKEN -c 16 -n 2000
+"""
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import requests
+
+LISTINGS = ['/api/v1/families', '/api/v1/samples', '/api/v1/pools', '/api/v1/flowcells',
+            '/api/v1/analyses', '/api/v1/microbial_orders']
+STATIC = ['/api/v1/me', '/api/v1/options', '/api/v1/applications', '/api/v1/customers',
+          '/api/v1/panels']
+RECORDS = {'/api/v1/families': 'families', '/api/v1/samples': 'samples',
+           '/api/v1/pools': 'pools', '/api/v1/flowcells': 'flowcells'}
+RECORD_KEYS = {'families': 'internal_id', 'samples': 'internal_id', 'pools': 'id',
+               'flowcells': 'name'}
+
+
+def record_urls(session: requests.Session, url: str, records: int) -> list:
+    """Pick records from the first page of the listings to fetch one by one."""
+    urls = []
+    for listing, key in RECORDS.items():
+        response = session.get(f"{url}{listing}")
+        response.raise_for_status()
+        for record in response.json().get(key, [])[:records]:
+            urls.append(f"{listing}/{record[RECORD_KEYS[key]]}")
+    return urls
+
+
+def percentile(latencies: list, fraction: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+@click.command()
+@click.option('--url', default='http://localhost:8000', help='base url of the server')
+@click.option('--token', envvar='CG_API_TOKEN', required=True, help='Google id token')
+@click.option('-c', '--concurrency', default=8, help='concurrent clients')
+@click.option('-n', '--requests', 'n_requests', default=1000, help='number of requests')
+@click.option('--records', default=5, help='records of each listing to fetch')
+def load_test(url, token, concurrency, n_requests, records):
+    """Replay requests to the read endpoints and report the latencies."""
+    url = url.rstrip('/')
+    headers = {'Authorization': f"Bearer {token}"}
+    local = threading.local()
+
+    def session() -> requests.Session:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            local.session.headers.update(headers)
+        return local.session
+
+    paths = LISTINGS + STATIC + record_urls(session(), url, records)
+    schedule = list(itertools.islice(itertools.cycle(paths), n_requests))
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+
+    def fetch(path: str):
+        start = time.perf_counter()
+        response = session().get(f"{url}{path}")
+        latencies[path].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors[path] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, schedule))
+    elapsed = time.perf_counter() - start
+
+    click.echo(f"{n_requests} requests with {concurrency} clients in {elapsed:.1f} s: "
+               f"{n_requests / elapsed:.0f} requests/s")
+    click.echo(f"{'endpoint':<50} {'n':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for path in paths:
+        if not latencies[path]:
+            continue
+        values = latencies[path]
+        click.echo(f"{path:<50} {len(values):>6} {errors[path]:>6} "
+                   f"{statistics.median(values) * 1000:>6.0f}ms "
+                   f"{percentile(values, 0.95) * 1000:>6.0f}ms "
+                   f"{percentile(values, 0.99) * 1000:>6.0f}ms")
+
+
+if __name__ == '__main__':
+    load_test()
@@ -0,0 +1,271 @@
+"""A fake LIMS REST API to test requests to LIMS over HTTP"""
+import datetime as dt
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+from xml.etree import ElementTree
+
+from dateutil.parser import parse as parse_date
+
+NAMESPACES = {
+    'prj': 'http://genologics.com/ri/project',
+    'con': 'http://genologics.com/ri/container',
+    'smp': 'http://genologics.com/ri/sample',
+    'art': 'http://genologics.com/ri/artifact',
+    'prc': 'http://genologics.com/ri/process',
+    'udf': 'http://genologics.com/ri/userdefined',
+    'ri': 'http://genologics.com/ri',
+    'exc': 'http://genologics.com/ri/exception',
+}
+# a gateway in front of LIMS answers errors with a page of its own
+GATEWAY_PAGE = '<html><body><h1>502 Bad Gateway</h1><hr>nginx</body></html>'
+
+
+class FakeLims:
+    """Projects, containers, samples, artifacts and processes in memory, served on a local port.
+
+    Requests can be delayed, to test that they overlap, and made to fail with a status code.
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.projects = {}
+        self.containers = {}
+        self.samples = {}
+        self.artifacts = {}
+        self.processes = {}
+        self.requests = []
+        self.connections = set()
+        self.failures = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.lims = self
+        self.host = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, args=(0.01,), daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fail(self, method: str, path: str, status: int, times: int = 1, body: str = None):
+        """Respond to the next requests to a path with an error, by default an exception
+        document like the ones LIMS answers with."""
+        if body is None:
+            body = (f'<exc:exception xmlns:exc="{NAMESPACES["exc"]}"><message>failed</message>'
+                    f'</exc:exception>')
+        self.failures.extend([(method, path, status, body)] * times)
+
+    def add_sample(self, name: str, project_name: str, udfs: dict = None) -> str:
+        """Add a sample in a project, created unless there is one with the name."""
+        with self._lock:
+            project_id = next((project_id for project_id, project in self.projects.items()
+                               if project == project_name), f"ADM{len(self.projects) + 1}")
+            self.projects[project_id] = project_name
+            sample_id = f"ACC{len(self.samples) + 1}A1"
+            self.samples[sample_id] = {'name': name, 'project': project_id, 'udfs': udfs or {}}
+            self.artifacts[f"{sample_id}PA1"] = {'name': name, 'samples': [sample_id]}
+        return sample_id
+
+    def add_process(self, process_type: str, outputs: list, udfs: dict = None,
+                    date_run: str = None, output_type: str = 'Analyte',
+                    modified: dt.datetime = None) -> str:
+        """Add a process with an output artifact for each list of sample ids in `outputs`."""
+        with self._lock:
+            process_id = f"24-{len(self.processes) + 1}"
+            artifact_ids = []
+            for sample_ids in outputs:
+                artifact_id = f"2-{len(self.artifacts) + 1}"
+                self.artifacts[artifact_id] = {'name': artifact_id, 'samples': list(sample_ids)}
+                artifact_ids.append(artifact_id)
+            self.processes[process_id] = {
+                'type': process_type, 'outputs': artifact_ids, 'output_type': output_type,
+                'udfs': udfs or {}, 'date_run': date_run,
+                'modified': modified or dt.datetime.now(dt.timezone.utc),
+            }
+        return process_id
+
+    def uri(self, *segments) -> str:
+        return '/'.join([self.host, 'api', 'v2', *segments])
+
+    def handle(self, method: str, path: str, query: dict, body: bytes, client: tuple) -> tuple:
+        with self._lock:
+            self.requests.append((method, path))
+            self.connections.add(client)
+            for failure in self.failures:
+                if failure[:2] == (method, path):
+                    self.failures.remove(failure)
+                    return failure[2], failure[3]
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            with self._lock:
+                return 200, self._respond(method, path.split('/')[3:], query, body)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _respond(self, method: str, segments: list, query: dict, body: bytes) -> str:
+        root = ElementTree.fromstring(body) if body else None
+        if method == 'POST' and segments == ['projects']:
+            project_id = f"ADM{len(self.projects) + 1}"
+            self.projects[project_id] = root.find('name').text
+            return (f'<prj:project xmlns:prj="{NAMESPACES["prj"]}" limsid="{project_id}" '
+                    f'uri="{self.uri("projects", project_id)}"><name>{self.projects[project_id]}'
+                    f'</name><open-date>2019-01-01</open-date></prj:project>')
+        if method == 'POST' and segments == ['containers', 'batch', 'create']:
+            links = []
+            for container in root.findall('con:container', NAMESPACES):
+                container_id = f"27-{len(self.containers) + 1}"
+                self.containers[container_id] = container.find('name').text
+                links.append(self.uri('containers', container_id))
+            return self._links(links)
+        if method == 'POST' and segments == ['samples', 'batch', 'create']:
+            links = []
+            for sample in root.findall('smp:samplecreation', NAMESPACES):
+                sample_id = f"ACC{len(self.samples) + 1}A1"
+                self.samples[sample_id] = {
+                    'name': sample.find('name').text,
+                    'project': sample.find('project').attrib['uri'].split('/')[-1],
+                    'container': sample.find('location/container').attrib['uri'].split('/')[-1],
+                    'location': sample.find('location/value').text,
+                }
+                self.artifacts[f"{sample_id}PA1"] = {'name': sample.find('name').text,
+                                                     'samples': [sample_id]}
+                links.append(self.uri('samples', sample_id))
+            return self._links(links)
+        if method == 'POST' and segments == ['artifacts', 'batch', 'update']:
+            for artifact in root.findall('art:artifact', NAMESPACES):
+                artifact_id = artifact.attrib['uri'].split('/')[-1]
+                self.artifacts[artifact_id]['reagent_label'] = (
+                    artifact.find('reagent-label').attrib['name'])
+            return self._links([])
+        if method == 'POST' and segments == ['artifacts', 'batch', 'retrieve']:
+            artifacts = ''.join(self._artifact(link.attrib['uri'].split('/')[-1])
+                                for link in root.findall('link'))
+            return f'<art:details xmlns:art="{NAMESPACES["art"]}">{artifacts}</art:details>'
+        if method == 'GET' and segments == ['processes']:
+            since = parse_date(query['last-modified'][0]) if 'last-modified' in query else None
+            processes = ''.join(f'<process uri="{self.uri("processes", process_id)}" '
+                                f'limsid="{process_id}"/>'
+                                for process_id, process in self.processes.items()
+                                if process['type'] in query['type'] and
+                                (since is None or process['modified'] >= since))
+            return f'<prc:processes xmlns:prc="{NAMESPACES["prc"]}">{processes}</prc:processes>'
+        if method == 'GET' and segments[0] == 'processes':
+            return self._process(segments[1])
+        if method == 'GET' and segments[0] == 'containers':
+            return (f'<con:container xmlns:con="{NAMESPACES["con"]}" limsid="{segments[1]}" '
+                    f'uri="{self.uri(*segments)}"><name>{self.containers[segments[1]]}</name>'
+                    f'</con:container>')
+        if method == 'GET' and segments == ['samples']:
+            project_id = query['projectlimsid'][0]
+            samples = ''.join(f'<sample uri="{self.uri("samples", sample_id)}"/>'
+                              for sample_id, sample in self.samples.items()
+                              if sample['project'] == project_id)
+            return f'<smp:samples xmlns:smp="{NAMESPACES["smp"]}">{samples}</smp:samples>'
+        if method == 'GET' and segments[0] == 'samples':
+            return self._sample(segments[1])
+        if method == 'POST' and segments == ['samples', 'batch', 'retrieve']:
+            samples = ''.join(self._sample(link.attrib['uri'].split('/')[-1])
+                              for link in root.findall('link'))
+            return f'<smp:details xmlns:smp="{NAMESPACES["smp"]}">{samples}</smp:details>'
+        if method == 'GET' and segments[0] == 'projects':
+            return (f'<prj:project xmlns:prj="{NAMESPACES["prj"]}" limsid="{segments[1]}" '
+                    f'uri="{self.uri(*segments)}"><name>{self.projects[segments[1]]}</name>'
+                    f'</prj:project>')
+        if method == 'GET' and segments == ['artifacts']:
+            return self._search_artifacts(query)
+        if method == 'GET' and segments[0] == 'artifacts':
+            return self._artifact(segments[1])
+        raise ValueError(f"unknown request: {method} {'/'.join(segments)}")
+
+    def _sample(self, sample_id: str) -> str:
+        sample = self.samples[sample_id]
+        artifact_uri = self.uri('artifacts', f"{sample_id}PA1")
+        project_uri = self.uri('projects', sample['project'])
+        udfs = ''.join(f'<udf:field name="{name}" type="String">{value}</udf:field>'
+                       for name, value in sample.get('udfs', {}).items())
+        return (f'<smp:sample xmlns:smp="{NAMESPACES["smp"]}" xmlns:udf="{NAMESPACES["udf"]}" '
+                f'limsid="{sample_id}" uri="{self.uri("samples", sample_id)}">'
+                f'<name>{sample["name"]}</name>'
+                f'<project limsid="{sample["project"]}" uri="{project_uri}"/>'
+                f'<artifact limsid="{sample_id}PA1" uri="{artifact_uri}"/>{udfs}</smp:sample>')
+
+    def _search_artifacts(self, query: dict) -> str:
+        """Output artifacts of processes of a type, of a sample, in the order they were run."""
+        artifacts = ''.join(
+            f'<artifact uri="{self.uri("artifacts", artifact_id)}" limsid="{artifact_id}"/>'
+            for process in self.processes.values()
+            if process['type'] in query.get('process-type', [process['type']]) and
+            process['output_type'] in query.get('type', [process['output_type']])
+            for artifact_id in process['outputs']
+            if query['samplelimsid'][0] in self.artifacts[artifact_id]['samples']
+        )
+        return f'<art:artifacts xmlns:art="{NAMESPACES["art"]}">{artifacts}</art:artifacts>'
+
+    def _artifact(self, artifact_id: str) -> str:
+        artifact = self.artifacts[artifact_id]
+        samples = ''.join(f'<sample limsid="{sample_id}" uri="{self.uri("samples", sample_id)}"/>'
+                          for sample_id in artifact['samples'])
+        parent = ''.join(f'<parent-process limsid="{process_id}" '
+                         f'uri="{self.uri("processes", process_id)}"/>'
+                         for process_id, process in self.processes.items()
+                         if artifact_id in process['outputs'])
+        return (f'<art:artifact xmlns:art="{NAMESPACES["art"]}" limsid="{artifact_id}" '
+                f'uri="{self.uri("artifacts", artifact_id)}"><name>{artifact["name"]}</name>'
+                f'{parent}{samples}</art:artifact>')
+
+    def _process(self, process_id: str) -> str:
+        process = self.processes[process_id]
+        maps = ''.join(f'<input-output-map><output limsid="{artifact_id}" '
+                       f'uri="{self.uri("artifacts", artifact_id)}" '
+                       f'output-type="{process["output_type"]}"/></input-output-map>'
+                       for artifact_id in process['outputs'])
+        udfs = ''.join(f'<udf:field name="{name}" type="Date">{value}</udf:field>'
+                       for name, value in process['udfs'].items())
+        date_run = f"<date-run>{process['date_run']}</date-run>" if process['date_run'] else ''
+        return (f'<prc:process xmlns:prc="{NAMESPACES["prc"]}" '
+                f'xmlns:udf="{NAMESPACES["udf"]}" limsid="{process_id}" '
+                f'uri="{self.uri("processes", process_id)}"><type>{process["type"]}</type>'
+                f'{date_run}{maps}{udfs}</prc:process>')
+
+    @staticmethod
+    def _links(uris: list) -> str:
+        links = ''.join(f'<link uri="{uri}"/>' for uri in uris)
+        return f'<ri:links xmlns:ri="{NAMESPACES["ri"]}">{links}</ri:links>'
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        status, content = self.server.lims.handle(self.command, url.path, parse_qs(url.query),
+                                                  body, self.client_address)
+        content = content.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,131 @@
+"""Tests for the cache of LIMS responses"""
+import time
+
+from cg.apps.lims import LimsAPI
+from cg.apps.lims.cache import LimsCache, SqliteLimsCache
+
+
+def test_cache_expires():
+    """Test that responses are only kept for the time to live"""
+
+    # GIVEN a cache with a short time to live and a cached response
+    cache = LimsCache(ttl=0.05)
+    cache.add('http://lims/api/v2/samples/ACC1A1', b'<sample/>')
+    assert cache.get('http://lims/api/v2/samples/ACC1A1') == b'<sample/>'
+
+    # WHEN the time to live has passed
+    time.sleep(0.06)
+
+    # THEN the response should be gone
+    assert cache.get('http://lims/api/v2/samples/ACC1A1') is None
+    assert len(cache) == 0
+
+
+def test_cache_bounded():
+    """Test that the oldest responses are dropped when the cache is full"""
+
+    # GIVEN a cache of two responses
+    cache = LimsCache(size=2)
+
+    # WHEN adding three responses
+    for index in range(3):
+        cache.add(f"http://lims/api/v2/samples/ACC{index}A1", b'<sample/>')
+
+    # THEN only the last two should be kept
+    assert len(cache) == 2
+    assert cache.get('http://lims/api/v2/samples/ACC0A1') is None
+    assert cache.get('http://lims/api/v2/samples/ACC2A1') == b'<sample/>'
+
+
+def test_cache_least_recently_used():
+    """Test that the responses read the least recently are dropped first"""
+
+    # GIVEN a full cache of two responses where the first one was read again
+    cache = LimsCache(size=2)
+    cache.add('http://lims/api/v2/samples/ACC0A1', b'<sample/>')
+    cache.add('http://lims/api/v2/samples/ACC1A1', b'<sample/>')
+    cache.get('http://lims/api/v2/samples/ACC0A1')
+
+    # WHEN adding a third response
+    cache.add('http://lims/api/v2/samples/ACC2A1', b'<sample/>')
+
+    # THEN the response that wasn't read should have been dropped
+    assert cache.get('http://lims/api/v2/samples/ACC1A1') is None
+    assert cache.get('http://lims/api/v2/samples/ACC0A1') == b'<sample/>'
+    # THEN the hits and misses should have been counted
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'hit_ratio': 0.667, 'entries': 2}
+
+
+def test_cache_ttl_per_endpoint():
+    """Test that responses are kept for the time to live of their kind of entity"""
+
+    # GIVEN a cache that keeps processes shorter than other entities
+    cache = LimsCache(ttl=60, ttls={'processes': 0.05})
+    cache.add('http://lims/api/v2/processes/24-1', b'<process/>')
+    cache.add('http://lims/api/v2/samples/ACC1A1', b'<sample/>')
+
+    # WHEN the time to live of processes has passed
+    time.sleep(0.06)
+
+    # THEN only the process should be gone
+    assert cache.get('http://lims/api/v2/processes/24-1') is None
+    assert cache.get('http://lims/api/v2/samples/ACC1A1') == b'<sample/>'
+    assert cache.ttl_of('http://lims/api/v2/projects/ADM1') == 3600
+
+
+def test_sqlite_cache_shared(tmpdir):
+    """Test that responses in a SQLite file are shared between caches"""
+
+    # GIVEN a response cached in a file by one run
+    path = str(tmpdir.join('lims-cache.sqlite'))
+    SqliteLimsCache(path).add('http://lims/api/v2/samples/ACC1A1', b'<sample/>')
+
+    # WHEN a later run reads it
+    cache = SqliteLimsCache(path, size=1)
+    content = cache.get('http://lims/api/v2/samples/ACC1A1')
+
+    # THEN it should be answered from the file
+    assert content == b'<sample/>'
+    assert cache.stats()['hits'] == 1
+    # THEN the least recently used response should be dropped when the file is full
+    cache.add('http://lims/api/v2/samples/ACC2A1', b'<sample/>')
+    assert len(cache) == 1
+    assert cache.get('http://lims/api/v2/samples/ACC1A1') is None
+
+
+def test_reads_cached(fake_lims, fake_lims_api: LimsAPI):
+    """Test that a read is answered from the cache and that an update clears it"""
+
+    # GIVEN a container in LIMS that has been read
+    fake_lims.containers['27-1'] = 'plate'
+    uri = fake_lims.uri('containers', '27-1')
+    fake_lims_api.get(uri)
+
+    # WHEN reading it again
+    root = fake_lims_api.get(uri)
+
+    # THEN LIMS should only have been asked once
+    assert root.find('name').text == 'plate'
+    assert fake_lims.requests.count(('GET', '/api/v2/containers/27-1')) == 1
+    # THEN an update should make the next read go to LIMS
+    fake_lims_api.responses.discard(uri)
+    fake_lims_api.get(uri)
+    assert fake_lims.requests.count(('GET', '/api/v2/containers/27-1')) == 2
+
+
+def test_connections_kept_alive(fake_lims, fake_lims_api: LimsAPI):
+    """Test that requests reuse the connections to LIMS"""
+
+    # GIVEN a LIMS API without concurrent requests
+    fake_lims_api.workers = 1
+
+    # WHEN submitting a project with a few samples
+    fake_lims_api.submit_project('123456', [
+        {'name': f"tube{index}", 'container': 'Tube', 'container_name': None,
+         'well_position': None, 'index_sequence': None, 'udfs': {'priority': 'standard'}}
+        for index in range(3)
+    ])
+
+    # THEN the reads and writes should have been made over the same connections
+    assert len(fake_lims.requests) > 5
+    assert len(fake_lims.connections) <= 2
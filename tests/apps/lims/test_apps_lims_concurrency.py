@@ -0,0 +1,38 @@
+"""Tests for concurrent requests to LIMS"""
+import time
+
+from cg.apps.lims import LimsAPI
+from cg.apps.lims.concurrency import RateLimit
+
+
+def test_map_samples(fake_lims, fake_lims_api: LimsAPI):
+    """Test that samples are looked up concurrently, at most `max_workers` at a time"""
+
+    # GIVEN samples in a LIMS that takes a while to answer
+    sample_ids = [fake_lims.add_sample(f"sample{index}", 'project') for index in range(6)]
+    fake_lims.delay = 0.05
+
+    # WHEN looking up the names of the samples with three workers
+    names = fake_lims_api.map_samples(lambda sample_id: fake_lims_api.get(
+        fake_lims.uri('samples', sample_id)).find('name').text, sample_ids, max_workers=3)
+
+    # THEN the names should be returned by sample id, in order
+    assert list(names) == sample_ids
+    assert list(names.values()) == [f"sample{index}" for index in range(6)]
+    # THEN the lookups should have overlapped, but never more than three at a time
+    assert 1 < fake_lims.max_active <= 3
+
+
+def test_rate_limit():
+    """Test that the requests of all threads are spaced by the rate limit"""
+
+    # GIVEN a limit of 50 requests per second
+    limit = RateLimit(50)
+
+    # WHEN sending five requests
+    start = time.monotonic()
+    for _ in range(5):
+        limit.wait()
+
+    # THEN it should take at least the four intervals between them
+    assert time.monotonic() - start >= 4 / 50
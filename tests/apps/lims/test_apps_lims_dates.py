@@ -0,0 +1,64 @@
+"""Tests for harvesting the dates of samples from LIMS in bulk"""
+import datetime as dt
+
+from cg.apps.lims import LimsAPI
+
+RECEPTION = 'CG002 - Reception Control'
+DELIVERY = 'Delivery v1'
+
+
+def test_harvest_received_dates(fake_lims, fake_lims_api: LimsAPI):
+    """Test that the received dates of all samples are indexed at once"""
+
+    # GIVEN two reception processes, one with a pool of two samples
+    fake_lims.add_process(RECEPTION, [['ACC1A1'], ['ACC2A1', 'ACC3A1']],
+                          udfs={'date arrived at clinical genomics': '2019-01-02'})
+    fake_lims.add_process(RECEPTION, [['ACC1A1'], ['ACC4A1']],
+                          udfs={'date arrived at clinical genomics': '2019-01-01'})
+    # GIVEN a reception process without a date
+    fake_lims.add_process(RECEPTION, [['ACC5A1']])
+
+    # WHEN harvesting the received dates
+    dates = fake_lims_api.harvest_dates('received')
+
+    # THEN each sample should get the earliest date it was received
+    assert dates == {'ACC1A1': dt.date(2019, 1, 1), 'ACC2A1': dt.date(2019, 1, 2),
+                     'ACC3A1': dt.date(2019, 1, 2), 'ACC4A1': dt.date(2019, 1, 1)}
+    # THEN the artifacts should have been fetched in a batch instead of one by one
+    assert ('POST', '/api/v2/artifacts/batch/retrieve') in fake_lims.requests
+    assert not [request for request in fake_lims.requests if request[1].startswith(
+        '/api/v2/artifacts/') and request[0] == 'GET']
+
+
+def test_harvest_delivered_analytes(fake_lims, fake_lims_api: LimsAPI):
+    """Test that only the analytes of delivery processes give delivery dates"""
+
+    # GIVEN a delivery process with an analyte and a result file
+    fake_lims.add_process(DELIVERY, [['ACC1A1']], udfs={'Date delivered': '2019-02-01'})
+    fake_lims.add_process(DELIVERY, [['ACC2A1']], udfs={'Date delivered': '2019-02-01'},
+                          output_type='ResultFile')
+
+    # WHEN harvesting the delivery dates
+    dates = fake_lims_api.harvest_dates('delivered')
+
+    # THEN only the delivered analyte should have a date
+    assert dates == {'ACC1A1': dt.date(2019, 2, 1)}
+
+
+def test_harvest_prepared_since(fake_lims, fake_lims_api: LimsAPI):
+    """Test that only processes modified since a point in time are read"""
+
+    # GIVEN a process modified a year ago and one modified now
+    year_ago = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=365)
+    process_type = 'CG002 - Aggregate QC (Library Validation)'
+    old_process = fake_lims.add_process(process_type, [['ACC1A1']], date_run='2018-01-01',
+                                        modified=year_ago)
+    fake_lims.add_process(process_type, [['ACC2A1']], date_run='2019-01-01')
+
+    # WHEN harvesting the dates of processes modified in the last month
+    dates = fake_lims_api.harvest_dates('prepared',
+                                        dt.datetime.now() - dt.timedelta(days=30))
+
+    # THEN only the recent process should be read
+    assert dates == {'ACC2A1': dt.datetime(2019, 1, 1)}
+    assert ('GET', f"/api/v2/processes/{old_process}") not in fake_lims.requests
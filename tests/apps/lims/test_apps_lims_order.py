@@ -0,0 +1,157 @@
+"""Tests for submitting orders to LIMS"""
+import pytest
+from requests.exceptions import HTTPError, ReadTimeout
+
+from cg.apps.lims import LimsAPI
+
+from tests.apps.lims.fake_lims import GATEWAY_PAGE
+
+
+def order_samples(tubes: int = 2, plate: int = 3) -> list:
+    """utility function to build the LIMS input of samples in tubes and on a plate"""
+    samples = [{'name': f"tube{index}", 'container': 'Tube', 'container_name': None,
+                'well_position': None, 'index_sequence': None, 'udfs': {'priority': 'standard'}}
+               for index in range(tubes)]
+    samples += [{'name': f"well{index}", 'container': '96 well plate', 'container_name': 'plate',
+                 'well_position': f"A:{index + 1}", 'index_sequence': f"A01 - D701-D501 ({index})",
+                 'udfs': {'priority': 'standard'}} for index in range(plate)]
+    return samples
+
+
+def test_submit_project(fake_lims, fake_lims_api: LimsAPI):
+    """Test that a project is created with its containers, samples and reagent labels"""
+
+    # GIVEN samples in tubes and on a plate with index sequences
+
+    # WHEN submitting them to LIMS
+    project_data = fake_lims_api.submit_project('123456', order_samples())
+
+    # THEN the project should be created
+    assert project_data['id'] == 'ADM1'
+    assert fake_lims.projects == {'ADM1': '123456'}
+    # THEN the samples should be placed in their containers
+    containers = {sample['name']: fake_lims.containers[sample['container']]
+                  for sample in fake_lims.samples.values()}
+    assert containers == {'tube0': 'tube0', 'tube1': 'tube1', 'well0': 'plate',
+                          'well1': 'plate', 'well2': 'plate'}
+    # THEN the artifacts of the samples on the plate should be labeled
+    labels = {artifact['name']: artifact.get('reagent_label')
+              for artifact in fake_lims.artifacts.values()}
+    assert labels['tube0'] is None
+    assert labels['well2'] == 'A01 - D701-D501 (2)'
+
+
+def test_submit_project_named_later(fake_lims, fake_lims_api: LimsAPI):
+    """Test that the name of a project can be decided when it is created"""
+
+    # GIVEN a function that returns the name of the project
+
+    # WHEN submitting samples
+    fake_lims_api.submit_project(lambda: 'named later', order_samples())
+
+    # THEN the project should get the returned name
+    assert list(fake_lims.projects.values()) == ['named later']
+
+
+def test_submit_project_overlaps_requests(fake_lims, fake_lims_api: LimsAPI):
+    """Test that independent requests are made at the same time"""
+
+    # GIVEN a slow LIMS
+    fake_lims.delay = 0.05
+
+    # WHEN submitting samples in many tubes
+    fake_lims_api.submit_project('123456', order_samples(tubes=20, plate=0))
+
+    # THEN requests should have been made concurrently
+    assert fake_lims.max_active > 1
+    # THEN the samples should have been saved in one batch
+    assert fake_lims.requests.count(('POST', '/api/v2/samples/batch/create')) == 1
+
+
+def test_read_retried(fake_lims, fake_lims_api: LimsAPI):
+    """Test that reads are retried when LIMS is temporarily unavailable"""
+
+    # GIVEN a LIMS behind a gateway that fails to return a container once
+    fake_lims.fail('GET', '/api/v2/containers/27-1', 502, body=GATEWAY_PAGE)
+
+    # WHEN submitting samples
+    fake_lims_api.submit_project('123456', order_samples(tubes=1, plate=0))
+
+    # THEN the container should have been fetched again
+    assert fake_lims.requests.count(('GET', '/api/v2/containers/27-1')) == 2
+    assert len(fake_lims.samples) == 1
+
+
+def test_write_retried_when_unavailable(fake_lims, fake_lims_api: LimsAPI):
+    """Test that a batch is saved again when LIMS refused it as unavailable"""
+
+    # GIVEN a LIMS that is unavailable for the batch of samples once
+    fake_lims.fail('POST', '/api/v2/samples/batch/create', 503)
+
+    # WHEN submitting samples
+    fake_lims_api.submit_project('123456', order_samples())
+
+    # THEN all the samples should be saved once
+    assert len(fake_lims.samples) == 5
+
+
+def test_write_not_retried(fake_lims, fake_lims_api: LimsAPI):
+    """Test that a batch that may have been saved is not saved again"""
+
+    # GIVEN a LIMS that fails while saving the samples
+    fake_lims.fail('POST', '/api/v2/samples/batch/create', 500)
+
+    # WHEN submitting samples
+    # THEN the error should be raised without saving the samples again
+    with pytest.raises(HTTPError):
+        fake_lims_api.submit_project('123456', order_samples())
+    assert fake_lims.requests.count(('POST', '/api/v2/samples/batch/create')) == 1
+
+
+def test_map_sample_ids(fake_lims, fake_lims_api: LimsAPI):
+    """Test to map the names of the samples of a project to their ids"""
+
+    # GIVEN a submitted project
+    project_data = fake_lims_api.submit_project('123456', order_samples())
+
+    # WHEN mapping the sample names to ids
+    lims_map = fake_lims_api.get_samples(projectlimsid=project_data['id'], map_ids=True)
+
+    # THEN all the samples should be mapped
+    assert lims_map == {sample['name']: sample_id
+                        for sample_id, sample in fake_lims.samples.items()}
+
+
+def test_retried_without_response_on_error(fake_lims, fake_lims_api: LimsAPI, monkeypatch):
+    """Test that failures are retried by their status code when genologics raises errors
+    without the response"""
+
+    # GIVEN a genologics that leaves the response out of its errors
+    def validate_response(response, accept_status_codes=[200]):
+        if response.status_code not in accept_status_codes:
+            raise HTTPError(f"{response.status_code}: failed")
+
+    monkeypatch.setattr(fake_lims_api, 'validate_response', validate_response)
+    # GIVEN a LIMS that is unavailable for the batch of samples once
+    fake_lims.fail('POST', '/api/v2/samples/batch/create', 503)
+
+    # WHEN submitting samples
+    fake_lims_api.submit_project('123456', order_samples())
+
+    # THEN all the samples should be saved once
+    assert len(fake_lims.samples) == 5
+
+
+def test_write_times_out(fake_lims, fake_lims_api: LimsAPI, monkeypatch):
+    """Test that a write to a LIMS that hangs gives up, without sending it again"""
+
+    # GIVEN a LIMS that answers slower than the timeout
+    monkeypatch.setattr('cg.apps.lims.api.TIMEOUT', 0.05)
+    fake_lims.delay = 0.2
+
+    # WHEN creating a project
+    # THEN the request should time out and not be sent again
+    with pytest.raises(ReadTimeout):
+        fake_lims_api.post(fake_lims.uri('projects'), b'<prj:project xmlns:prj='
+                           b'"http://genologics.com/ri/project"><name>123456</name></prj:project>')
+    assert fake_lims.requests.count(('POST', '/api/v2/projects')) == 1
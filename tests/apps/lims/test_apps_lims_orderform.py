@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
+import io
+
+import pytest
+
 from cg.apps.lims import orderform
+from cg.exc import OrderFormError
 
 
 def test_parsing_rml_orderform(rml_orderform):
@@ -390,3 +395,33 @@ def test_parse_mip_combined_with_balsamic(skeleton_orderform_sample: dict):
 
     # THEN data_analysis is both mip and balsamic
     assert parsed_sample['analysis'] == 'mip_balsamic'
+
+
+def test_parsing_orderform_from_buffer(fastq_orderform):
+    # GIVEN the content of an orderform in memory
+    with open(fastq_orderform, 'rb') as orderform_file:
+        buffer = io.BytesIO(orderform_file.read())
+
+    # WHEN parsing it
+    data = orderform.parse_orderform(buffer)
+
+    # THEN it should give the same data as parsing the file
+    assert data == orderform.parse_orderform(fastq_orderform)
+
+
+def test_parsing_orderform_time_limit(fastq_orderform):
+    # GIVEN an orderform and a time limit that has already passed
+    # WHEN parsing the file
+    # THEN it should give up
+    with pytest.raises(OrderFormError):
+        orderform.parse_orderform(fastq_orderform, time_limit=-1)
+
+
+def test_parsing_invalid_orderform():
+    # GIVEN something that is not an Excel file
+    buffer = io.BytesIO(b'not an orderform')
+
+    # WHEN parsing it
+    # THEN it should fail as an invalid orderform
+    with pytest.raises(OrderFormError):
+        orderform.parse_orderform(buffer)
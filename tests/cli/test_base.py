@@ -61,3 +61,17 @@ def test_cli_init(cli_runner, invoke_cli):
         # THEN it should re-setup the tables and print new tables
         assert result.exit_code == 0
         assert 'Success!' in result.output
+
+
+def test_cli_profile_sql(cli_runner, invoke_cli):
+
+    # GIVEN you want to know which SQL statements a command issues
+    database_uri = 'sqlite:///test_db.sqlite3'
+    with cli_runner.isolated_filesystem():
+
+        # WHEN calling a command with "--profile-sql"
+        result = invoke_cli(['--database', database_uri, '--profile-sql', 'init'])
+
+        # THEN it should report the statements once the command has finished
+        assert result.exit_code == 0
+        assert 'SQL statements in' in result.output
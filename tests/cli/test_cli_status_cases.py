@@ -1,4 +1,7 @@
 """This script tests the cli methods to add families to status-db"""
+import csv
+import io
+import json
 from datetime import datetime
 
 from cg.store import Store
@@ -59,6 +62,86 @@ def test_lists_family(invoke_cli, disk_store: Store):
     assert family.internal_id in result.output
 
 
+def test_lists_next_page(invoke_cli, disk_store: Store):
+    """Test to that cases displays how to get the next page"""
+
+    # GIVEN a database with a family
+    family = add_family(disk_store)
+
+    # WHEN listing a page of one case
+    result = invoke_cli(
+        ['--database', disk_store.uri, 'status', 'cases', '--limit', '1'])
+
+    # THEN the family should be listed with a pointer to the next page
+    assert result.exit_code == 0
+    assert family.internal_id in result.output
+    assert f"--after-id {family.internal_id}" in result.output
+
+
+def test_cases_stream_jsonl(invoke_cli, disk_store: Store):
+    """Test to that cases can be streamed as json lines"""
+
+    # GIVEN a database with a family
+    family = add_family(disk_store)
+
+    # WHEN streaming the cases as json lines
+    result = invoke_cli(
+        ['--database', disk_store.uri, 'status', 'cases', '--format', 'jsonl', '--stream'])
+
+    # THEN the family should be written as a json object on its own line
+    assert result.exit_code == 0
+    rows = [json.loads(line) for line in result.output.splitlines()]
+    assert [row['internal_id'] for row in rows] == [family.internal_id]
+
+
+def test_cases_csv(invoke_cli, disk_store: Store):
+    """Test to that cases can be written as csv"""
+
+    # GIVEN a database with a family
+    family = add_family(disk_store)
+
+    # WHEN writing the cases as csv
+    result = invoke_cli(['--database', disk_store.uri, 'status', 'cases', '--format', 'csv'])
+
+    # THEN the family should be written as a row below a header
+    assert result.exit_code == 0
+    rows = list(csv.DictReader(io.StringIO(result.output)))
+    assert [row['internal_id'] for row in rows] == [family.internal_id]
+
+
+def test_cases_csv_empty_fields(invoke_cli, disk_store: Store):
+    """Test to that missing values are written as empty csv fields"""
+
+    # GIVEN a family with a sample without a data analysis
+    family = add_family(disk_store)
+    sample = add_sample(disk_store, 'sample1')
+    sample.data_analysis = None
+    disk_store.relate_sample(family, sample, status='unknown')
+    disk_store.commit()
+
+    # WHEN streaming the cases as csv
+    result = invoke_cli(['--database', disk_store.uri, 'status', 'cases', '--format', 'csv',
+                         '--stream'])
+
+    # THEN the missing values should be empty fields
+    assert result.exit_code == 0
+    row = next(csv.DictReader(io.StringIO(result.output)))
+    assert row['samples_data_analyses'] == ''
+    assert 'None' not in row.values()
+
+
+def test_cases_stream_needs_format(invoke_cli, disk_store: Store):
+    """Test to that streaming is refused for the table output"""
+
+    # GIVEN a database
+
+    # WHEN streaming the cases as a table
+    result = invoke_cli(['--database', disk_store.uri, 'status', 'cases', '--stream'])
+
+    # THEN the command should fail
+    assert result.exit_code != 0
+
+
 def ensure_application_version(disk_store, application_tag='dummy_tag'):
     """utility function to return existing or create application version for tests"""
     application = disk_store.application(tag=application_tag)
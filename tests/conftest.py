@@ -8,12 +8,15 @@ from pathlib import Path
 
 import pytest
 
+from cg.apps.lims import LimsAPI
 from cg.store import Store
 
 # Trailblazer
 from trailblazer.mip import files as mip_files_api
 import ruamel.yaml
 
+from tests.apps.lims.fake_lims import FakeLims
+
 pytest_plugins = [  # pylint: disable=invalid-name
     'tests.apps.lims.conftest',
     'tests.apps.loqus.conftest',
@@ -159,3 +162,19 @@ def disk_store(cli_runner, invoke_cli) -> Store:
         assert len(Store(database_uri).engine.table_names()) > 0
 
         yield Store(database_uri)
+
+
+@pytest.yield_fixture(scope='function')
+def fake_lims():
+    """A fake LIMS server, to test the requests made to LIMS"""
+    _fake_lims = FakeLims()
+    _fake_lims.start()
+    yield _fake_lims
+    _fake_lims.stop()
+
+
+@pytest.fixture(scope='function')
+def fake_lims_api(fake_lims):
+    """A LIMS API connected to the fake LIMS server"""
+    return LimsAPI({'lims': {'host': fake_lims.host, 'username': 'user', 'password': 'password',
+                             'backoff': 0}})
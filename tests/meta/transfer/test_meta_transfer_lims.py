@@ -1,5 +1,10 @@
 import datetime as dt
-from cg.meta.transfer.lims import SampleState, IncludeOptions
+import json
+
+import pytest
+
+from cg.meta.transfer import TransferLims
+from cg.meta.transfer.lims import IncludeOptions, PoolState, SampleState
 
 
 def has_same_received_at(lims, sample_obj):
@@ -96,3 +101,232 @@ def test_transfer_samples_include_unset_received_at(transfer_lims_api):
     # THEN the sample that was not set has been set and the other sample was not touched
     assert has_same_received_at(lims_api, untransfered_sample)
     assert not has_same_received_at(lims_api, transfered_sample)
+
+
+def test_transfer_samples_harvested(sample_store, fake_lims, fake_lims_api):
+
+    # GIVEN samples to receive, and a reception of them in LIMS
+    samples = sample_store.samples_to_recieve().all()
+    assert samples
+    fake_lims.add_process('CG002 - Reception Control',
+                          [[sample.internal_id] for sample in samples],
+                          udfs={'date arrived at clinical genomics': '2019-01-02'})
+
+    # GIVEN a transfer that harvests the dates in bulk for any number of samples
+    transfer_api = TransferLims(sample_store, fake_lims_api)
+    transfer_api.bulk_threshold = 0
+
+    # WHEN transfering the received dates
+    transfer_api.transfer_samples(SampleState.RECEIVED, IncludeOptions.UNSET.value)
+
+    # THEN all the samples should be received on the date in LIMS
+    assert all(sample.received_at.date() == dt.date(2019, 1, 2) for sample in samples)
+    # THEN LIMS should not have been searched for the artifacts of each sample
+    assert ('GET', '/api/v2/artifacts') not in fake_lims.requests
+
+
+def test_sync_samples(sample_store, fake_lims, fake_lims_api):
+
+    # GIVEN a sample that isn't received and a reception of it in LIMS
+    sample = sample_store.samples_to_recieve().first()
+    fake_lims.add_process('CG002 - Reception Control', [[sample.internal_id]],
+                          udfs={'date arrived at clinical genomics': '2019-01-02'})
+    transfer_api = TransferLims(sample_store, fake_lims_api)
+
+    # WHEN syncing the received dates
+    transfer_api.sync(SampleState.RECEIVED)
+
+    # THEN the sample should be received and the time of the sync saved
+    assert sample.received_at.date() == dt.date(2019, 1, 2)
+    assert sample_store.lims_sync('SampleState.received').synced_at
+
+
+def test_sync_reads_changes_since_last_sync(sample_store, fake_lims, fake_lims_api):
+
+    # GIVEN a sync of received dates a day ago
+    sync_obj = sample_store.add_lims_sync('SampleState.received',
+                                          dt.datetime.now() - dt.timedelta(days=1))
+    sample_store.add_commit(sync_obj)
+    # GIVEN a reception that was modified before the sync and one that was modified after
+    samples = sample_store.samples().all()
+    old_process = fake_lims.add_process(
+        'CG002 - Reception Control', [[samples[0].internal_id]],
+        udfs={'date arrived at clinical genomics': '2019-01-01'},
+        modified=dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=2),
+    )
+    fake_lims.add_process('CG002 - Reception Control', [[samples[1].internal_id]],
+                          udfs={'date arrived at clinical genomics': '2019-01-01'})
+    transfer_api = TransferLims(sample_store, fake_lims_api)
+
+    # WHEN syncing the received dates of all samples
+    transfer_api.sync(SampleState.RECEIVED, IncludeOptions.ALL.value)
+
+    # THEN only the process modified after the last sync should be read
+    assert ('GET', f"/api/v2/processes/{old_process}") not in fake_lims.requests
+    assert samples[1].received_at.date() == dt.date(2019, 1, 1)
+    assert sample_store.lims_sync('SampleState.received').synced_at.date() == dt.date.today()
+
+
+def test_sync_corrected_date(sample_store, fake_lims, fake_lims_api):
+
+    # GIVEN a received sample and a reception of it in LIMS with a later, corrected, date
+    sample = sample_store.samples().first()
+    sample.received_at = dt.datetime(2019, 1, 1)
+    sample_store.commit()
+    fake_lims.add_process('CG002 - Reception Control', [[sample.internal_id]],
+                          udfs={'date arrived at clinical genomics': '2019-01-03'})
+    transfer_api = TransferLims(sample_store, fake_lims_api)
+
+    # WHEN syncing the received dates of all samples
+    transfer_api.sync(SampleState.RECEIVED, IncludeOptions.ALL.value)
+
+    # THEN the sample should get the corrected date
+    assert sample.received_at.date() == dt.date(2019, 1, 3)
+    # THEN the change and the time of the sync should have been committed one after the other
+    assert transfer_api.report.commits == 2
+    sample_store.rollback()
+    assert sample.received_at.date() == dt.date(2019, 1, 3)
+    assert sample_store.lims_sync('SampleState.received').synced_at
+
+
+def test_sync_keeps_first_date(sample_store, fake_lims, fake_lims_api):
+
+    # GIVEN a sample delivered on the date of a delivery in LIMS from before the last sync
+    sample = sample_store.samples().first()
+    sample.delivered_at = dt.datetime(2019, 1, 1)
+    sync_obj = sample_store.add_lims_sync('SampleState.delivered',
+                                          dt.datetime.now() - dt.timedelta(days=1))
+    sample_store.add_commit(sync_obj)
+    fake_lims.add_process('Delivery v1', [[sample.internal_id]],
+                          udfs={'Date delivered': '2019-01-01'},
+                          modified=dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=2))
+    # GIVEN the sample was delivered again after the last sync
+    fake_lims.add_process('Delivery v1', [[sample.internal_id]],
+                          udfs={'Date delivered': '2019-01-05'})
+    transfer_api = TransferLims(sample_store, fake_lims_api)
+
+    # WHEN syncing the delivered dates of all samples
+    transfer_api.sync(SampleState.DELIVERED, IncludeOptions.ALL.value)
+
+    # THEN the sample should keep the date of the first delivery, like in a full transfer
+    assert sample.delivered_at.date() == dt.date(2019, 1, 1)
+    assert sample_store.lims_sync('SampleState.delivered').synced_at.date() == dt.date.today()
+
+
+def test_sync_skips_downsampled(sample_store, fake_lims, fake_lims_api):
+
+    # GIVEN a downsampled sample that isn't received and a reception of it in LIMS
+    sample = sample_store.samples_to_recieve().first()
+    sample.downsampled_to = 1000
+    sample_store.commit()
+    fake_lims.add_process('CG002 - Reception Control', [[sample.internal_id]],
+                          udfs={'date arrived at clinical genomics': '2019-01-02'})
+    transfer_api = TransferLims(sample_store, fake_lims_api)
+
+    # WHEN syncing the received dates of all samples
+    transfer_api.sync(SampleState.RECEIVED, IncludeOptions.ALL.value)
+
+    # THEN the downsampled sample should be left alone, like in a full transfer
+    assert sample.received_at is None
+
+
+def test_sync_pools(base_store, fake_lims, fake_lims_api):
+
+    # GIVEN a received pool that isn't delivered and a delivery of one of its samples in LIMS
+    pool = base_store.add_pool(base_store.customers().first(), name='pool1', order='order',
+                               ordered=dt.datetime.now(), data_analysis='fastq', ticket=123456,
+                               application_version=base_store.application(
+                                   'WGTPCFC030').versions[0])
+    pool.received_at = dt.datetime(2019, 2, 1)
+    base_store.add_commit(pool)
+    sample_id = fake_lims.add_sample('sample1', '123456', udfs={'pool name': 'pool1'})
+    fake_lims.add_process('Delivery v1', [[sample_id]], udfs={'Date delivered': '2019-03-01'})
+    transfer_api = TransferLims(base_store, fake_lims_api)
+
+    # WHEN syncing the delivered dates of pools
+    transfer_api.sync(PoolState.DELIVERED)
+
+    # THEN the pool should be delivered
+    assert pool.delivered_at.date() == dt.date(2019, 3, 1)
+
+
+def test_transfer_commits_in_batches(sample_store, fake_lims, fake_lims_api, tmpdir):
+
+    # GIVEN samples that were all received on another date in LIMS
+    samples = sample_store.samples_not_downsampled().all()
+    fake_lims.add_process('CG002 - Reception Control',
+                          [[sample.internal_id] for sample in samples],
+                          udfs={'date arrived at clinical genomics': '2019-01-02'})
+
+    # GIVEN a transfer that commits three changes at a time and profiles the SQL for a report
+    transfer_api = TransferLims(sample_store, fake_lims_api, batch_size=3, profile_sql=True)
+    transfer_api.bulk_threshold = 0
+
+    # WHEN transfering the received dates of all samples
+    transfer_api.transfer_samples(SampleState.RECEIVED, IncludeOptions.ALL.value)
+
+    # THEN the changes should be committed in batches
+    expected_commits = (len(samples) + 2) // 3
+    assert transfer_api.report.commits == expected_commits
+    # THEN the report should tell what was examined and changed
+    report_path = str(tmpdir.join('report.json'))
+    transfer_api.report.write(report_path)
+    with open(report_path) as report_file:
+        report = json.load(report_file)
+    assert report['states'] == {'SampleState.received': {'examined': len(samples),
+                                                         'changed': len(samples)}}
+    assert report['commits'] == expected_commits
+    assert report['lims_seconds'] > 0
+    assert report['db_seconds'] > 0
+
+
+def test_transfer_not_profiled(sample_store, fake_lims, fake_lims_api, monkeypatch):
+
+    # GIVEN a transfer that isn't asked to profile the SQL
+    transfer_api = TransferLims(sample_store, fake_lims_api)
+    profiled = []
+    monkeypatch.setattr(sample_store, 'profile_sql', lambda *args: profiled.append(True))
+
+    # WHEN transfering the received dates
+    transfer_api.transfer_samples(SampleState.RECEIVED, IncludeOptions.UNSET.value)
+
+    # THEN the statements should not be profiled and no database time reported
+    assert profiled == []
+    assert transfer_api.report.to_dict()['db_seconds'] is None
+
+
+def test_transfer_rolls_back_on_error(sample_store, lims_api, monkeypatch):
+
+    # GIVEN a transfer of samples with two changes per commit, where the second commit fails
+    samples = sample_store.samples_not_downsampled().all()
+    transfer_api = TransferLims(sample_store, lims_api, batch_size=2)
+    lims_api.workers = 1
+    looked_up = []
+
+    def received_date(lims_id: str) -> dt.date:
+        looked_up.append(lims_id)
+        return dt.date(2019, 1, 2)
+
+    transfer_api._date_functions[SampleState.RECEIVED] = received_date
+    commit = sample_store.commit
+    commits = []
+
+    def failing_commit():
+        commits.append(True)
+        if len(commits) == 2:
+            raise ValueError('database is down')
+        commit()
+
+    monkeypatch.setattr(sample_store, 'commit', failing_commit)
+
+    # WHEN transfering the received dates
+    with pytest.raises(ValueError):
+        transfer_api.transfer_samples(SampleState.RECEIVED, IncludeOptions.ALL.value)
+
+    # THEN the first batch should be saved and the changes of the second rolled back
+    received = {sample.internal_id: sample.received_at for sample in samples}
+    assert all(received[internal_id].date() == dt.date(2019, 1, 2)
+               for internal_id in looked_up[:2])
+    assert all(received[sample.internal_id] is None or
+               received[sample.internal_id].date() != dt.date(2019, 1, 2)
+               for sample in samples if sample.internal_id not in looked_up[:2])
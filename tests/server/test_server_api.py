@@ -0,0 +1,23 @@
+"""Tests for the helpers of the API routes in api.py"""
+import pytest
+
+from cg.server.api import MAX_LIMIT, request_limit
+
+
+@pytest.mark.parametrize('query, limit', [
+    ('', 50),
+    ('?limit=10', 10),
+    ('?limit=abc', 50),
+    ('?limit=-5', 1),
+    ('?limit=0', 1),
+    (f"?limit={MAX_LIMIT * 10}", MAX_LIMIT),
+])
+def test_request_limit(app, query, limit):
+    """Test that the limit of a request falls back to the default and is kept within bounds"""
+
+    # GIVEN a request with a limit argument
+    with app.test_request_context(f"/api/v1/samples{query}"):
+
+        # WHEN reading the limit with a default of 50
+        # THEN the limit should be a number between 1 and the maximum
+        assert request_limit(50) == limit
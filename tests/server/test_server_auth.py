@@ -0,0 +1,94 @@
+"""Tests for the cache of verified tokens"""
+import time
+
+from cg.server.auth import TokenCache
+
+CERTS = {'key': 'certificate'}
+
+
+def test_cached_token():
+    """Test that a verified token is found with the same certificates"""
+
+    # GIVEN a cache with a verified token
+    cache = TokenCache()
+    cache.add('token', CERTS, user_id=1)
+
+    # WHEN fetching the token
+    user_id = cache.get('token', CERTS)
+
+    # THEN the user id should be returned
+    assert user_id == 1
+
+
+def test_expired_token():
+    """Test that a token is not found after it expires"""
+
+    # GIVEN a cache with a token that has expired
+    cache = TokenCache()
+    cache.add('token', CERTS, user_id=1, expires_at=time.time() - 1)
+
+    # WHEN fetching the token
+    user_id = cache.get('token', CERTS)
+
+    # THEN it should need to be verified again
+    assert user_id is None
+
+
+def test_token_older_than_ttl():
+    """Test that a token is not kept longer than the ttl"""
+
+    # GIVEN a cache without a time to live and a token valid for an hour
+    cache = TokenCache(ttl=0)
+    cache.add('token', CERTS, user_id=1, expires_at=time.time() + 3600)
+
+    # WHEN fetching the token
+    user_id = cache.get('token', CERTS)
+
+    # THEN it should need to be verified again
+    assert user_id is None
+
+
+def test_rotated_certificates():
+    """Test that all tokens are verified again when the certificates change"""
+
+    # GIVEN a cache with a verified token
+    cache = TokenCache()
+    cache.add('token', CERTS, user_id=1)
+
+    # WHEN fetching the token with new certificates
+    user_id = cache.get('token', {'new_key': 'new certificate'})
+
+    # THEN it should need to be verified again
+    assert user_id is None
+    assert cache.get('token', CERTS) is None
+
+
+def test_least_recently_used_dropped():
+    """Test that the least recently used token is dropped when the cache is full"""
+
+    # GIVEN a full cache where the first token was used last
+    cache = TokenCache(size=2)
+    cache.add('first', CERTS, user_id=1)
+    cache.add('second', CERTS, user_id=2)
+    cache.get('first', CERTS)
+
+    # WHEN adding another token
+    cache.add('third', CERTS, user_id=3)
+
+    # THEN the second token should be dropped
+    assert cache.get('second', CERTS) is None
+    assert cache.get('first', CERTS) == 1
+    assert cache.get('third', CERTS) == 3
+
+
+def test_disabled_cache():
+    """Test that nothing is cached with a size of 0"""
+
+    # GIVEN a disabled cache
+    cache = TokenCache(size=0)
+
+    # WHEN adding a token
+    cache.add('token', CERTS, user_id=1)
+
+    # THEN it should not be cached
+    assert cache.get('token', CERTS) is None
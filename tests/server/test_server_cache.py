@@ -0,0 +1,121 @@
+"""Tests for the cache of API responses"""
+import datetime as dt
+
+from flask import Flask, jsonify
+from sqlalchemy.orm import Session
+
+from cg.server.cache import ResponseCache, cached_response
+from cg.store import Store
+
+
+def cached_app(store: Store, cache: ResponseCache):
+    """utility function to create an app with a cached view of the panels"""
+    store.add_commit(store.add_panel(customer=store.customer('cust000'), name='panel',
+                                     abbrev='panel', version=1.0, date=dt.datetime.now(),
+                                     genes=1))
+    app = Flask(__name__)
+    app.config.update(CG_RESPONSE_CACHE_SIZE=16, CG_RESPONSE_CACHE_TTL=60)
+    cache.init_app(app, store)
+    app.calls = 0
+
+    @app.route('/panels')
+    @cached_response(cache, 'panel')
+    def panels():
+        app.calls += 1
+        return jsonify(panels=[panel.abbrev for panel in store.panels()])
+
+    return app
+
+
+def test_conditional_request(base_store: Store):
+    """Test that a client with the current version gets a 304 without building the response"""
+
+    # GIVEN a cached view that has been requested
+    app = cached_app(base_store, ResponseCache())
+    client = app.test_client()
+    response = client.get('/panels')
+    assert response.status_code == 200
+    assert response.headers['Last-Modified']
+
+    # WHEN requesting it again with the ETag of the response
+    etag = response.headers['ETag']
+    response = client.get('/panels', headers={'If-None-Match': etag})
+
+    # THEN it should not have been modified and the view should not be called again
+    assert response.status_code == 304
+    assert app.calls == 1
+
+
+def test_commit_invalidates_response(base_store: Store):
+    """Test that committing a change to a table drops the responses that depend on it"""
+
+    # GIVEN a cached view that has been requested
+    app = cached_app(base_store, ResponseCache())
+    client = app.test_client()
+    etag = client.get('/panels').headers['ETag']
+
+    # WHEN a panel is changed
+    panel = base_store.panels().first()
+    panel.abbrev = 'changed'
+    base_store.commit()
+
+    # THEN the response should be built again with a new ETag
+    response = client.get('/panels', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'changed' in response.json['panels']
+    assert app.calls == 2
+
+
+def test_rollback_keeps_response(base_store: Store):
+    """Test that changes that are rolled back don't invalidate responses"""
+
+    # GIVEN a cached view that has been requested
+    app = cached_app(base_store, ResponseCache())
+    client = app.test_client()
+    client.get('/panels')
+
+    # WHEN a change to a panel is flushed and rolled back
+    panel = base_store.panels().first()
+    panel.abbrev = 'changed'
+    base_store.flush()
+    base_store.rollback()
+
+    # THEN the cached response should still be used
+    client.get('/panels')
+    assert app.calls == 1
+
+
+def test_other_tables_keep_response(base_store: Store):
+    """Test that changes to unrelated tables don't invalidate responses"""
+
+    # GIVEN a cached view of the panels that has been requested
+    app = cached_app(base_store, ResponseCache())
+    client = app.test_client()
+    client.get('/panels')
+
+    # WHEN a customer is changed
+    customer = base_store.customer('cust000')
+    customer.name = 'changed'
+    base_store.commit()
+
+    # THEN the cached response should still be used
+    client.get('/panels')
+    assert app.calls == 1
+
+
+def test_other_sessions_not_tracked(base_store: Store):
+    """Test that only the sessions of the served database change the table versions"""
+
+    # GIVEN a cached view of the panels that has been requested
+    app = cached_app(base_store, ResponseCache())
+    client = app.test_client()
+    client.get('/panels')
+
+    # WHEN a session that isn't the store's changes a panel
+    session = Session(bind=base_store.engine)
+    session.query(base_store.Panel).first().abbrev = 'changed'
+    session.commit()
+
+    # THEN the cached response should still be used until it expires
+    client.get('/panels')
+    assert app.calls == 1
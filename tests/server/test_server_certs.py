@@ -0,0 +1,124 @@
+"""Tests for the provider of Google OAuth certificates"""
+import json
+import time
+
+import requests
+
+from cg.server.certs import CertProvider, file_source, max_age
+
+CERTS = {'key': 'certificate'}
+
+
+def failing_source():
+    raise requests.ConnectionError('offline')
+
+
+def test_max_age():
+    """Test to parse the max-age of a Cache-Control header"""
+
+    # GIVEN a Cache-Control header from Google
+    header = 'public, max-age=19845, must-revalidate, no-transform'
+
+    # WHEN parsing the max-age
+    seconds = max_age(header)
+
+    # THEN the number of seconds should be returned
+    assert seconds == 19845
+    assert max_age(None) is None
+
+
+def test_certs_from_source():
+    """Test that certificates are fetched from the source on first use"""
+
+    # GIVEN a provider with a local source
+    provider = CertProvider(source=lambda: (CERTS, 3600))
+
+    # WHEN fetching the certificates
+    certs = provider.certs
+
+    # THEN the certificates of the source should be returned and refreshed before max-age
+    assert certs == CERTS
+    assert 3000 < provider.refresh_in() <= 3600
+
+
+def test_certs_from_file(tmpdir):
+    """Test that certificates can be read from a local file"""
+
+    # GIVEN a file with certificates
+    certs_file = tmpdir.join('certs.json')
+    certs_file.write(json.dumps(CERTS))
+
+    # WHEN fetching the certificates from the file
+    provider = CertProvider(source=file_source(str(certs_file)))
+
+    # THEN the certificates of the file should be returned
+    assert provider.certs == CERTS
+
+
+def test_certs_from_disk_cache(tmpdir):
+    """Test that cached certificates are used without calling the source"""
+
+    # GIVEN certificates cached on disk by a provider
+    cache_path = str(tmpdir.join('cache.json'))
+    CertProvider(source=lambda: (CERTS, 3600), cache_path=cache_path).refresh()
+
+    # WHEN starting a new provider that is offline
+    provider = CertProvider(source=failing_source, cache_path=cache_path)
+    provider._load_cache()
+
+    # THEN the cached certificates should be used
+    assert provider.certs == CERTS
+
+
+def test_failed_refresh_keeps_certs():
+    """Test that the current certificates are kept when a refresh fails"""
+
+    # GIVEN a provider with certificates
+    provider = CertProvider(source=lambda: (CERTS, 3600))
+    provider.refresh()
+
+    # WHEN the source goes offline
+    provider.source = failing_source
+    refreshed = provider.refresh()
+
+    # THEN the current certificates should be kept and a refresh retried soon
+    assert not refreshed
+    assert provider.certs == CERTS
+    assert provider.refresh_in() <= 60
+
+
+def test_unchanged_certs_kept():
+    """Test that the certificate set is only replaced when it changes"""
+
+    # GIVEN a provider with certificates
+    provider = CertProvider(source=lambda: (dict(CERTS), 3600))
+    certs = provider.certs
+
+    # WHEN refreshing the same certificates
+    provider.refresh()
+
+    # THEN the same certificate set should be returned
+    assert provider.certs is certs
+
+    # WHEN the keys are rotated
+    provider.source = lambda: ({'new_key': 'new certificate'}, 3600)
+    provider.refresh()
+
+    # THEN the new certificates should be returned
+    assert provider.certs == {'new_key': 'new certificate'}
+
+
+def test_offline_start():
+    """Test that a provider without certificates does not block on a failing source"""
+
+    # GIVEN a provider whose first fetch failed
+    provider = CertProvider(source=failing_source)
+    provider.refresh()
+
+    # WHEN fetching the certificates
+    start = time.time()
+    certs = provider.certs
+
+    # THEN no certificates should be returned without fetching again
+    assert certs == {}
+    assert time.time() - start < 1
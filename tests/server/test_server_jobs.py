@@ -0,0 +1,147 @@
+"""Tests for the queue of background jobs"""
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+from flask import Flask, current_app
+
+from cg.exc import OrderError
+from cg.server.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, SqliteJobs
+
+
+def job_queue(database: str = None, workers: int = 0) -> JobQueue:
+    """utility function to create a job queue with handlers"""
+    app = Flask(__name__)
+    app.config.update(CG_JOB_DATABASE=database, CG_JOB_WORKERS=workers, CG_JOB_TTL=60)
+    jobs = JobQueue()
+    jobs.init_app(app)
+
+    @jobs.handler('add')
+    def add(first: int, second: int) -> dict:
+        return {'sum': first + second, 'app': current_app.name}
+
+    @jobs.handler('fail')
+    def fail():
+        raise OrderError('invalid order')
+
+    return jobs
+
+
+def test_submit_job():
+    """Test that a job is queued and returned without running it"""
+
+    # GIVEN a queue without workers
+    jobs = job_queue()
+
+    # WHEN submitting a job
+    job = jobs.submit('add', user_id=1, first=1, second=2)
+
+    # THEN the job should be queued
+    assert job['status'] == QUEUED
+    assert job['user_id'] == 1
+    assert 'payload' not in job
+
+
+def test_run_job():
+    """Test that a job is run with its payload in an app context"""
+
+    # GIVEN a queued job
+    jobs = job_queue()
+    job_id = jobs.submit('add', first=1, second=2)['id']
+
+    # WHEN running the next job
+    assert jobs.run_next()
+
+    # THEN the job should be done with the result of the handler
+    job = jobs.get(job_id)
+    assert job['status'] == DONE
+    assert job['result'] == {'sum': 3, 'app': __name__}
+    assert job['finished_at'] >= job['started_at'] >= job['created_at']
+
+
+def test_failed_job():
+    """Test that a job that raises is failed with the message of the error"""
+
+    # GIVEN a job that will fail
+    jobs = job_queue()
+    job_id = jobs.submit('fail')['id']
+
+    # WHEN running it
+    jobs.run_next()
+
+    # THEN the job should have failed with the message
+    job = jobs.get(job_id)
+    assert job['status'] == FAILED
+    assert job['error'] == 'invalid order'
+
+
+def test_unknown_job():
+    """Test that only jobs with a handler can be submitted"""
+
+    # GIVEN a queue
+    jobs = job_queue()
+
+    # WHEN submitting a job without a handler
+    # THEN it should not be accepted
+    with pytest.raises(ValueError):
+        jobs.submit('unknown')
+
+
+def test_shared_database(tmpdir):
+    """Test that a job submitted in one process can be run and reported by another"""
+
+    # GIVEN two queues sharing a database
+    database = str(tmpdir.join('jobs.sqlite3'))
+    first, second = job_queue(database), job_queue(database)
+    job_id = first.submit('add', first=2, second=3)['id']
+
+    # WHEN the second queue runs the next job
+    assert second.run_next()
+
+    # THEN the first queue should report it as done, and there should be no more jobs
+    job = first.get(job_id)
+    assert job['status'] == DONE
+    assert job['result']['sum'] == 5
+    assert not first.run_next()
+
+
+def test_stopped_jobs_failed(tmpdir):
+    """Test that jobs running in a process that stopped are failed when a process starts"""
+
+    # GIVEN a job claimed by a process that has stopped and one claimed by this process
+    database = str(tmpdir.join('jobs.sqlite3'))
+    jobs = job_queue(database)
+    stopped_id = jobs.submit('add', first=1, second=1)['id']
+    running_id = jobs.submit('add', first=2, second=2)['id']
+    jobs.backend.claim(timeout=0)
+    jobs.backend.claim(timeout=0)
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    with sqlite3.connect(database) as connection:
+        connection.execute('UPDATE job SET pid = ? WHERE id = ?', (process.pid, stopped_id))
+
+    # WHEN another process opens the database
+    SqliteJobs(database)
+
+    # THEN the job of the stopped process should have failed and the other still be running
+    assert jobs.get(stopped_id)['status'] == FAILED
+    assert jobs.get(stopped_id)['error']
+    assert jobs.get(running_id)['status'] == RUNNING
+
+
+def test_worker_runs_jobs():
+    """Test that worker threads run the submitted jobs"""
+
+    # GIVEN a queue with a worker
+    jobs = job_queue(workers=1)
+
+    # WHEN submitting a job
+    job_id = jobs.submit('add', first=1, second=1)['id']
+
+    # THEN the worker should run it
+    deadline = time.time() + 5
+    while jobs.get(job_id)['status'] != DONE and time.time() < deadline:
+        time.sleep(0.01)
+    assert jobs.get(job_id)['result']['sum'] == 2
@@ -0,0 +1,88 @@
+"""Tests for the order form options snapshot"""
+import time
+
+from flask import Flask
+
+from cg.server.options import OptionsCache, OptionsSnapshot
+from cg.store import Store
+
+
+def test_snapshot_queries(base_store: Store):
+    """Test that a snapshot is built with one query per kind of option"""
+
+    # GIVEN a store with customers, applications and organisms
+
+    # WHEN building a snapshot
+    with base_store.profile_sql() as profile:
+        OptionsSnapshot.build(base_store)
+
+    # THEN customers, applications, panels and organisms should be fetched once each
+    assert profile.count == 4
+
+
+def test_admin_options(base_store: Store):
+    """Test that admins can order for all customers"""
+
+    # GIVEN a snapshot of the options
+    snapshot = OptionsSnapshot.build(base_store)
+
+    # WHEN fetching the options of an admin
+    options = snapshot.for_role(is_admin=True, customer_id=None)
+
+    # THEN all customers should be included
+    assert len(options['customers']) == base_store.Customer.query.count()
+    assert {'text': 'Production (cust000)', 'value': 'cust000'} in options['customers']
+    assert 'WGXCUSC000' in options['applications']['ext']
+    assert options['organisms'][0]['internal_id'] == 'C. jejuni'
+
+
+def test_customer_options(base_store: Store):
+    """Test that users can only order for their own customer"""
+
+    # GIVEN a snapshot of the options
+    snapshot = OptionsSnapshot.build(base_store)
+    customer = base_store.customer('cust001')
+
+    # WHEN fetching the options of a user of a customer
+    options = snapshot.for_role(is_admin=False, customer_id=customer.id)
+
+    # THEN only that customer should be included
+    assert options['customers'] == [{'text': 'Customer (cust001)', 'value': 'cust001'}]
+
+
+def test_snapshot_reused(base_store: Store):
+    """Test that the snapshot is reused and served quickly until the options change"""
+
+    # GIVEN a cache with a snapshot
+    cache = OptionsCache()
+    snapshot = cache.snapshot(base_store)
+
+    # WHEN fetching the options again
+    start = time.perf_counter()
+    with base_store.profile_sql() as profile:
+        cache.snapshot(base_store).for_role(is_admin=True, customer_id=None)
+
+    # THEN the same snapshot should be used without queries
+    assert cache.snapshot(base_store) is snapshot
+    assert profile.count == 0
+    assert time.perf_counter() - start < 0.01
+
+
+def test_snapshot_invalidated(base_store: Store):
+    """Test that a new snapshot is built when an application changes"""
+
+    # GIVEN a cache of the store with a snapshot
+    cache = OptionsCache()
+    app = Flask(__name__)
+    app.config.update(CG_RESPONSE_CACHE_TTL=60)
+    cache.init_app(app, base_store)
+    cache.snapshot(base_store)
+
+    # WHEN an application is archived
+    application = base_store.application('WGXCUSC000')
+    application.is_archived = True
+    base_store.commit()
+
+    # THEN the application should not be an option anymore
+    options = cache.snapshot(base_store).for_role(is_admin=True, customer_id=None)
+    assert 'WGXCUSC000' not in options['applications']['ext']
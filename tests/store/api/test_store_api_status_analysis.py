@@ -3,6 +3,9 @@ from datetime import datetime, timedelta
 
 from cg.store import Store
 
+# seconds the analysis queue may take to fetch from the 50k families of the fixture
+QUEUE_SECONDS = 1.0
+
 
 def test_that_many_families_can_have_one_sample_each(base_store: Store):
     """Test that tests that families are returned even if there are many result rows in the query"""
@@ -176,6 +179,34 @@ def test_one_of_one_sequenced_samples(base_store: Store):
     assert test_family in families
 
 
+def test_families_to_analyse_in_one_query(analysis_queue_store: Store):
+    """Test that the analysis queue is fetched quickly with one query that looks up the samples
+    of each family by index, however many families there are"""
+
+    # GIVEN a database with a large number of families where some are waiting for samples
+
+    # WHEN getting families to analyse
+    with analysis_queue_store.profile_sql() as profile:
+        families = analysis_queue_store.families_to_mip_analyze(limit=50)
+
+    # THEN one query should return the limited number of families, well within a second
+    assert profile.count == 1
+    assert len(families) == 50
+    assert profile.total_time < QUEUE_SECONDS
+
+    # THEN the links and samples of the families should be searched, not scanned
+    statement = profile.statements[0].statement
+    plan = [row[-1] for row in analysis_queue_store.session.connection().connection.execute(
+        f"EXPLAIN QUERY PLAN {statement}", [None] * statement.count('?'))]
+    assert any(step.startswith('SEARCH family_sample') for step in plan)
+    assert not any(step.startswith(('SCAN family_sample', 'SCAN TABLE family_sample',
+                                    'SCAN sample', 'SCAN TABLE sample')) for step in plan)
+
+    # THEN the families waiting for samples should not be included
+    for family_obj in families:
+        assert all(link.sample.sequenced_at for link in family_obj.links)
+
+
 def ensure_application_version(disk_store, application_tag='dummy_tag'):
     """utility function to return existing or create application version for tests"""
     application = disk_store.application(tag=application_tag)
@@ -25,6 +25,28 @@ def test_delivered_at_affects_tat(base_store: Store):
         assert case.get('tat') == 0
 
 
+def test_tat_counts_whole_days(base_store: Store):
+    """test that the turnaround time only counts whole days between received and delivered"""
+
+    # GIVEN a database with a family and a sample received in the evening and delivered the
+    # next morning
+    family = add_family(base_store)
+    sample = add_sample(base_store)
+    sample.received_at = datetime(2019, 3, 1, 18)
+    sample.prepared_at = datetime(2019, 3, 1, 20)
+    sample.sequenced_at = datetime(2019, 3, 2, 6)
+    sample.delivered_at = datetime(2019, 3, 2, 9)
+    base_store.relate_sample(family, sample, 'unknown')
+
+    # WHEN getting active cases
+    cases = base_store.cases()
+
+    # THEN TAT should be R-D = 0, less than a day
+    assert cases
+    for case in cases:
+        assert case.get('tat') == 0
+
+
 def test_sequenced_at_affects_tat(base_store: Store):
     """test that the estimated turnaround time is affected by the sequenced_at date """
 
@@ -1428,6 +1450,135 @@ def test_structure(base_store: Store):
         assert 'samples_invoiced' in case.keys()
 
 
+def test_samples_on_several_flowcells(base_store: Store):
+    """Test to that cases counts samples once even if they are on several flowcells"""
+
+    # GIVEN a database with a family with two received samples that are both on two flowcells
+    family = add_family(base_store)
+    first_sample = add_sample(base_store, sample_name='first_sample', received=True)
+    second_sample = add_sample(base_store, sample_name='second_sample', received=True)
+    base_store.relate_sample(family, first_sample, 'unknown')
+    base_store.relate_sample(family, second_sample, 'unknown')
+    first_flowcell = add_flowcell(base_store, name='first_flowcell', status='ondisk')
+    second_flowcell = add_flowcell(base_store, name='second_flowcell', status='removed')
+    first_flowcell.samples = [first_sample, second_sample]
+    second_flowcell.samples = [first_sample, second_sample]
+    base_store.commit()
+
+    # WHEN getting active cases
+    cases = base_store.cases()
+
+    # THEN the family should be listed once with each sample counted once
+    assert len(cases) == 1
+    case = cases[0]
+    assert case.get('total_samples') == 2
+    assert case.get('samples_received') == 2
+    assert case.get('samples_received_bool')
+    assert case.get('flowcells_on_disk') == 2
+    assert case.get('flowcells_status') == 'ondisk, removed'
+
+
+def test_cases_sorted_by_tat(base_store: Store):
+    """Test to that cases are sorted with the longest estimated turnaround time first"""
+
+    # GIVEN a database with families with samples received at different dates
+    for days_ago, family_name in ((7, 'week_old'), (1, 'day_old'), (14, 'two_weeks_old')):
+        family = add_family(base_store, family_id=family_name)
+        sample = add_sample(base_store, sample_name=family_name, received=True,
+                            date=datetime.now() - timedelta(days=days_ago))
+        base_store.relate_sample(family, sample, 'unknown')
+
+    # WHEN getting active cases
+    cases = base_store.cases()
+
+    # THEN the cases should be sorted by descending tat
+    assert [case.get('name') for case in cases] == ['two_weeks_old', 'week_old', 'day_old']
+    assert [case.get('tat') for case in cases] == sorted([case.get('tat') for case in cases],
+                                                        reverse=True)
+
+
+def test_cases_next_page(base_store: Store):
+    """Test to that cases can be fetched page by page"""
+
+    # GIVEN a database with families with samples received at different dates
+    for days_ago, family_name in ((7, 'week_old'), (1, 'day_old'), (14, 'two_weeks_old')):
+        family = add_family(base_store, family_id=family_name)
+        sample = add_sample(base_store, sample_name=family_name, received=True,
+                            date=datetime.now() - timedelta(days=days_ago))
+        base_store.relate_sample(family, sample, 'unknown')
+
+    # WHEN getting the first page of two cases
+    first_page = base_store.cases(limit=2)
+
+    # THEN it should contain the two cases with the longest tat
+    assert [case.get('name') for case in first_page] == ['two_weeks_old', 'week_old']
+
+    # WHEN getting the page after the last case
+    last_case = first_page[-1]
+    next_page = base_store.cases(limit=2, after_tat=last_case.get('tat'),
+                                 after_id=last_case.get('internal_id'))
+
+    # THEN it should contain the remaining case
+    assert [case.get('name') for case in next_page] == ['day_old']
+
+
+def test_cases_next_page_same_tat(base_store: Store):
+    """Test to that paging does not skip cases with the same tat"""
+
+    # GIVEN a database with two families with the same estimated turnaround time
+    for family_name in ('first_family', 'second_family'):
+        family = add_family(base_store, family_id=family_name)
+        sample = add_sample(base_store, sample_name=family_name, received=True)
+        base_store.relate_sample(family, sample, 'unknown')
+
+    # WHEN getting the cases one page at a time
+    first_page = base_store.cases(limit=1)
+    last_case = first_page[-1]
+    next_page = base_store.cases(limit=1, after_tat=last_case.get('tat'),
+                                 after_id=last_case.get('internal_id'))
+
+    # THEN both cases should be found
+    assert first_page[0].get('tat') == next_page[0].get('tat')
+    assert {first_page[0].get('name'), next_page[0].get('name')} == {'first_family',
+                                                                     'second_family'}
+
+
+def test_iter_cases_same_as_cases(base_store: Store):
+    """Test to that streaming cases gives the same cases as fetching them all at once"""
+
+    # GIVEN a database with families with samples on flowcells received at different dates
+    for days_ago in range(5):
+        family_name = f"family_{days_ago}"
+        family = add_family(base_store, family_id=family_name)
+        sample = add_sample(base_store, sample_name=family_name, received=True,
+                            date=datetime.now() - timedelta(days=days_ago))
+        add_flowcell(base_store, name=f"flowcell_{days_ago}", sample=sample, status='ondisk')
+        base_store.relate_sample(family, sample, 'unknown')
+
+    # WHEN streaming the cases in batches smaller than the number of cases
+    streamed = base_store.iter_cases(batch_size=2)
+
+    # THEN the cases should be yielded lazily with the same content and order as a plain fetch
+    assert not isinstance(streamed, list)
+    assert list(streamed) == base_store.cases()
+
+
+def test_iter_cases_filters(base_store: Store):
+    """Test to that streaming cases applies the same filters as fetching them"""
+
+    # GIVEN a database with a received and a not received family
+    for family_name, received in (('received', True), ('not_received', False)):
+        family = add_family(base_store, family_id=family_name)
+        sample = add_sample(base_store, sample_name=family_name, received=received)
+        base_store.relate_sample(family, sample, 'unknown')
+
+    # WHEN streaming only the received cases
+    cases = list(base_store.iter_cases(only_received=True))
+
+    # THEN only the received family should be yielded
+    assert [case.get('name') for case in cases] == ['received']
+
+
 def ensure_application_version(disk_store, application_tag='dummy_tag'):
     """utility function to return existing or create application version for tests"""
     application = disk_store.application(tag=application_tag)
@@ -0,0 +1,50 @@
+"""Tests that the status queue queries are served by indexes"""
+import pytest
+
+from cg.store import Store
+
+QUEUES = ['samples_to_recieve', 'samples_to_prepare', 'samples_to_sequence', 'samples_to_deliver',
+          'samples_not_delivered', 'samples_not_invoiced']
+
+
+@pytest.mark.parametrize('queue', QUEUES)
+def test_queue_uses_index(store: Store, queue):
+    """Test that a queue query does not scan the whole sample table"""
+
+    # GIVEN a store with the sample indexes
+    query = getattr(store, queue)()
+
+    # WHEN explaining the queue query
+    scans = full_table_scans(store, query)
+
+    # THEN the sample table should be searched with an index
+    assert 'sample' not in scans
+
+
+def test_samples_to_invoice_uses_index(store: Store):
+    """Test that the samples to invoice are found without scanning the sample table"""
+
+    # GIVEN a store with the sample indexes
+    query, _ = store.samples_to_invoice()
+
+    # WHEN explaining the query
+    scans = full_table_scans(store, query)
+
+    # THEN the sample table should be searched with an index
+    assert 'sample' not in scans
+
+
+def full_table_scans(store: Store, query) -> list:
+    """utility function to list the tables that a query reads without using an index"""
+    dialect = store.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'mysql':
+        rows = store.engine.execute(f"EXPLAIN {sql}")
+        return [row['table'] for row in rows if row['type'] == 'ALL']
+    rows = store.engine.execute(f"EXPLAIN QUERY PLAN {sql}")
+    scans = []
+    for row in rows:
+        words = row[-1].replace(' TABLE ', ' ').split()
+        if words[0] == 'SCAN' and 'USING' not in words:
+            scans.append(words[1])
+    return scans
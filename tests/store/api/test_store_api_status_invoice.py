@@ -0,0 +1,79 @@
+"""Tests for the customers and records to invoice"""
+from datetime import datetime
+
+from cg.store import Store
+
+
+def test_customers_to_invoice_totals(base_store: Store):
+    """Test that customers are listed with their number and price of records to invoice"""
+
+    # GIVEN delivered samples and pools of two customers and one already invoiced sample
+    for index in range(3):
+        add_delivered_sample(base_store, f"sample{index}", 'cust001')
+    add_delivered_sample(base_store, 'cust002_sample', 'cust002')
+    invoiced_sample = add_delivered_sample(base_store, 'invoiced_sample', 'cust002')
+    base_store.add_commit(base_store.add_invoice(customer=invoiced_sample.customer,
+                                                 samples=[invoiced_sample]))
+    add_delivered_pool(base_store, 'pool', 'cust002')
+    base_store.session.expunge_all()
+
+    # WHEN fetching the customers to invoice
+    with base_store.profile_sql() as profile:
+        rows = base_store.customers_to_invoice()
+        totals = [(row.customer.internal_id, row.samples, row.samples_price, row.pools,
+                   row.pools_price) for row in rows]
+
+    # THEN each customer should be listed once with the totals of its pending records
+    assert totals == [('cust001', 3, 30, 0, 0), ('cust002', 1, 10, 1, 10)]
+    # THEN everything should be fetched with a single query
+    assert profile.count == 1
+
+
+def test_customers_to_invoice_excludes_production(base_store: Store):
+    """Test that the production customer is never invoiced"""
+
+    # GIVEN a delivered sample of the production customer
+    add_delivered_sample(base_store, 'sample', 'cust000')
+
+    # WHEN fetching the customers to invoice
+    rows = base_store.customers_to_invoice()
+
+    # THEN no customer should be listed
+    assert rows == []
+
+
+def test_pools_to_invoice_customers(base_store: Store):
+    """Test that only customers with pools to invoice are listed with the pools"""
+
+    # GIVEN a customer with a delivered sample and another with a delivered pool
+    add_delivered_sample(base_store, 'sample', 'cust001')
+    pool = add_delivered_pool(base_store, 'pool', 'cust002')
+
+    # WHEN fetching the pools to invoice
+    records, customers_to_invoice = base_store.pools_to_invoice()
+
+    # THEN the pool and its customer should be returned
+    assert records.all() == [pool]
+    assert [row.customer.internal_id for row in customers_to_invoice] == ['cust002']
+
+
+def add_delivered_sample(store: Store, name: str, customer_id: str):
+    """utility function to add a delivered sample"""
+    application_version = store.application('WGSPCFC060').versions[0]
+    sample = store.add_sample(name=name, sex='unknown')
+    sample.customer = store.customer(customer_id)
+    sample.application_version = application_version
+    sample.delivered_at = datetime.now()
+    store.add_commit(sample)
+    return sample
+
+
+def add_delivered_pool(store: Store, name: str, customer_id: str):
+    """utility function to add a delivered pool"""
+    application_version = store.application('RMLS05R150').versions[0]
+    pool = store.add_pool(customer=store.customer(customer_id), name=name, order='order',
+                          ordered=datetime.now(), application_version=application_version,
+                          data_analysis='fastq')
+    pool.delivered_at = datetime.now()
+    store.add_commit(pool)
+    return pool
@@ -1,5 +1,9 @@
 import datetime as dt
 
+from sqlalchemy.orm import Session
+
+from cg.store.api.trends import MONTHS
+
 
 def test_get_last_day_of_month_newyearseve(sample_store):
 
@@ -27,3 +31,150 @@ def test_get_last_day_of_month_1stjanuary(sample_store):
     assert day.year == until_date.year
     assert 12 == until_date.month
     assert 31 == until_date.day
+
+
+def test_past_year_served_from_rollup(base_store):
+
+    # GIVEN diagnostic samples received and delivered last year, in a built rollup
+    year = dt.date.today().year - 1
+    add_trend_sample(base_store, 'first', received=dt.datetime(year, 3, 1),
+                     delivered=dt.datetime(year, 3, 11))
+    add_trend_sample(base_store, 'second', received=dt.datetime(year, 3, 20),
+                     delivered=dt.datetime(year, 3, 24))
+    base_store.refresh_trends(year)
+    base_store.commit()
+
+    # WHEN fetching the trends of last year
+    received = list(base_store.samples_per_month(year))
+    turnaround_times = list(base_store.received_to_delivered(year))
+
+    # THEN the trends should be computed from the monthly rollup
+    assert base_store._from_rollup(year)
+    assert base_store.SampleTrend.query.filter_by(year=year).count() == 1
+    assert received == [{'name': 'diagnostic', 'results': dict(
+        {month: None for month in MONTHS.values()}, March=2)}]
+    assert turnaround_times[0]['name'] == 'wgs'
+    assert turnaround_times[0]['results']['March'] == 7.0
+
+
+def test_past_year_not_built_on_read(base_store):
+
+    # GIVEN samples received last year without a rollup
+    year = dt.date.today().year - 1
+    add_trend_sample(base_store, 'sample', received=dt.datetime(year, 3, 1),
+                     delivered=dt.datetime(year, 3, 11))
+
+    # WHEN fetching the trends of last year
+    received = list(base_store.samples_per_month(year))
+
+    # THEN they should be computed from the samples without building the rollup
+    assert received[0]['results']['March'] == 1
+    assert base_store.SampleTrendMonth.query.count() == 0
+    assert base_store.SampleTrend.query.count() == 0
+
+
+def test_rollup_stale_when_sample_dates_change(base_store):
+
+    # GIVEN a rollup of samples received last year
+    year = dt.date.today().year - 1
+    sample = add_trend_sample(base_store, 'sample', received=dt.datetime(year, 5, 2),
+                              delivered=dt.datetime(year, 5, 4))
+    base_store.refresh_trends(year)
+    base_store.commit()
+
+    # WHEN the sample is delivered later and the received date is corrected
+    sample.delivered_at = dt.datetime(year, 6, 12)
+    sample.received_at = dt.datetime(year, 6, 2)
+    base_store.commit()
+
+    # THEN both months should be stale and the trends computed from the samples
+    stale = base_store.SampleTrendMonth.query.filter_by(stale=True)
+    assert sorted(month_obj.month for month_obj in stale) == [5, 6]
+    assert not base_store._from_rollup(year)
+    assert list(base_store.received_to_delivered(year))[0]['results']['June'] == 10.0
+
+    # THEN rebuilding the stale months should serve the new dates from the rollup
+    assert sorted(base_store.refresh_stale_trends()) == [(year, 5), (year, 6)]
+    base_store.commit()
+    assert base_store._from_rollup(year)
+    turnaround_times = list(base_store.received_to_delivered(year))
+    assert turnaround_times[0]['results']['May'] is None
+    assert turnaround_times[0]['results']['June'] == 10.0
+
+
+def test_only_store_sessions_mark_trends_stale(base_store):
+
+    # GIVEN a rollup of a sample received last year
+    year = dt.date.today().year - 1
+    sample = add_trend_sample(base_store, 'sample', received=dt.datetime(year, 5, 2),
+                              delivered=dt.datetime(year, 5, 4))
+    base_store.refresh_trends(year)
+    base_store.commit()
+
+    # WHEN a session that isn't the store's changes the sample
+    session = Session(bind=base_store.engine)
+    session.query(base_store.Sample).get(sample.id).delivered_at = dt.datetime(year, 5, 9)
+    session.commit()
+
+    # THEN the rollup should not be marked stale
+    assert base_store.SampleTrendMonth.query.filter_by(stale=True).count() == 0
+
+
+def add_trend_sample(store, name, received, delivered):
+    """utility function to add a received and delivered sample of a diagnostic customer"""
+    customer = store.customer('cust000')
+    customer.priority = 'diagnostic'
+    application = store.application('WGSPCFC060')
+    application.category = 'wgs'
+    application_version = application.versions[0]
+    sample = store.add_sample(name, sex='unknown', received=received)
+    sample.delivered_at = delivered
+    sample.customer = customer
+    sample.application_version = application_version
+    store.add_commit(sample)
+    return sample
+
+
+def test_current_year_trends(base_store):
+
+    # GIVEN diagnostic samples received this year where one is not yet delivered
+    year = dt.date.today().year
+    add_trend_sample(base_store, 'delivered', received=dt.datetime(year, 1, 2),
+                     delivered=dt.datetime(year, 1, 5))
+    add_trend_sample(base_store, 'received', received=dt.datetime(year, 1, 3), delivered=None)
+    add_trend_sample(base_store, 'last year', received=dt.datetime(year - 1, 12, 31, 12),
+                     delivered=dt.datetime(year, 1, 9))
+
+    # WHEN fetching the trends of this year
+    received = list(base_store.samples_per_month(year))
+    turnaround_times = list(base_store.received_to_delivered(year))
+    invoice_times = list(base_store.delivered_to_invoiced(year))
+
+    # THEN only samples received this year should be counted
+    assert received[0]['results']['January'] == 2
+    assert received[0]['results']['December'] is None
+    # THEN only delivered samples should be part of the average
+    assert turnaround_times[0]['results']['January'] == 3.0
+    # THEN there are no invoiced samples to average
+    assert invoice_times == []
+
+
+def test_rollup_matches_live_trends(base_store):
+
+    # GIVEN samples received last year
+    year = dt.date.today().year - 1
+    add_trend_sample(base_store, 'first', received=dt.datetime(year, 2, 1),
+                     delivered=dt.datetime(year, 2, 8))
+    add_trend_sample(base_store, 'second', received=dt.datetime(year, 2, 3), delivered=None)
+    add_trend_sample(base_store, 'third', received=dt.datetime(year, 4, 3),
+                     delivered=dt.datetime(year, 5, 3))
+
+    # WHEN computing the trends from the samples and from the rollup
+    base_store.refresh_trends(year)
+    base_store.commit()
+    live_samples = list(base_store._live_samples(year, base_store.Customer.priority))
+    live_averages = list(base_store._live_averages(year, 'received_to_delivered'))
+
+    # THEN they should be the same
+    assert list(base_store.samples_per_month(year)) == live_samples
+    assert list(base_store.received_to_delivered(year)) == live_averages
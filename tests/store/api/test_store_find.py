@@ -0,0 +1,157 @@
+"""Tests for the eager loading profiles of the find handler"""
+import pytest
+
+from cg.store import Store
+from cg.store.api.loaders import loader_options
+
+
+def test_families_profile_constant_queries(base_store: Store):
+    """Test that serializing families with links takes the same number of queries for any page"""
+
+    # GIVEN a database with trios
+    for index in range(6):
+        add_trio(base_store, f"family{index}")
+
+    # WHEN serializing pages of different sizes with the links profile
+    counts = []
+    for page_size in (2, 6):
+        base_store.session.expunge_all()
+        with base_store.profile_sql() as profile:
+            records = base_store.families(profile='family_links').limit(page_size)
+            data = [family_obj.to_dict(links=True) for family_obj in records]
+        assert len(data) == page_size
+        counts.append(profile.count)
+
+    # THEN the number of queries should not depend on the page size
+    assert counts[0] == counts[1]
+
+
+def same_payload(store: Store, query, profile: str, serialize) -> tuple:
+    """utility function to serialize the records of a query without and with a profile"""
+    store.session.expunge_all()
+    lazy_data = [serialize(record) for record in query]
+    store.session.expunge_all()
+    eager_data = [serialize(record) for record in query.options(*loader_options(profile))]
+    return lazy_data, eager_data
+
+
+@pytest.mark.parametrize('profile, serialize', [
+    ('family', lambda family_obj: family_obj.to_dict()),
+    ('family_links', lambda family_obj: family_obj.to_dict(links=True)),
+])
+def test_families_profile_same_output(base_store: Store, profile, serialize):
+    """Test that the family profiles do not change the serialized families"""
+
+    # GIVEN a database with trios
+    for index in range(3):
+        add_trio(base_store, f"family{index}")
+
+    # WHEN serializing the families with and without the profile
+    lazy_data, eager_data = same_payload(base_store, base_store.families(), profile, serialize)
+
+    # THEN the payloads should be the same
+    assert len(eager_data) == 3
+    assert eager_data == lazy_data
+
+
+def test_samples_profile_same_output(base_store: Store):
+    """Test that the sample profile does not change the serialized samples"""
+
+    # GIVEN a database with a trio
+    add_trio(base_store, 'family')
+
+    # WHEN serializing the samples with and without the profile
+    lazy_data, eager_data = same_payload(base_store, base_store.samples(), 'sample',
+                                         lambda sample_obj: sample_obj.to_dict())
+
+    # THEN the payloads should be the same
+    assert len(eager_data) == 3
+    assert eager_data == lazy_data
+
+
+def test_analyses_profile_same_output(base_store: Store):
+    """Test that the analysis profile does not change the serialized analyses"""
+
+    # GIVEN a database with an analysis of a trio
+    family = add_trio(base_store, 'family')
+    base_store.add_commit(base_store.add_analysis(pipeline='mip', version='1', family=family))
+
+    # WHEN serializing the analyses with and without the profile
+    lazy_data, eager_data = same_payload(base_store, base_store.Analysis.query, 'analysis',
+                                         lambda analysis_obj: analysis_obj.to_dict())
+
+    # THEN the payloads should be the same
+    assert len(eager_data) == 1
+    assert eager_data == lazy_data
+
+
+@pytest.mark.parametrize('find, profile, serialize', [
+    ('microbial_samples', 'microbial_sample', lambda record: record.to_dict(order=True)),
+    ('microbial_orders', 'microbial_order_samples', lambda record: record.to_dict(samples=True)),
+])
+def test_microbial_profiles_same_output(microbial_store: Store, find, profile, serialize):
+    """Test that the microbial profiles do not change the serialized records"""
+
+    # GIVEN a database with a microbial order with samples
+
+    # WHEN serializing the records with and without the profile
+    query = getattr(microbial_store, find)()
+    lazy_data, eager_data = same_payload(microbial_store, query, profile, serialize)
+
+    # THEN the payloads should be the same
+    assert eager_data
+    assert eager_data == lazy_data
+
+
+def test_samples_profile_constant_queries(base_store: Store):
+    """Test that serializing samples takes one query with the sample profile"""
+
+    # GIVEN a database with a trio
+    add_trio(base_store, 'family')
+    base_store.session.expunge_all()
+
+    # WHEN serializing the samples with the sample profile
+    with base_store.profile_sql() as profile:
+        data = [sample_obj.to_dict() for sample_obj in base_store.samples(profile='sample')]
+
+    # THEN all samples should be serialized with a single query
+    assert len(data) == 3
+    assert profile.count == 1
+    assert all(sample_data['application']['tag'] == 'WGSPCFC060' for sample_data in data)
+
+
+def test_microbial_orders_profile_constant_queries(microbial_store: Store):
+    """Test that serializing microbial orders with samples takes a fixed number of queries"""
+
+    # GIVEN a database with a microbial order with samples
+    microbial_store.session.expunge_all()
+
+    # WHEN serializing the orders with the samples profile
+    with microbial_store.profile_sql() as profile:
+        data = [order_obj.to_dict(samples=True) for order_obj in
+                microbial_store.microbial_orders(profile='microbial_order_samples')]
+
+    # THEN the orders and their samples should be loaded with one query each
+    assert len(data[0]['microbial_samples']) == 3
+    assert profile.count == 2
+
+
+def add_trio(store: Store, family_name: str):
+    """utility function to add a family with a child and both parents"""
+    customer = store.customer('cust000')
+    application_version = store.application('WGSPCFC060').versions[0]
+    family = store.add_family(panels=['panel'], name=family_name, priority='standard')
+    family.customer = customer
+    samples = {}
+    for role, sex in (('child', 'male'), ('father', 'male'), ('mother', 'female')):
+        sample = store.add_sample(name=f"{family_name}-{role}", sex=sex)
+        sample.customer = customer
+        sample.application_version = application_version
+        samples[role] = sample
+    store.add_commit(family, *samples.values())
+    for role in ('father', 'mother'):
+        store.relate_sample(family, samples[role], 'unaffected')
+    link = store.relate_sample(family, samples['child'], 'affected', father=samples['father'],
+                               mother=samples['mother'])
+    store.add_commit(link)
+    return family
@@ -0,0 +1,93 @@
+"""Tests for the keyset pagination and projection of list queries"""
+import datetime as dt
+
+import pytest
+
+from cg.store import Store, models
+from cg.store.api import pages
+
+ORDER = [(models.Flowcell.sequenced_at, True)]
+
+
+def test_after_pages_through_all_records(store: Store):
+    """Test that following the last id of each page returns every record once, in order"""
+
+    # GIVEN flowcells with duplicate and missing sort values
+    dates = [dt.datetime(2018, 1, 1), None, dt.datetime(2018, 1, 2), dt.datetime(2018, 1, 1),
+             None, dt.datetime(2018, 1, 3), dt.datetime(2018, 1, 1)]
+    for index, date in enumerate(dates):
+        store.add_commit(store.add_flowcell(f"flowcell{index}", 'ST-E00201', 'hiseqx', date))
+    query = store.flowcells()
+
+    # WHEN fetching pages of two records after the last record of the previous page
+    records = pages.ordered(query, models.Flowcell, ORDER).limit(2).all()
+    fetched = list(records)
+    while records:
+        records = pages.after(query, models.Flowcell, ORDER, records[-1].id).limit(2).all()
+        fetched.extend(records)
+
+    # THEN all records should be fetched once, in the order of the query
+    assert len(fetched) == len(dates)
+    assert fetched == pages.ordered(query, models.Flowcell, ORDER).all()
+    assert [record.sequenced_at for record in fetched] == [
+        dt.datetime(2018, 1, 3), dt.datetime(2018, 1, 2), dt.datetime(2018, 1, 1),
+        dt.datetime(2018, 1, 1), dt.datetime(2018, 1, 1), None, None]
+
+
+def test_after_unknown_record(store: Store):
+    """Test that a page can not continue after a record outside of the query"""
+
+    # GIVEN a flowcell that is filtered out of a query
+    flowcell = store.add_flowcell('flowcell', 'ST-E00201', 'hiseqx', dt.datetime.now())
+    store.add_commit(flowcell)
+    query = store.flowcells(status='removed')
+
+    # WHEN continuing after the filtered flowcell
+    # THEN it should fail
+    with pytest.raises(ValueError):
+        pages.after(query, models.Flowcell, ORDER, flowcell.id)
+
+
+def test_project_fields(store: Store):
+    """Test that a projection only selects the requested columns"""
+
+    # GIVEN a flowcell
+    store.add_commit(store.add_flowcell('flowcell', 'ST-E00201', 'hiseqx', dt.datetime.now()))
+
+    # WHEN selecting the name of the flowcells
+    records = pages.project(store.flowcells(), models.Flowcell, ['name']).all()
+
+    # THEN only the primary key and the name should be returned
+    assert [tuple(record.keys()) for record in records] == [('id', 'name')]
+    assert records[0].name == 'flowcell'
+
+
+def test_project_unknown_field(store: Store):
+    """Test that only columns of the model can be selected"""
+
+    # GIVEN a query for flowcells
+    query = store.flowcells()
+
+    # WHEN selecting a relationship
+    # THEN it should fail
+    with pytest.raises(ValueError):
+        pages.project(query, models.Flowcell, ['samples'])
+
+
+def test_ordered_by_primary_key(store: Store):
+    """Test that an order by the primary key is not extended with it again"""
+
+    # GIVEN flowcells and an order by the primary key
+    for index in range(3):
+        store.add_commit(store.add_flowcell(f"flowcell{index}", 'ST-E00201', 'hiseqx',
+                                            dt.datetime(2018, 1, 1)))
+    order = [(models.Flowcell.id, False)]
+
+    # WHEN listing the columns to sort by
+    columns = pages.order_columns(models.Flowcell, order)
+
+    # THEN the records should be sorted by the primary key only, ascending
+    assert columns == order
+    query = store.flowcells()
+    assert [record.name for record in pages.ordered(query, models.Flowcell, order)] == [
+        'flowcell0', 'flowcell1', 'flowcell2']
@@ -0,0 +1,188 @@
+"""Tests for searching records by name and id"""
+from datetime import datetime
+
+from cg.store import Store, models
+from cg.store.api.search import LikeSearch, TrigramSearch, trigrams
+
+
+def test_trigrams():
+    """Test to split values in three letter fragments"""
+
+    # GIVEN a name and an id
+
+    # WHEN splitting them in trigrams
+    fragments = trigrams('Sample', 'ACC1')
+
+    # THEN all the fragments should be returned in lower case
+    assert fragments == {'sam', 'amp', 'mpl', 'ple', 'acc', 'cc1'}
+    assert trigrams('ab', None) == set()
+
+
+def test_search_new_sample(base_store: Store):
+    """Test that a new sample is found by a part of its name"""
+
+    # GIVEN a new sample
+    sample = add_sample(base_store, 'hoppsansa')
+
+    # WHEN searching for a part of the name in another case
+    records = base_store.samples(enquiry='PPSAN').all()
+
+    # THEN the sample should be found
+    assert records == [sample]
+
+
+def test_search_needs_all_trigrams(base_store: Store):
+    """Test that only records containing the enquiry are found"""
+
+    # GIVEN samples that each contain a part of an enquiry
+    add_sample(base_store, 'abcxx')
+    add_sample(base_store, 'xxbcd')
+
+    # WHEN searching for the whole enquiry
+    records = base_store.samples(enquiry='abcd').all()
+
+    # THEN no sample should be found
+    assert records == []
+
+
+def test_search_renamed_sample(base_store: Store):
+    """Test that a renamed sample is found by its new name only"""
+
+    # GIVEN a sample that has been renamed
+    sample = add_sample(base_store, 'oldname')
+    sample.name = 'newname'
+    base_store.commit()
+
+    # WHEN searching for the names
+    old_records = base_store.samples(enquiry='oldname').all()
+    new_records = base_store.samples(enquiry='newname').all()
+
+    # THEN the sample should only be found by the new name
+    assert old_records == []
+    assert new_records == [sample]
+
+
+def test_search_deleted_sample(base_store: Store):
+    """Test that the fragments of a deleted sample are removed"""
+
+    # GIVEN a sample that has been deleted
+    sample = add_sample(base_store, 'deleted')
+    sample_id = sample.id
+    base_store.delete_commit(sample)
+
+    # WHEN looking for its fragments
+    fragments = base_store.SearchTrigram.query.filter_by(record_type='sample',
+                                                        record_id=sample_id)
+
+    # THEN there should be none left
+    assert fragments.count() == 0
+
+
+def test_search_short_enquiry(base_store: Store):
+    """Test that enquiries shorter than a trigram are still matched"""
+
+    # GIVEN a sample
+    sample = add_sample(base_store, 'xyzzy')
+
+    # WHEN searching for two letters of its name
+    records = base_store.samples(enquiry='zy').all()
+
+    # THEN the sample should be found
+    assert sample in records
+
+
+def test_search_pools_by_order(base_store: Store):
+    """Test that pools are found by their order"""
+
+    # GIVEN a pool
+    pool = base_store.add_pool(customer=base_store.customer('cust000'), name='pool',
+                               order='special order', ordered=datetime.now(),
+                               application_version=base_store.application(
+                                   'RMLS05R150').versions[0], data_analysis='fastq')
+    base_store.add_commit(pool)
+
+    # WHEN searching for a part of the order
+    records = base_store.pools(customer=None, enquiry='special').all()
+
+    # THEN the pool should be found
+    assert records == [pool]
+
+
+def test_rebuild_search_index(base_store: Store):
+    """Test that existing records can be indexed"""
+
+    # GIVEN a built index that a sample is missing from
+    sample = add_sample(base_store, 'existing')
+    base_store.rebuild_search_index()
+    base_store.SearchTrigram.query.filter_by(record_id=sample.id).delete()
+    base_store.commit()
+    assert base_store.samples(enquiry='existing').all() == []
+
+    # WHEN rebuilding the index
+    base_store.rebuild_search_index()
+    base_store.commit()
+
+    # THEN the sample should be found
+    assert base_store.samples(enquiry='existing').all() == [sample]
+
+
+def test_search_without_index(base_store: Store):
+    """Test that records are searched without the index until it is built"""
+
+    # GIVEN a sample from before the index table was created and a new, indexed, sample
+    sample = add_sample(base_store, 'unindexed')
+    base_store.SearchTrigram.query.delete()
+    base_store.commit()
+    add_sample(base_store, 'newsample')
+    assert base_store.SearchTrigram.query.count() > 0
+
+    # WHEN searching for a part of the name of the first sample
+    records = base_store.samples(enquiry='index').all()
+
+    # THEN the sample should be found
+    assert records == [sample]
+
+
+def test_rarest_trigrams(base_store: Store):
+    """Test that the trigrams of an enquiry are counted in a single query"""
+
+    # GIVEN indexed samples that share some trigrams
+    add_sample(base_store, 'abcdef')
+    add_sample(base_store, 'abcxyz')
+    search = TrigramSearch()
+
+    # WHEN ranking the trigrams of an enquiry
+    with base_store.profile_sql() as profile:
+        fragments = search.rarest(models.Sample, 'abcdeq')
+
+    # THEN the trigrams should be counted at once, rarest first
+    assert profile.count == 1
+    assert fragments[:2] == ['deq', 'bcd']
+    assert fragments[-1] == 'abc'
+
+
+def test_like_search(base_store: Store):
+    """Test that the search backend can be replaced"""
+
+    # GIVEN a sample that is not indexed
+    sample = add_sample(base_store, 'unindexed')
+    base_store.SearchTrigram.query.delete()
+    base_store.commit()
+
+    # WHEN searching without the index
+    base_store.search_backend = LikeSearch()
+    records = base_store.samples(enquiry='index').all()
+
+    # THEN the sample should be found
+    assert records == [sample]
+
+
+def add_sample(store: Store, name: str):
+    """utility function to add a sample"""
+    customer = store.customer('cust000')
+    application_version = store.application('WGSPCFC060').versions[0]
+    sample = store.add_sample(name=name, sex='unknown')
+    sample.customer = customer
+    sample.application_version = application_version
+    store.add_commit(sample)
+    return sample
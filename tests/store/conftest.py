@@ -3,6 +3,10 @@ import datetime as dt
 
 import pytest
 
+from cg.store import models
+
+BENCHMARK_FAMILIES = 50000
+
 
 @pytest.fixture
 def microbial_submitted_order():
@@ -172,3 +176,39 @@ def analysis_store(base_store):
 
     base_store.commit()
     yield base_store
+
+
+@pytest.yield_fixture(scope='function')
+def analysis_queue_store(base_store):
+    """Setup a store with a large number of families waiting for analysis.
+
+    Every family has one sequenced sample and every tenth family also has a sample that is not
+    yet sequenced. Rows are bulk inserted to keep the setup fast.
+    """
+    customer = base_store.customer('cust000')
+    application_version = base_store.application('WGSPCFC060').versions[0]
+    now = dt.datetime.now()
+
+    families, samples, links = [], [], []
+    for index in range(1, BENCHMARK_FAMILIES + 1):
+        families.append(dict(id=index, internal_id=f"family{index}", name=f"family{index}",
+                             priority=1, customer_id=customer.id, ordered_at=now))
+        samples.append(dict(id=index, internal_id=f"sample{index}", name=f"sample{index}",
+                            sex='unknown', priority=1, customer_id=customer.id,
+                            application_version_id=application_version.id, ordered_at=now,
+                            sequenced_at=now))
+        links.append(dict(family_id=index, sample_id=index, status='unknown'))
+        if index % 10 == 0:
+            unsequenced_id = BENCHMARK_FAMILIES + index
+            samples.append(dict(id=unsequenced_id, internal_id=f"sample{unsequenced_id}",
+                                name=f"sample{unsequenced_id}", sex='unknown', priority=1,
+                                customer_id=customer.id,
+                                application_version_id=application_version.id, ordered_at=now,
+                                sequenced_at=None))
+            links.append(dict(family_id=index, sample_id=unsequenced_id, status='unknown'))
+
+    base_store.session.execute(models.Family.__table__.insert(), families)
+    base_store.session.execute(models.Sample.__table__.insert(), samples)
+    base_store.session.execute(models.FamilySample.__table__.insert(), links)
+    base_store.commit()
+    yield base_store
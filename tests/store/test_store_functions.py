@@ -0,0 +1,63 @@
+"""Tests for the SQL functions of different database dialects"""
+import datetime as dt
+
+from sqlalchemy import column, literal
+from sqlalchemy.dialects import mysql
+
+from cg.store import Store
+from cg.store.functions import DaysBetween, WholeDaysBetween
+
+
+def test_days_between_calendar_days(base_store: Store):
+    """Test that the days between two dates are counted in calendar days"""
+
+    # GIVEN dates less than 24 hours apart on different days
+    received = dt.datetime(2019, 3, 1, 18)
+    delivered = dt.datetime(2019, 3, 2, 9)
+
+    # WHEN counting the days between them
+    days = base_store.session.query(DaysBetween(literal(received), literal(delivered))).scalar()
+
+    # THEN they should be a day apart, like DATEDIFF of MySQL counts them
+    assert days == 1
+
+
+def test_days_between_mysql():
+    """Test that MySQL counts the days between dates with DATEDIFF"""
+
+    # GIVEN a turnaround time
+
+    # WHEN compiling it for MySQL
+    days = DaysBetween(column('received_at'), column('delivered_at'))
+    sql = str(days.compile(dialect=mysql.dialect()))
+
+    # THEN the last date should come first, as DATEDIFF expects
+    assert sql == 'DATEDIFF(delivered_at, received_at)'
+
+
+def test_whole_days_between(base_store: Store):
+    """Test that the whole days between two points in time only count full 24 hour periods"""
+
+    # GIVEN points in time less than 24 hours apart on different days
+    received = dt.datetime(2019, 3, 1, 18)
+    delivered = dt.datetime(2019, 3, 2, 9)
+
+    # WHEN counting the whole days between them
+    days = base_store.session.query(
+        WholeDaysBetween(literal(received), literal(delivered))).scalar()
+
+    # THEN they should be less than a day apart, like a Python timedelta
+    assert days == (delivered - received).days == 0
+
+
+def test_whole_days_between_mysql():
+    """Test that MySQL counts the whole days between points in time with TIMESTAMPDIFF"""
+
+    # GIVEN a turnaround time
+
+    # WHEN compiling it for MySQL
+    days = WholeDaysBetween(column('received_at'), column('delivered_at'))
+    sql = str(days.compile(dialect=mysql.dialect()))
+
+    # THEN the days from the first to the last point in time should be counted
+    assert sql == 'TIMESTAMPDIFF(DAY, received_at, delivered_at)'
@@ -0,0 +1,63 @@
+"""Tests for the SQL profiling of the store"""
+from cg.store import Store
+
+
+def test_profile_tags_handler_method(base_store: Store):
+    """Test that statements are tagged by the handler method that issued them"""
+
+    # GIVEN a store
+
+    # WHEN fetching cases within a profile
+    with base_store.profile_sql() as profile:
+        base_store.cases()
+
+    # THEN the statements should be counted and tagged by the outermost handler method
+    assert profile.count > 0
+    assert list(profile.tags) == ['StatusHandler.cases']
+    assert profile.total_time == sum(statement.duration for statement in profile.statements)
+
+
+def test_profile_tags_caller_of_returned_query(base_store: Store):
+    """Test that a query executed outside of the store is tagged by its caller"""
+
+    # GIVEN a store
+
+    # WHEN iterating a query returned from the store within a profile
+    with base_store.profile_sql() as profile:
+        list(base_store.families())
+
+    # THEN the statement should be tagged by the calling function
+    assert profile.count == 1
+    assert profile.statements[0].tag.endswith('test_profile_tags_caller_of_returned_query')
+
+
+def test_profile_slowest_statements(base_store: Store):
+    """Test that the slowest statements are reported first"""
+
+    # GIVEN a store
+
+    # WHEN issuing more statements than reported as slowest
+    with base_store.profile_sql(slowest=2) as profile:
+        for _ in range(3):
+            base_store.customer('cust000')
+
+    # THEN only the slowest statements should be reported in falling order
+    assert profile.count == 3
+    durations = [statement.duration for statement in profile.slowest]
+    assert len(durations) == 2
+    assert durations == sorted(durations, reverse=True)
+    assert 'FindHandler.customer=3/' in profile.header()
+
+
+def test_profile_stops_recording(base_store: Store):
+    """Test that statements are not recorded after the profile has ended"""
+
+    # GIVEN a profile that has ended
+    with base_store.profile_sql() as profile:
+        base_store.customer('cust000')
+
+    # WHEN issuing more statements
+    base_store.customer('cust001')
+
+    # THEN they should not be recorded
+    assert profile.count == 1